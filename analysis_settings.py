@@ -0,0 +1,159 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Settings shared by the GUI, the analyzers and worker processes"""
+from dataclasses import dataclass
+from typing import Optional, Set, Tuple
+
+from result_cache import DEFAULT_CACHE_PATH
+from scan_manifest import DEFAULT_MANIFEST_PATH
+from sampling import parse_shard, DEFAULT_SCAN_WORKERS
+
+
+@dataclass
+class AnalysisSettings:
+    """Configuration settings for document analysis"""
+    threshold: float
+    output_format: str
+    max_rows_per_file: int
+    excluded_folders: Set[str]
+    use_sampling: bool = False
+    use_random_n: bool = False
+    random_n_size: Optional[int] = None
+    confidence_level: float = 0.95
+    margin_of_error: float = 0.05
+    sample_size: Optional[int] = None
+    total_files: Optional[int] = None
+    include_pdfs: bool = True
+    include_images: bool = True
+    process_subdirectories: bool = True
+    minimal_output: bool = False
+    dpi: int = 200  # Resolution pages and margin bands are rendered at
+    band_render: bool = True  # Render only the margin bands of PDF pages
+    fast_raster: bool = False  # Render without anti-aliasing and annotations
+    adaptive_dpi: bool = False  # Probe margins at low DPI before full resolution
+    probe_dpi: int = 72
+    dpi_uncertainty: float = 0.5  # Percentage points around threshold to escalate
+    vector_first: bool = False  # Skip rendering margin bands with nothing drawn in them
+    evaluation_mode: str = "full"  # "full" reports both detectors, "verdict" may skip rendering
+    page_cache_size: int = 1024  # Pages with identical content reuse results, 0 disables
+    use_result_cache: bool = True  # Reuse results of unchanged files from earlier runs
+    result_cache_path: str = DEFAULT_CACHE_PATH
+    result_cache_max_age_days: float = 30.0
+    result_cache_max_size_mb: float = 512.0
+    result_cache_hash: bool = False  # Also compare file contents, slower but catches touched files
+    page_split_threshold: int = 2000  # PDFs with at least this many pages are split, 0 disables
+    page_chunk_size: int = 500  # Pages per work unit of a split PDF
+    scheduling: str = "streaming"  # "streaming", "largest_first" or "path_order"
+    pipeline_queue_size: int = 256  # Capacity of the queues between processing stages
+    open_workers: int = 4  # Threads opening files and estimating their cost
+    scan_workers: int = DEFAULT_SCAN_WORKERS  # Threads listing directories, 1 walks sequentially
+    use_scan_manifest: bool = True  # Reuse listings of unchanged directories between scans
+    scan_manifest_path: str = DEFAULT_MANIFEST_PATH
+    worker_idle_timeout: float = 300.0  # Seconds warm workers are kept between runs, 0 stops them
+    file_timeout: float = 0.0  # Seconds a file or page range may take, whatever its page count
+    page_timeout: float = 120.0  # Seconds a single page may take, 0 disables either limit
+    slow_lane_dpi: int = 100  # Resolution files that timed out are retried at
+    memory_budget_mb: int = 1024  # Pixmap memory all renders may hold at once
+    min_dpi: int = 72  # Lowest resolution oversized pages are degraded to
+    tile_size_mb: float = 16.0  # Largest margin band piece rendered at once
+    prefetch: bool = False  # Copy files to a local spool ahead of analysis, for network shares
+    prefetch_depth: int = 8  # Files spooled ahead of the analyzers
+    spool_dir: str = ""  # Directory for spooled copies, the temporary directory if empty
+    spool_size_mb: int = 2048
+    checkpoint: bool = True  # Journal completed files alongside the output so a run can resume
+    resume: bool = False  # Skip work journaled by an earlier run and append to its output
+    shard: str = ""  # "i/N" analyzes the i-th of N partitions of the files, empty for all
+    sampling_seed: Optional[int] = None  # Seed for reproducible samples, required with shards
+
+    def __post_init__(self):
+        """Validate settings after initialization"""
+        if not 0.1 <= self.threshold <= 10.0:
+            raise ValueError("Threshold must be between 0.1 and 10.0")
+
+        if self.output_format not in ['csv', 'parquet', 'sqlite']:
+            raise ValueError("Invalid output format")
+
+        if self.max_rows_per_file < 1:
+            raise ValueError("Max rows per file must be positive")
+
+        if self.evaluation_mode not in ['full', 'verdict']:
+            raise ValueError("Invalid evaluation mode")
+
+        if self.page_cache_size < 0:
+            raise ValueError("Page cache size cannot be negative")
+
+        if self.scheduling not in ['streaming', 'largest_first', 'path_order']:
+            raise ValueError("Invalid scheduling order")
+
+        if self.memory_budget_mb < 1 or self.min_dpi < 1 or self.tile_size_mb <= 0:
+            raise ValueError("Memory budget, minimum DPI and tile size must be positive")
+
+        if self.prefetch_depth < 1 or self.spool_size_mb < 1:
+            raise ValueError("Prefetch depth and spool size must be positive")
+
+        if self.prefetch and self.scheduling == "largest_first":
+            # Largest-first plans every file before analyzing any, so a spool
+            # holding prefetch_depth files would fill up and never drain
+            raise ValueError("Prefetch cannot be combined with largest-first scheduling")
+
+        if self.pipeline_queue_size < 1 or self.open_workers < 1:
+            raise ValueError("Pipeline queue size and open workers must be positive")
+
+        if self.scan_workers < 1:
+            raise ValueError("Scan workers must be positive")
+
+        if self.worker_idle_timeout < 0:
+            raise ValueError("Worker idle timeout cannot be negative")
+
+        if self.file_timeout < 0 or self.page_timeout < 0:
+            raise ValueError("Timeouts cannot be negative")
+
+        if self.dpi < 1 or self.slow_lane_dpi < 1:
+            raise ValueError("DPI must be positive")
+
+        if self.page_split_threshold < 0 or self.page_chunk_size < 1:
+            raise ValueError("Invalid page range splitting settings")
+
+        if self.result_cache_max_age_days <= 0 or self.result_cache_max_size_mb <= 0:
+            raise ValueError("Result cache limits must be positive")
+
+        if self.shard:
+            parse_shard(self.shard)
+            if (self.use_sampling or self.use_random_n) and self.sampling_seed is None:
+                raise ValueError("Sampling a sharded run needs a sampling seed so that "
+                                 "every shard draws from the same sample")
+
+        # Validate sampling settings
+        if self.use_sampling and self.use_random_n:
+            raise ValueError("Cannot use both statistical sampling and random N sampling")
+
+        if self.use_sampling:
+            if not 0 < self.confidence_level < 1:
+                raise ValueError("Confidence level must be between 0 and 1")
+            if not 0 < self.margin_of_error < 1:
+                raise ValueError("Margin of error must be between 0 and 1")
+
+        if self.use_random_n:
+            if self.random_n_size is None:
+                raise ValueError("Random N size must be specified when using random N sampling")
+            if self.random_n_size < 1:
+                raise ValueError("Random N size must be positive")
+            if self.total_files is not None and self.random_n_size > self.total_files:
+                raise ValueError("Random N size cannot be larger than total files")
+
+    def get_shard(self) -> Optional[Tuple[int, int]]:
+        """Get the shard number and count, or None if the run is not sharded"""
+        return parse_shard(self.shard) if self.shard else None
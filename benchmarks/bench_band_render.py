@@ -0,0 +1,157 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Benchmark full-page rendering against margin band rendering and raster profiles"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+import fitz
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from content_analyzer import ContentAnalyzer  # noqa: E402
+
+PAGE_SIZES = {
+    'letter': (612, 792),
+    'a4': (595.3, 841.9),
+}
+
+
+def create_sample_pdf(path: str, page_count: int, page_size: str) -> None:
+    """Create a synthetic PDF with headers, footers and body text"""
+    width, height = PAGE_SIZES[page_size]
+    rng = random.Random(42)
+
+    doc = fitz.open()
+    for page_num in range(page_count):
+        page = doc.new_page(width=width, height=height)
+        if rng.random() < 0.5:
+            page.insert_text((72, 15 + rng.random() * 30), f"Header {page_num}", fontsize=11)
+        if rng.random() < 0.5:
+            page.insert_text((72, height - 10 - rng.random() * 30), f"Footer {page_num}", fontsize=9)
+        for line in range(42):
+            page.insert_text((72, 80 + line * 15),
+                             "Lorem ipsum dolor sit amet, consectetur adipiscing elit", fontsize=10)
+        if rng.random() < 0.3:
+            page.draw_rect(fitz.Rect(300, height - 30, 450, height - 5),
+                           color=(0, 0, 0), fill=(0.6, 0.6, 0.6))
+    doc.save(path)
+    doc.close()
+
+
+def analyze_full_page_rgb(analyzer: ContentAnalyzer, page: fitz.Page):
+    """Render the full page in RGB and convert it with PIL (original behavior)"""
+    zoom = analyzer.dpi / 72
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    return analyzer.analyze_image_content(image)
+
+
+def analyze_full_page(analyzer: ContentAnalyzer, page: fitz.Page):
+    """Render the full page as a grayscale pixmap and analyze the margins"""
+    zoom = analyzer.dpi / 72
+    return analyzer.analyze_pixmap(analyzer.render_pixmap(page, fitz.Matrix(zoom, zoom)))
+
+
+def run_benchmark(pdf_path: str, analyzer: ContentAnalyzer, method) -> tuple:
+    """Analyze every page of a PDF and return (pages/sec, results)"""
+    results = []
+    with fitz.open(pdf_path) as doc, open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            for page in doc:
+                results.append(method(page))
+            elapsed = time.perf_counter() - start
+    return len(results) / elapsed, results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=50, help="Pages per document")
+    parser.add_argument('--dpi', type=int, default=200, help="Render resolution")
+    args = parser.parse_args()
+
+    analyzer = ContentAnalyzer(dpi=args.dpi)
+    fast_analyzer = ContentAnalyzer(dpi=args.dpi, fast_raster=True)
+    adaptive_analyzer = ContentAnalyzer(dpi=args.dpi, adaptive_dpi=True)
+    vector_analyzer = ContentAnalyzer(dpi=args.dpi, vector_first=True)
+    mismatches = 0
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for page_size in PAGE_SIZES:
+            pdf_path = os.path.join(temp_dir, f"{page_size}.pdf")
+            create_sample_pdf(pdf_path, args.pages, page_size)
+
+            rgb_rate, _ = run_benchmark(
+                pdf_path, analyzer, lambda page: analyze_full_page_rgb(analyzer, page))
+            full_rate, full_results = run_benchmark(
+                pdf_path, analyzer, lambda page: analyze_full_page(analyzer, page))
+            band_rate, band_results = run_benchmark(
+                pdf_path, analyzer, analyzer.analyze_page_margins)
+            fast_rate, _ = run_benchmark(
+                pdf_path, fast_analyzer, fast_analyzer.analyze_page_margins)
+            adaptive_rate, adaptive_results = run_benchmark(
+                pdf_path, adaptive_analyzer, adaptive_analyzer.analyze_page_margins)
+            vector_rate, vector_results = run_benchmark(
+                pdf_path, vector_analyzer, vector_analyzer.analyze_page_margins)
+
+            mismatches += sum(
+                1 for band, vector in zip(band_results, vector_results)
+                if (band.top_content_percentage, band.bottom_content_percentage) !=
+                (vector.top_content_percentage, vector.bottom_content_percentage)
+            )
+
+            mismatches += sum(1 for full, band in zip(full_results, band_results) if full != band)
+
+            # Each speedup is against the run that differs from it in one change
+            print(f"{page_size}:")
+            print(f"  full page, RGB + PIL  {rgb_rate:8.1f} pages/sec")
+            print(f"  full page, grayscale  {full_rate:8.1f} pages/sec "
+                  f"({full_rate / rgb_rate:.1f}x RGB + PIL)")
+            print(f"  bands, grayscale      {band_rate:8.1f} pages/sec "
+                  f"({band_rate / full_rate:.1f}x full page)")
+            print(f"  bands, fast raster    {fast_rate:8.1f} pages/sec "
+                  f"({fast_rate / band_rate:.1f}x bands)")
+
+            escalated = sum(1 for result in adaptive_results if result.dpi == args.dpi)
+            verdict_changes = sum(
+                1 for full, adaptive in zip(full_results, adaptive_results)
+                if (full.has_top_content, full.has_bottom_content) !=
+                (adaptive.has_top_content, adaptive.has_bottom_content)
+            )
+            print(f"  bands, adaptive DPI   {adaptive_rate:8.1f} pages/sec "
+                  f"({adaptive_rate / band_rate:.1f}x bands, {escalated} of {len(adaptive_results)} "
+                  f"pages escalated, {verdict_changes} verdict changes)")
+
+            vector_only = sum(1 for result in vector_results if result.detector == "vector")
+            print(f"  bands, vector first   {vector_rate:8.1f} pages/sec "
+                  f"({vector_rate / band_rate:.1f}x bands, {vector_only} of {len(vector_results)} "
+                  f"pages decided without rendering)")
+
+    if mismatches:
+        print(f"ERROR: {mismatches} pages produced different results")
+        return 1
+
+    print("Band and vector-first results match full-page rendering")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
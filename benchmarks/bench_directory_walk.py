@@ -0,0 +1,107 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Benchmark the sequential directory walk against the parallel walker on a deep tree"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sampling  # noqa: E402
+from sampling import FileProcessor  # noqa: E402
+
+SUPPORTED_FORMATS = {'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp'}
+
+
+def create_tree(root: str, depth: int, fanout: int, files_per_dir: int) -> int:
+    """Create a synthetic tree of empty PDFs and images and return the directory count"""
+    directories = 1
+    for i in range(files_per_dir):
+        extension = ('.pdf', '.png', '.txt')[i % 3]
+        open(os.path.join(root, f"file_{i}{extension}"), 'w').close()
+    if depth > 0:
+        for i in range(fanout):
+            child = os.path.join(root, f"dir_{i}")
+            os.mkdir(child)
+            directories += create_tree(child, depth - 1, fanout, files_per_dir)
+    os.mkdir(os.path.join(root, '$RECYCLE.BIN'))  # Excluded, must not be listed
+    open(os.path.join(root, '$RECYCLE.BIN', 'deleted.pdf'), 'w').close()
+    return directories
+
+
+def slow_scandir(latency: float):
+    """os.scandir with a fixed delay per call, standing in for a network share round trip"""
+    scandir = os.scandir
+
+    def delayed(path):
+        time.sleep(latency)
+        return scandir(path)
+    return delayed
+
+
+def run_walk(root: str, scan_workers: int, max_depth, latency: float) -> tuple:
+    """Scan the tree and return (seconds, files in walk order)"""
+    options = FileProcessor.ProcessingOptions(excluded_folders={'$RECYCLE.BIN'},
+                                              max_depth=max_depth, scan_workers=scan_workers)
+    with mock.patch.object(sampling.os, 'scandir', slow_scandir(latency)):
+        start = time.perf_counter()
+        files = list(FileProcessor.iter_files(root, True, True, SUPPORTED_FORMATS, options))
+        elapsed = time.perf_counter() - start
+    return elapsed, files
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--depth', type=int, default=5, help="Levels of subdirectories")
+    parser.add_argument('--fanout', type=int, default=4, help="Subdirectories per directory")
+    parser.add_argument('--files', type=int, default=6, help="Files per directory")
+    parser.add_argument('--latency-ms', type=float, default=2.0,
+                        help="Simulated delay of every directory listing, 0 for the local disk")
+    parser.add_argument('--workers', type=int, nargs='+', default=[4, 8, 16],
+                        help="Scan worker counts to compare with the sequential walk")
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+    mismatches = 0
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directories = create_tree(temp_dir, args.depth, args.fanout, args.files)
+        print(f"{directories:,} directories, {args.latency_ms:g} ms per listing:")
+
+        for max_depth in (None, args.depth // 2):
+            sequential_time, sequential_files = run_walk(temp_dir, 1, max_depth, latency)
+            label = "no depth limit" if max_depth is None else f"max depth {max_depth}"
+            print(f"  {label}, {len(sequential_files):,} files")
+            print(f"    sequential           {sequential_time * 1000:8.1f} ms")
+
+            for workers in args.workers:
+                parallel_time, parallel_files = run_walk(temp_dir, workers, max_depth, latency)
+                if parallel_files != sequential_files:
+                    mismatches += 1
+                print(f"    {workers:2d} scan workers      {parallel_time * 1000:8.1f} ms "
+                      f"({sequential_time / parallel_time:.1f}x)")
+
+    if mismatches:
+        print(f"ERROR: {mismatches} parallel walks returned different files or order")
+        return 1
+
+    print("Parallel walks return the same files in the same order")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Benchmark import time and time to first window against a startup budget"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry points and the modules they must import quickly
+IMPORT_MODULES = ['document_analyzer_gui', 'document_analyzer', 'output_handlers']
+
+# Dependencies that are only needed once an analysis or export starts
+HEAVY_MODULES = ['fitz', 'numpy', 'pandas', 'PIL', 'pyarrow']
+
+IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(elapsed, ','.join(heavy))
+"""
+
+
+def time_import(module: str, runs: int) -> Tuple[float, List[str]]:
+    """Import a module in fresh interpreters and return (median seconds, heavy modules loaded)"""
+    timings = []
+    heavy: List[str] = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.split()
+        timings.append(float(output[0]))
+        heavy = output[1].split(',') if len(output) > 1 else []
+    return statistics.median(timings), heavy
+
+
+def time_first_window(command: List[str], runs: int) -> Tuple[Optional[float], str]:
+    """Start the GUI until its first window is drawn and return (median seconds, error)"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run(command + ['--exit-after-startup'], cwd=REPO_DIR,
+                                   capture_output=True, text=True)
+        if completed.returncode != 0:
+            lines = completed.stderr.strip().splitlines()
+            return None, lines[-1] if lines else f"exit code {completed.returncode}"
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), ""
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5, help="Runs per measurement")
+    parser.add_argument('--import-budget', type=float, default=0.5,
+                        help="Maximum seconds to import an entry point")
+    parser.add_argument('--window-budget', type=float, default=2.0,
+                        help="Maximum seconds from launch to the first window")
+    parser.add_argument('--executable',
+                        help="Also time the frozen build, e.g. dist/DocumentMarginAnalyzer.exe")
+    parser.add_argument('--skip-window', action='store_true',
+                        help="Only check import times, for machines without a display")
+    args = parser.parse_args()
+    over_budget = 0
+    unavailable = 0
+
+    print("Import time:")
+    for module in IMPORT_MODULES:
+        elapsed, heavy = time_import(module, args.runs)
+        note = f" (loads {', '.join(heavy)})" if heavy else ""
+        print(f"  {module:24s} {elapsed * 1000:8.1f} ms{note}")
+        if elapsed > args.import_budget or heavy:
+            over_budget += 1
+
+    targets = [('script', [sys.executable, os.path.join(REPO_DIR, 'document_analyzer_gui.py')])]
+    if args.executable:
+        targets.append(('frozen', [os.path.abspath(args.executable)]))
+    if args.skip_window:
+        targets = []
+    print("Time to first window:" if targets else "Time to first window: skipped")
+    for name, command in targets:
+        elapsed, error = time_first_window(command, args.runs)
+        if elapsed is None:
+            print(f"  {name:24s} unavailable: {error}")
+            unavailable += 1
+            continue
+        print(f"  {name:24s} {elapsed * 1000:8.1f} ms")
+        if elapsed > args.window_budget:
+            over_budget += 1
+
+    if over_budget:
+        print(f"ERROR: {over_budget} measurements exceed the startup budget")
+        return 1
+
+    if unavailable:
+        print(f"ERROR: {unavailable} measurements could not be taken, "
+              f"pass --skip-window to check only import times")
+        return 2
+
+    print("Startup is within budget" if targets else "Import time is within budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -216,7 +216,20 @@ module_files = [
     'error_handling.py',
     'output_handlers.py',
     'sampling.py',
-    'pdf_utils.py'
+    'pdf_utils.py',
+    'page_cache.py',
+    'result_cache.py',
+    'analysis_settings.py',
+    'processing_engine.py',
+    'memory_budget.py',
+    'prefetch.py',
+    'checkpoint.py',
+    'shard_merge.py',
+    'worker_supervisor.py',
+    'ui_bus.py',
+    'log_view.py',
+    'scan_manifest.py',
+    'document_analyzer.py'
 ]
 
 for module in module_files:
@@ -236,6 +249,7 @@ a = Analysis(
         'pdf2image',
         'pdf2image.pdf2image',
         'concurrent.futures',
+        'multiprocessing',
         'threading',
         'queue',
         'tkinter',
@@ -427,7 +441,20 @@ def verify_module_files():
         'error_handling.py',
         'output_handlers.py',
         'sampling.py',
-        'pdf_utils.py'
+        'pdf_utils.py',
+        'page_cache.py',
+        'result_cache.py',
+        'analysis_settings.py',
+        'processing_engine.py',
+        'memory_budget.py',
+        'prefetch.py',
+        'checkpoint.py',
+        'shard_merge.py',
+        'worker_supervisor.py',
+        'ui_bus.py',
+        'log_view.py',
+        'scan_manifest.py',
+        'document_analyzer.py'
     ]
 
     missing_files = []
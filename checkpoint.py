@@ -0,0 +1,155 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Append-only journal of completed work for resuming interrupted runs"""
+import os
+import hashlib
+from threading import Lock
+from typing import Iterable, Optional, Set, Tuple
+
+import numpy as np
+
+JOURNAL_MAGIC = b"DAJ1\0\0\0\0"
+KEY_SIZE = 8
+SETTINGS_KEY_SIZE = 16
+
+
+def checkpoint_path(output_path: str) -> str:
+    """Get the journal path kept alongside an output file"""
+    return f"{os.path.splitext(output_path)[0]}_checkpoint.journal"
+
+
+class CheckpointJournal:
+    """
+    Journal of files, and page ranges of split PDFs, whose results are written
+
+    Each completed entry is an 8-byte digest of the file path, size,
+    modification time and page range, appended and synced to disk after the
+    results are in the output. Entries from earlier runs are kept as a
+    sorted array searched in O(log n), so tens of millions of entries take
+    8 bytes each. A record torn by a crash is ignored when loading.
+    """
+
+    def __init__(self, path: str, settings_key: str, resume: bool = False):
+        """
+        Open journal
+
+        Args:
+            path: Path to the journal file
+            settings_key: Hex digest of the settings the results depend on
+            resume: Load the entries of an earlier run instead of starting
+                a new journal
+
+        Raises:
+            ValueError: If the journal to resume was written with other settings
+        """
+        self.path = path
+        self.lock = Lock()
+        header = JOURNAL_MAGIC + bytes.fromhex(settings_key)[:SETTINGS_KEY_SIZE]
+        self._completed = np.empty(0, dtype='<u8')
+        self._recent: Set[int] = set()
+
+        if resume and os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            if data[:len(header)] != header:
+                raise ValueError("Checkpoint journal was written with different settings")
+
+            # Drop a record torn by a crash and rewrite the journal without it
+            end = len(data) - (len(data) - len(header)) % KEY_SIZE
+            if end != len(data):
+                with open(path, 'r+b') as f:
+                    f.truncate(end)
+            self._completed = np.sort(np.frombuffer(data, dtype='<u8', offset=len(header),
+                                                    count=(end - len(header)) // KEY_SIZE))
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(header)
+                f.flush()
+                os.fsync(f.fileno())
+
+        self._file = open(path, 'ab')
+
+    @staticmethod
+    def make_key(file_path: str, pages: Optional[Tuple[int, int]] = None) -> int:
+        """
+        Derive the journal key of a file or a page range in its current version
+
+        Args:
+            file_path: Path to the file
+            pages: Start and stop page, None for the whole file
+
+        Returns:
+            64-bit key
+        """
+        stat = os.stat(file_path)
+        identity = f"{os.path.abspath(file_path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0{pages}"
+        return int.from_bytes(
+            hashlib.blake2b(identity.encode('utf-8', 'surrogatepass'), digest_size=KEY_SIZE).digest(),
+            'little'
+        )
+
+    def count(self) -> int:
+        """Get the number of completed entries"""
+        with self.lock:
+            return len(self._completed) + len(self._recent)
+
+    def is_completed(self, file_path: str, pages: Optional[Tuple[int, int]] = None) -> bool:
+        """
+        Check whether a file or page range was completed by an earlier run
+
+        Args:
+            file_path: Path to the file
+            pages: Start and stop page, None for the whole file
+
+        Returns:
+            True if its results are already in the output
+        """
+        try:
+            key = self.make_key(file_path, pages)
+        except OSError:
+            return False
+
+        with self.lock:
+            if key in self._recent:
+                return True
+            index = np.searchsorted(self._completed, np.uint64(key))
+            return index < len(self._completed) and int(self._completed[index]) == key
+
+    def record(self, keys: Iterable[int]):
+        """
+        Append completed entries and sync them to disk
+
+        Args:
+            keys: Keys from make_key of work whose results were written
+        """
+        keys = list(keys)
+        if not keys:
+            return
+
+        with self.lock:
+            self._file.write(np.array(keys, dtype='<u8').tobytes())
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._recent.update(keys)
+
+    def close(self):
+        """Close the journal file"""
+        with self.lock:
+            if not self._file.closed:
+                self._file.close()
@@ -18,9 +18,14 @@ from PIL import Image
 import numpy as np
 import math
 import os
+import logging
+from contextlib import contextmanager
 from typing import Dict, Any, Tuple, Optional, List
 from dataclasses import dataclass
 
+from memory_budget import MemoryBudget, BYTES_PER_MB
+from page_cache import PageFingerprinter, PageResultCache
+
 
 @dataclass
 class MarginMeasurements:
@@ -55,37 +60,121 @@ class MarginAnalysisResult:
     top_content_percentage: float
     bottom_content_percentage: float
     total_content_percentage: float
+    dpi: Optional[int] = None  # Resolution that produced the raster verdict
+    detector: str = "raster"  # "raster", or "vector" when decided from geometry alone
+
+
+@dataclass
+class PageEvaluation:
+    """Stores the text and image analysis results of a single page"""
+    text_analysis: MarginAnalysisResult
+    image_analysis: Optional[MarginAnalysisResult]
+    image_top_checked: bool = True
+    image_bottom_checked: bool = True
+
+    @property
+    def has_top_content(self) -> bool:
+        """Check whether either detector found content in the top margin"""
+        return self.text_analysis.has_top_content or bool(
+            self.image_analysis and self.image_top_checked and
+            self.image_analysis.has_top_content)
+
+    @property
+    def has_bottom_content(self) -> bool:
+        """Check whether either detector found content in the bottom margin"""
+        return self.text_analysis.has_bottom_content or bool(
+            self.image_analysis and self.image_bottom_checked and
+            self.image_analysis.has_bottom_content)
+
+    @property
+    def decided_by(self) -> str:
+        """Name the detectors that settled the verdict of each margin"""
+        detectors = []
+        for text_found, image_checked in (
+                (self.text_analysis.has_top_content, self.image_top_checked),
+                (self.text_analysis.has_bottom_content, self.image_bottom_checked)):
+            if text_found:
+                detector = "text"
+            elif self.image_analysis and image_checked:
+                detector = self.image_analysis.detector
+            else:
+                continue
+            if detector not in detectors:
+                detectors.append(detector)
+
+        return " + ".join(detectors)
 
 
 class ContentAnalyzer:
     """Analyzes document content for margin violations"""
 
     DEFAULT_THRESHOLD = 1.0  # Updated default threshold
-
-    def __init__(self, threshold: float = DEFAULT_THRESHOLD, dpi: int = 200):
+    INK_LEVEL = 250  # Gray values below this indicate non-white content
+
+    DEFAULT_PROBE_DPI = 72
+    DEFAULT_DPI_UNCERTAINTY = 0.5
+    DEFAULT_MIN_DPI = 72
+    DEFAULT_MAX_TILE_PIXELS = 16 * 1024 * 1024
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, dpi: int = 200,
+                 fast_raster: bool = False, adaptive_dpi: bool = False,
+                 probe_dpi: int = DEFAULT_PROBE_DPI,
+                 dpi_uncertainty: float = DEFAULT_DPI_UNCERTAINTY,
+                 vector_first: bool = False,
+                 memory_budget: Optional[MemoryBudget] = None,
+                 min_dpi: int = DEFAULT_MIN_DPI,
+                 max_tile_pixels: int = DEFAULT_MAX_TILE_PIXELS):
         """
         Initialize analyzer with settings
 
         Args:
             threshold: Percentage threshold for content detection (0.1-10.0)
             dpi: DPI for image conversion
+            fast_raster: Render without anti-aliasing and without annotations
+            adaptive_dpi: Probe margin bands at probe_dpi before rendering at dpi
+            probe_dpi: Low resolution used for the adaptive probe
+            dpi_uncertainty: Percentage points around the threshold within which
+                a probe result is escalated to full resolution
+            vector_first: Skip rendering margin bands that have nothing drawn in them
+            memory_budget: Budget every render must be admitted by, renders that
+                could never fit are made at a lower resolution
+            min_dpi: Lowest resolution a render may be degraded to
+            max_tile_pixels: Largest area rendered at once when rendering
+                margin bands, which bounds the pixmap memory per render
         """
         # Validate threshold range
         if not 0.1 <= threshold <= 10.0:
             raise ValueError("Threshold must be between 0.1 and 10.0")
 
+        if adaptive_dpi:
+            if not 1 <= probe_dpi <= dpi:
+                raise ValueError("Probe DPI must be between 1 and the analysis DPI")
+            if dpi_uncertainty < 0:
+                raise ValueError("DPI uncertainty must not be negative")
+
         self.threshold = threshold
         self.dpi = dpi
+        self.fast_raster = fast_raster
+        self.adaptive_dpi = adaptive_dpi
+        self.probe_dpi = probe_dpi
+        self.dpi_uncertainty = dpi_uncertainty
+        self.vector_first = vector_first
+        self.memory_budget = memory_budget
+        self.min_dpi = min(min_dpi, dpi)
+        self.max_tile_pixels = max(1, max_tile_pixels)
+        self.degraded_renders = 0
         self.inch_to_pt = 72
         self.margin = 0.5 * self.inch_to_pt  # 0.5 inch margins
 
-    def get_measurements(self, width: int, height: int) -> MarginMeasurements:
+    def get_measurements(self, width: int, height: int,
+                         dpi: Optional[int] = None) -> MarginMeasurements:
         """Calculate margin measurements for given dimensions"""
-        margin_pixels = math.ceil(self.margin * (self.dpi / self.inch_to_pt))
+        dpi = dpi or self.dpi
+        margin_pixels = math.ceil(self.margin * (dpi / self.inch_to_pt))
         return MarginMeasurements(
             width=width,
             height=height,
-            dpi=self.dpi,
+            dpi=dpi,
             margin_pixels=margin_pixels,
             threshold=self.threshold
         )
@@ -100,9 +189,6 @@ class ContentAnalyzer:
         Returns:
             MarginAnalysisResult with analysis details
         """
-        # Print initial threshold value
-        print(f"\nAnalyzing with threshold: {self.threshold}%")
-
         # Convert image to grayscale for more accurate content detection
         gray_image = image.convert('L')
 
@@ -112,21 +198,348 @@ class ContentAnalyzer:
         # Convert to numpy array for efficient processing
         img_array = np.array(gray_image)
 
-        # Analyze top margin
-        top_margin = img_array[:measurements.margin_pixels, :]
-        top_pixels = np.sum(top_margin < 250)  # Less than 250 indicates non-white
-        top_percentage = (top_pixels / (measurements.width * measurements.margin_pixels)) * 100
+        return self._build_result(
+            int(np.count_nonzero(img_array[:measurements.margin_pixels, :] < self.INK_LEVEL)),
+            int(np.count_nonzero(img_array[-measurements.margin_pixels:, :] < self.INK_LEVEL)),
+            measurements
+        )
+
+    def get_band_clips(self, page: fitz.Page, dpi: Optional[int] = None
+                       ) -> Tuple[fitz.Matrix, fitz.IRect, fitz.IRect, MarginMeasurements]:
+        """
+        Calculate the pixel rectangles of the top and bottom margin bands
+
+        The bands are expressed in the pixel grid of a full-page render, so
+        rendering them with a clip produces exactly the rows that the full
+        page render would have produced.
+
+        Args:
+            page: fitz.Page object
+            dpi: Render resolution, defaults to the analyzer DPI
+
+        Returns:
+            Tuple of (render matrix, top band IRect, bottom band IRect, measurements)
+        """
+        dpi = dpi or self.dpi
+        zoom = dpi / self.inch_to_pt
+        matrix = fitz.Matrix(zoom, zoom)
+        page_irect = (page.rect * matrix).irect
+        measurements = self.get_measurements(page_irect.width, page_irect.height, dpi)
+        margin_pixels = min(measurements.margin_pixels, page_irect.height)
+
+        top_band = fitz.IRect(page_irect.x0, page_irect.y0,
+                              page_irect.x1, page_irect.y0 + margin_pixels)
+        bottom_band = fitz.IRect(page_irect.x0, page_irect.y1 - margin_pixels,
+                                 page_irect.x1, page_irect.y1)
+        return matrix, top_band, bottom_band, measurements
+
+    def predict_render_bytes(self, page: fitz.Page, dpi: int, full_page: bool = False) -> int:
+        """
+        Predict the size of the largest pixmap needed to analyze a page
+
+        Args:
+            page: fitz.Page object
+            dpi: Render resolution
+            full_page: Whether the whole page is rendered instead of the bands
+
+        Returns:
+            Size in bytes of a grayscale pixmap without alpha
+        """
+        _, top_band, _, measurements = self.get_band_clips(page, dpi)
+        if full_page:
+            return measurements.width * measurements.height
+        return max(tile.width * tile.height for tile in self.band_tiles(top_band))
+
+    def admissible_dpi(self, page: fitz.Page, dpi: int, full_page: bool = False) -> int:
+        """
+        Find the highest resolution up to dpi whose renders fit in the memory budget
+
+        Args:
+            page: fitz.Page object
+            dpi: Requested render resolution
+            full_page: Whether the whole page is rendered instead of the bands
+
+        Returns:
+            dpi, or a lower resolution no smaller than min_dpi
+        """
+        if self.memory_budget is None:
+            return dpi
+
+        predicted = self.predict_render_bytes(page, dpi, full_page)
+        if self.memory_budget.fits(predicted):
+            return dpi
+
+        # Pixmap size grows with the square of the resolution
+        degraded = max(self.min_dpi, int(dpi * math.sqrt(self.memory_budget.capacity / predicted)))
+        while degraded > self.min_dpi and \
+                not self.memory_budget.fits(self.predict_render_bytes(page, degraded, full_page)):
+            degraded -= 1
+
+        self.degraded_renders += 1
+        logging.debug(f"Page {page.number + 1} needs {predicted:,} bytes at {dpi} DPI, "
+                      f"rendering at {degraded} DPI")
+        return degraded
+
+    @contextmanager
+    def memory_reservation(self, nbytes: int):
+        """Hold nbytes of the memory budget while a pixmap is alive"""
+        if self.memory_budget is None:
+            yield
+            return
+
+        with self.memory_budget.reserve(nbytes):
+            yield
+
+    @contextmanager
+    def _raster_profile(self):
+        """Apply the fast raster profile for the duration of a render"""
+        if not self.fast_raster:
+            yield
+            return
+
+        # Anti-aliasing is a process-wide MuPDF setting, so restore it afterwards
+        aa_levels = fitz.TOOLS.show_aa_level()
+        fitz.TOOLS.set_aa_level(0)
+        try:
+            yield
+        finally:
+            mupdf = getattr(fitz, 'mupdf', None)
+            if mupdf is not None:
+                mupdf.fz_set_graphics_aa_level(aa_levels['graphics'])
+                mupdf.fz_set_text_aa_level(aa_levels['text'])
+            else:
+                # The classic bindings only set both levels at once
+                fitz.TOOLS.set_aa_level(aa_levels['graphics'])
+
+    def render_pixmap(self, page: fitz.Page, matrix: fitz.Matrix,
+                      clip: Optional[fitz.Rect] = None) -> fitz.Pixmap:
+        """
+        Render a page (or part of it) as a grayscale pixmap without alpha
+
+        Args:
+            page: fitz.Page object
+            matrix: Render matrix
+            clip: Optional area of the page to render
+
+        Returns:
+            Grayscale fitz.Pixmap
+        """
+        with self._raster_profile():
+            return page.get_pixmap(matrix=matrix, clip=clip, colorspace=fitz.csGRAY,
+                                   alpha=False, annots=not self.fast_raster)
+
+    @staticmethod
+    def pixmap_array(pix: fitz.Pixmap) -> np.ndarray:
+        """
+        View the samples of a grayscale pixmap as a 2D array without copying
+
+        The returned array shares memory with the pixmap, so it must not be
+        used after the pixmap has been released.
+
+        Args:
+            pix: Grayscale pixmap without alpha
+
+        Returns:
+            2D uint8 array of gray values
+        """
+        if pix.n != 1:
+            raise ValueError("Pixmap must be grayscale without alpha")
+        samples = np.frombuffer(pix.samples_mv, dtype=np.uint8)
+        return samples.reshape(pix.height, pix.stride)[:, :pix.width]
+
+    def band_tiles(self, band: fitz.IRect) -> List[fitz.IRect]:
+        """
+        Split a band into tiles of at most max_tile_pixels pixels
 
-        # Analyze bottom margin
-        bottom_margin = img_array[-measurements.margin_pixels:, :]
-        bottom_pixels = np.sum(bottom_margin < 250)
+        Whole rows are kept together where possible, so a band is cut into
+        horizontal strips, and a strip wider than the tile size into pieces.
+
+        Args:
+            band: Band rectangle in full-page pixel coordinates
+
+        Returns:
+            List of tiles covering the band
+        """
+        if band.is_empty or band.width * band.height <= self.max_tile_pixels:
+            return [band]
+
+        tile_height = max(1, min(band.height, self.max_tile_pixels // band.width))
+        tile_width = max(1, min(band.width, self.max_tile_pixels // tile_height))
+        return [
+            fitz.IRect(x, y, min(x + tile_width, band.x1), min(y + tile_height, band.y1))
+            for y in range(band.y0, band.y1, tile_height)
+            for x in range(band.x0, band.x1, tile_width)
+        ]
+
+    def count_band_ink(self, page: fitz.Page, matrix: fitz.Matrix, band: fitz.IRect) -> int:
+        """
+        Render a single margin band tile by tile and count its non-white pixels
+
+        Args:
+            page: fitz.Page object
+            matrix: Render matrix returned by get_band_clips
+            band: Band rectangle in full-page pixel coordinates
+
+        Returns:
+            Number of non-white pixels in the band
+        """
+        return sum(self._count_tile_ink(page, matrix, tile) for tile in self.band_tiles(band))
+
+    def _count_tile_ink(self, page: fitz.Page, matrix: fitz.Matrix, tile: fitz.IRect) -> int:
+        """Render one tile of a band and count its non-white pixels"""
+        # Reserve room for the one pixel MuPDF may add on each side
+        with self.memory_reservation((tile.width + 2) * (tile.height + 2)):
+            pix = self.render_pixmap(page, matrix, clip=fitz.Rect(tile) * ~matrix)
+            tile_array = self.pixmap_array(pix)
+
+            # MuPDF rounds the clip outwards, so cut the result back to the tile
+            row_start = tile.y0 - pix.y
+            col_start = tile.x0 - pix.x
+            tile_array = tile_array[row_start:row_start + tile.height,
+                                    col_start:col_start + tile.width]
+            ink = int(np.count_nonzero(tile_array < self.INK_LEVEL))
+            del tile_array, pix
+        return ink
+
+    def analyze_pixmap(self, pix: fitz.Pixmap, dpi: Optional[int] = None) -> MarginAnalysisResult:
+        """
+        Analyze a rendered grayscale page pixmap for content in margins
+
+        Args:
+            pix: Grayscale pixmap without alpha
+            dpi: Resolution the pixmap was rendered at, defaults to the analyzer DPI
+
+        Returns:
+            MarginAnalysisResult with analysis details
+        """
+        img_array = self.pixmap_array(pix)
+        measurements = self.get_measurements(pix.width, pix.height, dpi)
+
+        return self._build_result(
+            int(np.count_nonzero(img_array[:measurements.margin_pixels, :] < self.INK_LEVEL)),
+            int(np.count_nonzero(img_array[-measurements.margin_pixels:, :] < self.INK_LEVEL)),
+            measurements
+        )
+
+    def analyze_drawn_bands(self, page: fitz.Page) -> Tuple[bool, bool]:
+        """
+        Determine from drawing geometry whether anything is drawn in the margin bands
+
+        Uses the bounding boxes MuPDF reports for every text span, path, image
+        and shading on the page. A band with nothing drawn in it renders as
+        pure white, so it cannot contain content at any threshold.
+
+        Args:
+            page: fitz.Page object
+
+        Returns:
+            Tuple of (something drawn in top band, something drawn in bottom band)
+        """
+        # Annotations are rendered on top of the page contents
+        if not self.fast_raster and page.first_annot:
+            return True, True
+
+        matrix, top_band, bottom_band, _ = self.get_band_clips(page)
+
+        # Allow one pixel of anti-aliasing bleed around the bands
+        bleed = self.inch_to_pt / self.dpi
+        top_rect = (fitz.Rect(top_band) * ~matrix) + (-bleed, -bleed, bleed, bleed)
+        bottom_rect = (fitz.Rect(bottom_band) * ~matrix) + (-bleed, -bleed, bleed, bleed)
+
+        top_drawn = False
+        bottom_drawn = False
+        rotation = page.rotation_matrix
+        for item_type, bbox in page.get_bboxlog():
+            # Skip clipping, grouping and invisible text entries
+            if not item_type.startswith(("fill-", "stroke-")):
+                continue
+
+            rect = fitz.Rect(bbox) * rotation
+            top_drawn = top_drawn or self._overlaps(rect, top_rect)
+            bottom_drawn = bottom_drawn or self._overlaps(rect, bottom_rect)
+            if top_drawn and bottom_drawn:
+                break
+
+        return top_drawn, bottom_drawn
+
+    @staticmethod
+    def _overlaps(rect: fitz.Rect, band: fitz.Rect) -> bool:
+        """Check whether a drawn item's bounding box reaches into a band"""
+        return (rect.x0 <= band.x1 and rect.x1 >= band.x0 and
+                rect.y0 <= band.y1 and rect.y1 >= band.y0)
+
+    def analyze_page_margins(self, page: fitz.Page, check_top: bool = True,
+                             check_bottom: bool = True) -> MarginAnalysisResult:
+        """
+        Analyze rendered page content in margins by rendering only the margin bands
+
+        Produces the same result as rendering the full page and passing it to
+        analyze_pixmap, without rasterizing the body of the page. In adaptive
+        mode the bands are first probed at a low resolution, and only rendered
+        at full resolution when the probe is too close to the threshold. In
+        vector-first mode bands with nothing drawn in them are not rendered.
+
+        Args:
+            page: fitz.Page object
+            check_top: Whether the top band needs to be analyzed
+            check_bottom: Whether the bottom band needs to be analyzed
+
+        Returns:
+            MarginAnalysisResult with analysis details, bands that are not
+            checked are reported as empty
+        """
+        render_top, render_bottom = check_top, check_bottom
+        if self.vector_first:
+            top_drawn, bottom_drawn = self.analyze_drawn_bands(page)
+            render_top, render_bottom = render_top and top_drawn, render_bottom and bottom_drawn
+            if not (render_top or render_bottom):
+                _, _, _, measurements = self.get_band_clips(page)
+                return self._build_result(0, 0, measurements, detector="vector")
+
+        dpi = self.admissible_dpi(page, self.dpi)
+        if self.adaptive_dpi and self.probe_dpi < dpi:
+            probe = self._analyze_bands_at(page, self.probe_dpi, render_top, render_bottom)
+            if not self._is_uncertain(probe, render_top, render_bottom):
+                return probe
+
+        return self._analyze_bands_at(page, dpi, render_top, render_bottom)
+
+    def _analyze_bands_at(self, page: fitz.Page, dpi: int, render_top: bool = True,
+                          render_bottom: bool = True) -> MarginAnalysisResult:
+        """Render the margin bands at the given resolution and analyze them"""
+        matrix, top_band, bottom_band, measurements = self.get_band_clips(page, dpi)
+
+        return self._build_result(
+            self.count_band_ink(page, matrix, top_band) if render_top else 0,
+            self.count_band_ink(page, matrix, bottom_band) if render_bottom else 0,
+            measurements
+        )
+
+    def _is_uncertain(self, result: MarginAnalysisResult, check_top: bool = True,
+                      check_bottom: bool = True) -> bool:
+        """Check whether a probe result is too close to the threshold to trust"""
+        percentages = []
+        if check_top:
+            percentages.append(result.top_content_percentage)
+        if check_bottom:
+            percentages.append(result.bottom_content_percentage)
+
+        return any(
+            abs(percentage - self.threshold) <= self.dpi_uncertainty
+            for percentage in percentages
+        )
+
+    def _build_result(self, top_pixels: int, bottom_pixels: int,
+                      measurements: MarginMeasurements,
+                      detector: str = "raster") -> MarginAnalysisResult:
+        """Calculate margin content percentages from non-white pixel counts"""
+        logging.debug(f"Analyzing with threshold: {self.threshold}%")
+
+        # Analyze top and bottom margins
+        top_percentage = (top_pixels / (measurements.width * measurements.margin_pixels)) * 100
         bottom_percentage = (bottom_pixels / (measurements.width * measurements.margin_pixels)) * 100
 
-        # Debug print
-        print(f"Top percentage: {top_percentage}%")
-        print(f"Bottom percentage: {bottom_percentage}%")
-        print(f"Threshold comparison: {top_percentage} > {self.threshold} = {top_percentage > self.threshold}")
-        print(f"                     {bottom_percentage} > {self.threshold} = {bottom_percentage > self.threshold}")
+        logging.debug(f"Top percentage: {top_percentage}%, bottom percentage: {bottom_percentage}%")
 
         # Calculate total affected area
         total_margin_pixels = 2 * measurements.width * measurements.margin_pixels
@@ -137,11 +550,13 @@ class ContentAnalyzer:
             has_bottom_content=bottom_percentage > self.threshold,
             top_content_percentage=top_percentage,
             bottom_content_percentage=bottom_percentage,
-            total_content_percentage=total_percentage
+            total_content_percentage=total_percentage,
+            dpi=measurements.dpi if detector == "raster" else None,
+            detector=detector
         )
 
-        print(f"Final has_top_content: {result.has_top_content}")
-        print(f"Final has_bottom_content: {result.has_bottom_content}")
+        logging.debug(f"Final has_top_content: {result.has_top_content}, "
+                      f"has_bottom_content: {result.has_bottom_content}")
 
         return result
 
@@ -165,33 +580,18 @@ class ContentAnalyzer:
         has_bottom_content = False
         top_content_area = 0
         bottom_content_area = 0
-        margin_violations = {"top": [], "bottom": []}
-
-        # Analyze text blocks
-        blocks = page.get_text("dict")["blocks"]
-        for block in blocks:
-            if block['type'] == 0:  # Text block
-                bbox = block["bbox"]
-                text = " ".join([span["text"] for line in block["lines"]
-                                 for span in line["spans"]]).strip()
-
-                if not text:  # Skip empty blocks
-                    continue
-
-                # Calculate block area in margins
-                if bbox[1] <= measurements.margin_pixels:  # Top margin
-                    has_top_content = True
-                    area = self._calculate_overlap_area(
-                        bbox, 0, measurements.margin_pixels)
-                    top_content_area += area
-                    margin_violations["top"].append((text, area))
-
-                if bbox[3] >= measurements.bottom_margin:  # Bottom margin
-                    has_bottom_content = True
-                    area = self._calculate_overlap_area(
-                        bbox, measurements.bottom_margin, measurements.height)
-                    bottom_content_area += area
-                    margin_violations["bottom"].append((text, area))
+
+        # Analyze text block bounding boxes
+        for bbox in self._text_block_bboxes(page):
+            if bbox[1] <= measurements.margin_pixels:  # Top margin
+                has_top_content = True
+                top_content_area += self._calculate_overlap_area(
+                    bbox, 0, measurements.margin_pixels)
+
+            if bbox[3] >= measurements.bottom_margin:  # Bottom margin
+                has_bottom_content = True
+                bottom_content_area += self._calculate_overlap_area(
+                    bbox, measurements.bottom_margin, measurements.height)
 
         # Calculate percentages (still calculate these for reporting purposes)
         margin_area = measurements.width * measurements.margin_pixels
@@ -205,9 +605,30 @@ class ContentAnalyzer:
             has_bottom_content=has_bottom_content,  # Any text in margin is a violation
             top_content_percentage=top_percentage,
             bottom_content_percentage=bottom_percentage,
-            total_content_percentage=total_percentage
+            total_content_percentage=total_percentage,
+            detector="text"
         )
 
+    @staticmethod
+    def _text_block_bboxes(page: fitz.Page) -> List[Tuple[float, float, float, float]]:
+        """
+        Get the bounding boxes of the non-empty text blocks of a page
+
+        Uses MuPDF's block extraction, which returns one tuple per block
+        instead of building Python dicts for every line and span.
+
+        Args:
+            page: fitz.Page object
+
+        Returns:
+            List of text block bounding boxes
+        """
+        blocks = page.get_text("blocks", flags=fitz.TEXT_MEDIABOX_CLIP)
+        return [
+            block[:4] for block in blocks
+            if block[6] == 0 and block[4].strip()  # Skip image and empty blocks
+        ]
+
     def _calculate_overlap_area(self, bbox: Tuple[float, float, float, float],
                                 margin_start: float, margin_end: float) -> float:
         """Calculate area of overlap between text block and margin"""
@@ -220,20 +641,35 @@ class ContentAnalyzer:
 class PageAnalyzer:
     """Analyzes complete pages combining text and image analysis"""
 
-    def __init__(self, settings: 'AnalysisSettings'):
+    def __init__(self, settings: 'AnalysisSettings', memory_budget: Optional[MemoryBudget] = None):
         """
         Initialize page analyzer
 
         Args:
             settings: Analysis settings including threshold
+            memory_budget: Render memory budget shared with other processes,
+                a private budget of settings.memory_budget_mb is used if omitted
         """
-        # Add debug print to verify the threshold
-        print(f"Initializing PageAnalyzer with threshold: {settings.threshold}%")
-        self.content_analyzer = ContentAnalyzer(threshold=settings.threshold)
+        logging.debug(f"Initializing PageAnalyzer with threshold: {settings.threshold}%")
+        self.content_analyzer = ContentAnalyzer(
+            threshold=settings.threshold,
+            dpi=settings.dpi,
+            fast_raster=settings.fast_raster,
+            adaptive_dpi=settings.adaptive_dpi,
+            probe_dpi=settings.probe_dpi,
+            dpi_uncertainty=settings.dpi_uncertainty,
+            vector_first=settings.vector_first,
+            memory_budget=memory_budget or MemoryBudget(settings.memory_budget_mb * BYTES_PER_MB),
+            min_dpi=settings.min_dpi,
+            max_tile_pixels=int(settings.tile_size_mb * BYTES_PER_MB)
+        )
         self.settings = settings
 
-        # Verify the threshold was set correctly
-        print(f"ContentAnalyzer threshold set to: {self.content_analyzer.threshold}%")
+        # Pages sharing content streams and resources are only analyzed once
+        self.fingerprinter = PageFingerprinter()
+        self.page_cache = PageResultCache(settings.page_cache_size)
+
+        logging.debug(f"ContentAnalyzer threshold set to: {self.content_analyzer.threshold}%")
 
     def analyze_pdf_page(self, page: fitz.Page, file_name: str,
                          page_num: int) -> Dict[str, Any]:
@@ -248,20 +684,15 @@ class PageAnalyzer:
         Returns:
             Dictionary containing analysis results
         """
-        # Analyze text content
-        text_analysis = self.content_analyzer.analyze_text_blocks(page)
-
-        # Convert to image and analyze
-        pix = page.get_pixmap(matrix=fitz.Matrix(
-            self.content_analyzer.dpi / 72, self.content_analyzer.dpi / 72))
-        image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        image_analysis = self.content_analyzer.analyze_image_content(image)
+        evaluation = self.evaluate_page_cached(page)
+        text_analysis = evaluation.text_analysis
+        image_analysis = evaluation.image_analysis
 
         # Determine overall content status
         locations = []
-        if text_analysis.has_top_content or image_analysis.has_top_content:
+        if evaluation.has_top_content:
             locations.append("header")
-        if text_analysis.has_bottom_content or image_analysis.has_bottom_content:
+        if evaluation.has_bottom_content:
             locations.append("footer")
 
         content_status = (
@@ -274,35 +705,130 @@ class PageAnalyzer:
             "File": file_name,
             "Page": page_num + 1,
             "Content Status": content_status,
+            "Decided By": evaluation.decided_by or "n/a",
             "Text Status": self._format_text_status(text_analysis),
-            "Image Status": self._format_image_status(image_analysis),
+            "Image Status": (self._format_image_status(image_analysis) if image_analysis
+                             else "Not evaluated"),
             "Type": "PDF",
             "Analysis Details": {
                 "Text": {
                     "Top Content": f"{text_analysis.top_content_percentage:.1f}%",
                     "Bottom Content": f"{text_analysis.bottom_content_percentage:.1f}%",
                 },
-                "Image": {
-                    "Top Content": f"{image_analysis.top_content_percentage:.1f}%",
-                    "Bottom Content": f"{image_analysis.bottom_content_percentage:.1f}%",
-                }
+                "Image": self._format_image_details(evaluation)
             }
         }
 
         return result
 
-    def analyze_image_file(self, image_path: str) -> Dict[str, Any]:
+    def evaluate_page_cached(self, page: fitz.Page) -> PageEvaluation:
+        """
+        Evaluate a PDF page, reusing the result of an identical earlier page
+
+        Args:
+            page: fitz.Page object to analyze
+
+        Returns:
+            PageEvaluation with the results of both detectors
+        """
+        if self.page_cache.max_entries <= 0:
+            return self.evaluate_page(page)
+
+        try:
+            key = self.fingerprinter.fingerprint(page)
+        except Exception as e:
+            logging.warning(f"Could not fingerprint page {page.number + 1}: {str(e)}")
+            return self.evaluate_page(page)
+
+        evaluation = self.page_cache.get(key)
+        if evaluation is None:
+            evaluation = self.evaluate_page(page)
+            self.page_cache.put(key, evaluation)
+
+        return evaluation
+
+    def get_result_settings(self) -> Dict[str, Any]:
+        """
+        Get the settings that affect analysis results
+
+        Returns:
+            Dictionary of setting names and values, suitable for keying
+            persisted results
+        """
+        analyzer = self.content_analyzer
+        return {
+            "threshold": analyzer.threshold,
+            "dpi": analyzer.dpi,
+            "margin": analyzer.margin,
+            "ink_level": analyzer.INK_LEVEL,
+            "fast_raster": analyzer.fast_raster,
+            "adaptive_dpi": analyzer.adaptive_dpi,
+            "probe_dpi": analyzer.probe_dpi,
+            "dpi_uncertainty": analyzer.dpi_uncertainty,
+            "vector_first": analyzer.vector_first,
+            "band_render": self.settings.band_render,
+            "evaluation_mode": self.settings.evaluation_mode,
+            # Pages too large for the memory budget are rendered at lower DPI
+            "memory_budget_mb": self.settings.memory_budget_mb,
+            "min_dpi": self.settings.min_dpi,
+            "tile_size_mb": self.settings.tile_size_mb
+        }
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Get page result cache hit and miss counts"""
+        return self.page_cache.get_stats()
+
+    def evaluate_page(self, page: fitz.Page) -> PageEvaluation:
+        """
+        Run the text and image analysis of a PDF page
+
+        In verdict evaluation mode, margins that already contain text are not
+        rendered, since the text alone makes them a violation.
+
+        Args:
+            page: fitz.Page object to analyze
+
+        Returns:
+            PageEvaluation with the results of both detectors
+        """
+        # Analyze text content
+        text_analysis = self.content_analyzer.analyze_text_blocks(page)
+
+        check_top, check_bottom = True, True
+        if self.settings.evaluation_mode == "verdict":
+            check_top = not text_analysis.has_top_content
+            check_bottom = not text_analysis.has_bottom_content
+            if not (check_top or check_bottom):
+                return PageEvaluation(text_analysis, None, False, False)
+
+        # Render and analyze the page content
+        if self.settings.band_render:
+            image_analysis = self.content_analyzer.analyze_page_margins(
+                page, check_top, check_bottom)
+        else:
+            analyzer = self.content_analyzer
+            dpi = analyzer.admissible_dpi(page, analyzer.dpi, full_page=True)
+            with analyzer.memory_reservation(analyzer.predict_render_bytes(page, dpi, True)):
+                pix = analyzer.render_pixmap(page, fitz.Matrix(dpi / 72, dpi / 72))
+                image_analysis = analyzer.analyze_pixmap(pix, dpi)
+                del pix
+            check_top, check_bottom = True, True
+
+        return PageEvaluation(text_analysis, image_analysis, check_top, check_bottom)
+
+    def analyze_image_file(self, image_path: str, source_path: Optional[str] = None) -> Dict[str, Any]:
         """
         Analyze an image file for margin content
 
         Args:
             image_path: Path to image file
+            source_path: Local copy of the file to read instead of image_path
 
         Returns:
             Dict containing analysis results
         """
         try:
-            with Image.open(image_path) as image:
+            with Image.open(source_path or image_path) as image:
                 image = image.convert('RGB')
                 analysis = self.content_analyzer.analyze_image_content(image)
 
@@ -367,6 +893,22 @@ class PageAnalyzer:
 
         return f"Text found in {' and '.join(locations)}"
 
+    def _format_image_details(self, evaluation: PageEvaluation) -> Dict[str, str]:
+        """Format image analysis percentages, marking margins that were not rendered"""
+        analysis = evaluation.image_analysis
+        if not analysis:
+            return {"Top Content": "n/a", "Bottom Content": "n/a",
+                    "Resolution": "n/a", "Detector": "n/a"}
+
+        return {
+            "Top Content": (f"{analysis.top_content_percentage:.1f}%"
+                            if evaluation.image_top_checked else "n/a"),
+            "Bottom Content": (f"{analysis.bottom_content_percentage:.1f}%"
+                               if evaluation.image_bottom_checked else "n/a"),
+            "Resolution": f"{analysis.dpi} DPI" if analysis.dpi else "n/a",
+            "Detector": analysis.detector,
+        }
+
     def _format_image_status(self, analysis: MarginAnalysisResult) -> str:
         """Format image analysis result as status message"""
         locations = []
@@ -168,6 +168,19 @@ def copy_required_files(source_dir: str, temp_dir: str):
         'output_handlers.py',
         'sampling.py',
         'pdf_utils.py',
+        'page_cache.py',
+        'result_cache.py',
+        'analysis_settings.py',
+        'processing_engine.py',
+        'memory_budget.py',
+        'prefetch.py',
+        'checkpoint.py',
+        'shard_merge.py',
+        'worker_supervisor.py',
+        'ui_bus.py',
+        'log_view.py',
+        'scan_manifest.py',
+        'document_analyzer.py',
         'build_config.py',
         'README.md',
         'requirements.txt',
@@ -0,0 +1,473 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Headless command line entry point for batch servers and containers"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import multiprocessing
+from dataclasses import fields
+from typing import List, Dict, Any, Optional
+
+from analysis_settings import AnalysisSettings
+from sampling import FileProcessor, SamplingCalculator, SamplingParameters, shard_of, shard_output_path
+from scan_manifest import ScanManifest
+
+# Exit codes
+EXIT_OK = 0  # Every file was analyzed
+EXIT_FILE_ERRORS = 1  # The run completed but some files failed
+EXIT_USAGE = 2  # Invalid arguments, job file or settings
+EXIT_NO_FILES = 3  # No matching files were found
+EXIT_FAILED = 4  # The run could not complete, such as when the output cannot be written
+EXIT_INTERRUPTED = 130  # Stopped by Ctrl+C, a resumable checkpoint is kept
+
+SUPPORTED_FORMATS = {'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp'}
+DEFAULT_EXCLUDED_FOLDERS = {'$RECYCLE.BIN', 'System Volume Information'}
+OUTPUT_EXTENSIONS = {'.csv': 'csv', '.parquet': 'parquet', '.db': 'sqlite'}
+
+# Job file keys that are not analysis settings
+JOB_KEYS = {'folder', 'output', 'workers'}
+
+
+def load_job_file(path: str) -> Dict[str, Any]:
+    """
+    Load a JSON or TOML job file
+
+    Args:
+        path: Path to a .json or .toml file
+
+    Returns:
+        Job options, folder, output and workers along with any AnalysisSettings fields
+
+    Raises:
+        ValueError: If the file cannot be parsed or contains unknown keys
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if path.lower().endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ValueError("TOML job files need Python 3.11 or the tomli package")
+        job = tomllib.loads(data.decode('utf-8'))
+    else:
+        job = json.loads(data)
+
+    if not isinstance(job, dict):
+        raise ValueError("Job file must contain a table of options")
+
+    unknown = set(job) - JOB_KEYS - {field.name for field in fields(AnalysisSettings)}
+    if unknown:
+        raise ValueError(f"Unknown job file options: {', '.join(sorted(unknown))}")
+    return job
+
+
+def parse_arguments(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options, options left unset fall back to the job file"""
+    parser = argparse.ArgumentParser(
+        prog="document_analyzer",
+        description="Analyze document margins without the graphical interface"
+    )
+    parser.add_argument("folder", nargs='?', help="Folder to scan for PDF and image files")
+    parser.add_argument("-o", "--output", help="Output file, the format follows the extension "
+                                               "(.csv, .parquet or .db) unless --format is given")
+    parser.add_argument("--job", help="JSON or TOML job file with the folder, output and settings")
+    parser.add_argument("--format", dest="output_format", choices=['csv', 'parquet', 'sqlite'])
+    parser.add_argument("--threshold", type=float, help="Detection threshold in percent")
+    parser.add_argument("--workers", type=int, help="Worker processes, defaults to half the CPU cores")
+    parser.add_argument("--max-rows", dest="max_rows_per_file", type=int,
+                        help="Maximum rows per CSV file")
+    parser.add_argument("--minimal", dest="minimal_output", action="store_true", default=None,
+                        help="Write only file, page and content status")
+    parser.add_argument("--no-pdfs", dest="include_pdfs", action="store_false", default=None)
+    parser.add_argument("--no-images", dest="include_images", action="store_false", default=None)
+    parser.add_argument("--sample", dest="use_sampling", action="store_true", default=None,
+                        help="Analyze a statistical sample of the files")
+    parser.add_argument("--confidence", type=float, help="Sampling confidence level in percent")
+    parser.add_argument("--margin", type=float, help="Sampling margin of error in percent")
+    parser.add_argument("--random-n", dest="random_n_size", type=int,
+                        help="Analyze this many randomly selected files")
+    parser.add_argument("--sampling-seed", type=int, help="Seed for a reproducible sample")
+    parser.add_argument("--shard", metavar="i/N", help="Analyze only the i-th of N partitions")
+    parser.add_argument("--scan-workers", dest="scan_workers", type=int,
+                        help="Threads listing directories, raise for network shares")
+    parser.add_argument("--file-timeout", dest="file_timeout", type=float,
+                        help="Seconds a file may take before it is retried at lower DPI, 0 for no limit")
+    parser.add_argument("--page-timeout", dest="page_timeout", type=float,
+                        help="Seconds a single page may take, 0 for no limit")
+    parser.add_argument("--resume", action="store_true", default=None,
+                        help="Skip work completed by an interrupted run and append to its output")
+    parser.add_argument("--no-result-cache", dest="use_result_cache", action="store_false",
+                        default=None, help="Analyze every file even if it is unchanged")
+    parser.add_argument("--no-scan-manifest", dest="use_scan_manifest", action="store_false",
+                        default=None, help="List every directory instead of reusing unchanged listings")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only print the final summary")
+    return parser.parse_args(argv)
+
+
+def build_job(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Combine the job file with command line options, which take precedence
+
+    Returns:
+        Job options with the settings keyword arguments under 'settings'
+
+    Raises:
+        ValueError: If the folder or output is missing or an option is invalid
+    """
+    job = load_job_file(args.job) if args.job else {}
+
+    for key, value in vars(args).items():
+        if key in ('job', 'quiet', 'confidence', 'margin') or value is None:
+            continue
+        job[key] = value
+    if args.confidence is not None:
+        job['confidence_level'] = args.confidence / 100
+    if args.margin is not None:
+        job['margin_of_error'] = args.margin / 100
+    if args.random_n_size is not None:
+        job['use_random_n'] = True
+
+    if not job.get('folder') or not job.get('output'):
+        raise ValueError("A folder and an output file are required, on the command line "
+                         "or in the job file")
+
+    settings = {key: value for key, value in job.items() if key not in JOB_KEYS}
+    settings.setdefault('threshold', 1.0)
+    settings.setdefault('output_format', OUTPUT_EXTENSIONS.get(
+        os.path.splitext(job['output'])[1].lower(), 'csv'))
+    settings.setdefault('max_rows_per_file', 80000)
+    settings['excluded_folders'] = set(settings.get('excluded_folders', DEFAULT_EXCLUDED_FOLDERS))
+
+    return {
+        'folder': job['folder'],
+        'output': job['output'],
+        'workers': job.get('workers') or max(1, (os.cpu_count() or 1) // 2),
+        'settings': settings
+    }
+
+
+class BatchRun:
+    """Runs the scan, sampling, analysis and output pipeline without a display"""
+
+    def __init__(self, folder: str, output_path: str, settings: AnalysisSettings,
+                 workers: int, quiet: bool = False):
+        """
+        Initialize run
+
+        Args:
+            folder: Folder to scan
+            output_path: Output path given for the run
+            settings: Analysis settings
+            workers: Number of worker processes
+            quiet: Only print the final summary
+        """
+        from processing_engine import MP_CONTEXT
+
+        self.folder = os.path.abspath(folder)
+        self.output_path = shard_output_path(output_path, settings.get_shard())
+        self.settings = settings
+        self.workers = workers
+        self.quiet = quiet
+        self.stop_event = MP_CONTEXT.Event()
+        self.pause_event = MP_CONTEXT.Event()
+        self.files_done = 0
+        self.pages_done = 0
+        self.files_failed = 0
+        self.resumed_files = 0
+        self.results_batch: List[Dict[str, Any]] = []
+        self.pending_checkpoints: List[int] = []
+        self.batch_size = 1000
+        self.manifest: Optional[ScanManifest] = None
+
+    def log(self, message: str):
+        """Print a progress message unless running quietly"""
+        if not self.quiet:
+            print(message, flush=True)
+
+    def select_files(self) -> List[str]:
+        """
+        Scan the folder and apply sampling and sharding
+
+        Returns:
+            List[str]: Files to analyze
+        """
+        settings = self.settings
+        shard = settings.get_shard()
+        sampled = settings.use_sampling or settings.use_random_n
+        options = FileProcessor.ProcessingOptions(
+            excluded_folders=settings.excluded_folders,
+            shard=None if sampled else shard,
+            scan_workers=settings.scan_workers
+        )
+        if settings.use_scan_manifest:
+            self.manifest = ScanManifest(self.folder, settings.scan_manifest_path)
+        files = FileProcessor.get_file_list(self.folder, settings.include_pdfs,
+                                            settings.include_images, SUPPORTED_FORMATS, options,
+                                            manifest=self.manifest)
+        if self.manifest:
+            manifest_stats = self.manifest.get_stats()
+            self.log(f"Scanned {manifest_stats['reused'] + manifest_stats['listed']:,} directories, "
+                     f"{manifest_stats['reused']:,} unchanged since the last scan")
+        settings.total_files = len(files)
+        if not files or not sampled:
+            return files
+
+        # Samples are drawn from the whole population, then split between shards
+        if settings.use_sampling:
+            settings.sample_size = SamplingCalculator.calculate_sample_size(SamplingParameters(
+                confidence_level=settings.confidence_level,
+                margin_of_error=settings.margin_of_error,
+                population_size=len(files)
+            ))
+            files = SamplingCalculator.select_random_files(files, settings.sample_size,
+                                                           settings.sampling_seed)
+        else:
+            settings.random_n_size = min(settings.random_n_size, len(files))
+            files = SamplingCalculator.select_random_files(files, settings.random_n_size,
+                                                           settings.sampling_seed)
+        self.log(f"Sampled {len(files):,} of {settings.total_files:,} files")
+
+        if shard:
+            files = [f for f in files
+                     if shard_of(os.path.relpath(f, self.folder), shard[1]) == shard[0]]
+        return files
+
+    def run(self) -> int:
+        """
+        Analyze the folder and write the output
+
+        Returns:
+            int: Exit code
+        """
+        from checkpoint import CheckpointJournal, checkpoint_path
+        from content_analyzer import PageAnalyzer
+        from error_handling import ErrorHandler
+        from output_handlers import create_output_handler
+        from processing_engine import ProcessingEngine
+        from result_cache import ResultCache
+
+        start = time.perf_counter()
+        files = self.select_files()
+        if not files:
+            print(f"No compatible files found in {self.folder}")
+            return EXIT_NO_FILES
+        self.log(f"Analyzing {len(files):,} files with {self.workers} workers")
+
+        settings = self.settings
+        page_analyzer = PageAnalyzer(settings)
+        error_handler = ErrorHandler()
+        handler = create_output_handler(settings.output_format, self.output_path, settings,
+                                        append=settings.resume, durable=settings.checkpoint)
+
+        result_cache = None
+        result_key = None
+        if settings.use_result_cache:
+            result_cache = ResultCache(settings.result_cache_path, settings.result_cache_hash)
+            result_key = ResultCache.make_settings_key(page_analyzer.get_result_settings())
+            result_cache.evict(settings.result_cache_max_age_days, settings.result_cache_max_size_mb)
+
+        journal = None
+        if settings.checkpoint:
+            journal = CheckpointJournal(
+                checkpoint_path(self.output_path),
+                ResultCache.make_settings_key({
+                    **page_analyzer.get_result_settings(),
+                    'output_format': settings.output_format,
+                    'minimal_output': settings.minimal_output,
+                    # Page ranges are journaled by their bounds, which follow these
+                    'page_split_threshold': settings.page_split_threshold,
+                    'page_chunk_size': settings.page_chunk_size
+                }),
+                settings.resume
+            )
+
+        def write_batch(is_final: bool = False):
+            handler.write_batch(self.results_batch, is_final)
+            self.results_batch = []
+            if journal:
+                journal.record(self.pending_checkpoints)
+                self.pending_checkpoints = []
+
+        engine = ProcessingEngine(settings, self.workers, self.stop_event, self.pause_event,
+                                  page_analyzer)
+        lookup = (lambda path: result_cache.get(path, result_key)) if result_cache else None
+        last_report = start
+        try:
+            for outcome in engine.run(files, lookup,
+                                      completed=journal.is_completed if journal and settings.resume else None,
+                                      stream_ranges=journal is not None):
+                rows = self.complete_outcome(outcome, error_handler, result_cache, result_key,
+                                             journal is not None)
+                for row in rows:
+                    self.results_batch.append(self.minimize_result(row))
+                if journal and not outcome.interrupted and not outcome.resumed:
+                    try:
+                        self.pending_checkpoints.append(CheckpointJournal.make_key(
+                            outcome.file_path, outcome.pages if outcome.partial else None))
+                    except OSError:
+                        pass  # Not a file, such as a scan failure
+                if len(self.results_batch) >= self.batch_size:
+                    write_batch()
+
+                if not outcome.partial and not outcome.resumed:
+                    self.files_done += 1
+                now = time.perf_counter()
+                if now - last_report >= 5:
+                    last_report = now
+                    self.log(f"Processed {self.files_done + self.resumed_files:,} of {len(files):,} files "
+                             f"({self.files_done / (now - start):.1f} files/sec)")
+
+            write_batch(is_final=True)
+        finally:
+            if journal:
+                journal.close()
+            handler.cleanup()
+
+        self.print_summary(engine, result_cache, time.perf_counter() - start)
+        if self.stop_event.is_set():
+            return EXIT_INTERRUPTED
+        return EXIT_FILE_ERRORS if self.files_failed else EXIT_OK
+
+    def complete_outcome(self, outcome, error_handler, result_cache, result_key,
+                         checkpointing: bool) -> List[Dict[str, Any]]:
+        """
+        Turn an analysis outcome into output rows, recording errors and caching results
+
+        Returns:
+            List[Dict[str, Any]]: Rows to write
+        """
+        if outcome.resumed:
+            self.resumed_files += 1
+            return []
+        if outcome.interrupted and checkpointing:
+            return []  # Analyzed again when the run is resumed
+
+        if outcome.timed_out:
+            from processing_engine import timeout_result
+            error_handler.handle_error(outcome.error, outcome.file_path)
+            self.files_failed += 1
+            print(f"Timed out: {outcome.file_path}: {str(outcome.error)}", file=sys.stderr)
+            self.pages_done += len(outcome.results or [])
+            return (outcome.results or []) + [timeout_result(outcome)]
+
+        if outcome.error is not None:
+            error_handler.handle_error(outcome.error, outcome.file_path)
+            self.files_failed += 1
+            print(f"Error in {outcome.file_path}: {str(outcome.error)}", file=sys.stderr)
+            if not outcome.file_path.lower().endswith('.pdf'):
+                return []
+            self.pages_done += len(outcome.results or [])
+            return (outcome.results or []) + [{
+                "File": os.path.abspath(outcome.file_path),
+                "Page": 1,
+                "Content Status": "Processing Failed",
+                "Type": "PDF",
+                "Error": str(outcome.error),
+                "Error Severity": "ERROR"
+            }]
+
+        cacheable = (result_cache is not None and outcome.results and not outcome.cached
+                     and not outcome.partial and not outcome.slow_lane
+                     and not any('Error' in result for result in outcome.results))
+        if cacheable:
+            result_cache.put(outcome.file_path, result_key, outcome.results)
+        if outcome.streamed:
+            return []  # Rows were written with the page ranges
+
+        self.pages_done += len(outcome.results or [])
+        return outcome.results or []
+
+    def minimize_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract only minimal fields if minimal output is selected"""
+        if self.settings.minimal_output:
+            return {
+                'File': result['File'],
+                'Page': result.get('Page', 1),
+                'Content Status': result['Content Status']
+            }
+        return result
+
+    def print_summary(self, engine, result_cache, elapsed: float):
+        """Print throughput and cache statistics of the run"""
+        elapsed = max(elapsed, 1e-9)
+        cache_stats = engine.get_cache_stats()
+        io_stats = engine.get_io_stats()
+        print(f"Files: {self.files_done:,} processed, {self.files_failed:,} failed"
+              + (f", {self.resumed_files:,} completed by an earlier run" if self.resumed_files else ""))
+        print(f"Pages: {self.pages_done:,}")
+        print(f"Elapsed: {elapsed:.1f}s, {self.files_done / elapsed:.2f} files/sec, "
+              f"{self.pages_done / elapsed:.2f} pages/sec")
+        print(f"Page Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+        if result_cache:
+            print(f"Result Cache: {result_cache.hits} files reused, {result_cache.misses} analyzed")
+        print(f"I/O Wait: {io_stats['wait_seconds']:.1f}s analyzers idle")
+        timeout_stats = engine.get_timeout_stats()
+        if timeout_stats['slow_lane']:
+            print(f"Timeouts: {timeout_stats['slow_lane']} retried at lower DPI, "
+                  f"{timeout_stats['timed_out']} timed out again")
+        print(f"Output: {self.output_path}")
+        if self.stop_event.is_set():
+            print("Interrupted, run again with --resume to continue")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point"""
+    args = parse_arguments(argv)
+    try:
+        job = build_job(args)
+        settings = AnalysisSettings(**job['settings'])
+    except (OSError, ValueError, TypeError) as e:
+        print(f"Invalid job: {str(e)}", file=sys.stderr)
+        return EXIT_USAGE
+
+    if not os.path.isdir(job['folder']):
+        print(f"Folder not found: {job['folder']}", file=sys.stderr)
+        return EXIT_USAGE
+
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(job['output'])), exist_ok=True)
+    except OSError as e:
+        print(f"Cannot create output folder: {str(e)}", file=sys.stderr)
+        return EXIT_USAGE
+
+    run = BatchRun(job['folder'], job['output'], settings, job['workers'], args.quiet)
+
+    def request_stop(signum, frame):
+        if run.stop_event.is_set():
+            raise KeyboardInterrupt
+        print("Stopping after the current pages, press Ctrl+C again to abort", file=sys.stderr)
+        run.stop_event.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    try:
+        return run.run()
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        print(f"Run failed: {str(e)}", file=sys.stderr)
+        return EXIT_FAILED
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -18,9 +18,10 @@ import os
 import sys
 import platform
 import time
-import queue
 import logging
-from threading import Thread, Event, Lock
+import argparse
+import multiprocessing
+from threading import Thread, Event, Lock, get_ident
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple, Set, Union
@@ -31,19 +32,23 @@ from functools import partial
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext, messagebox
 
-# Data processing imports
-import pandas as pd
-import numpy as np
-import fitz
-from PIL import Image
-from pdf2image import convert_from_path
-
-# Local module imports
-from content_analyzer import ContentAnalyzer, PageAnalyzer
+# Local module imports; the analysis modules and their dependencies (PyMuPDF,
+# NumPy, Pillow, pandas) are imported on first use so the window opens quickly
 from error_handling import ErrorHandler, ErrorSeverity, ProcessingError, ErrorAwareResult
 from output_handlers import create_output_handler
-from sampling import FileProcessor, SamplingCalculator, SamplingParameters
+from sampling import (FileProcessor, SamplingCalculator, SamplingParameters, parse_shard,
+                      shard_of, shard_output_path, DEFAULT_SCAN_WORKERS)
 from pdf_utils import setup_poppler
+from result_cache import ResultCache
+from scan_manifest import ScanManifest
+from analysis_settings import AnalysisSettings
+from memory_budget import MP_CONTEXT
+from ui_bus import MessageBus, POLL_INTERVAL_MS
+from log_view import LogHistory, SEVERITY_FILTERS, classify
+
+# Everything shown in the log window, written in full to the log file
+log_window_logger = logging.getLogger('document_analyzer.log_window')
+log_window_logger.setLevel(logging.DEBUG)
 
 
 @dataclass
@@ -191,55 +196,6 @@ class ProcessingStats:
             return "0 files/sec"
 
 
-@dataclass
-class AnalysisSettings:
-    """Configuration settings for document analysis"""
-    threshold: float
-    output_format: str
-    max_rows_per_file: int
-    excluded_folders: Set[str]
-    use_sampling: bool = False
-    use_random_n: bool = False
-    random_n_size: Optional[int] = None
-    confidence_level: float = 0.95
-    margin_of_error: float = 0.05
-    sample_size: Optional[int] = None
-    total_files: Optional[int] = None
-    include_pdfs: bool = True
-    include_images: bool = True
-    process_subdirectories: bool = True
-    minimal_output: bool = False
-
-    def __post_init__(self):
-        """Validate settings after initialization"""
-        if not 0.1 <= self.threshold <= 10.0:
-            raise ValueError("Threshold must be between 0.1 and 10.0")
-
-        if self.output_format not in ['csv', 'parquet', 'sqlite']:
-            raise ValueError("Invalid output format")
-
-        if self.max_rows_per_file < 1:
-            raise ValueError("Max rows per file must be positive")
-
-        # Validate sampling settings
-        if self.use_sampling and self.use_random_n:
-            raise ValueError("Cannot use both statistical sampling and random N sampling")
-
-        if self.use_sampling:
-            if not 0 < self.confidence_level < 1:
-                raise ValueError("Confidence level must be between 0 and 1")
-            if not 0 < self.margin_of_error < 1:
-                raise ValueError("Margin of error must be between 0 and 1")
-
-        if self.use_random_n:
-            if self.random_n_size is None:
-                raise ValueError("Random N size must be specified when using random N sampling")
-            if self.random_n_size < 1:
-                raise ValueError("Random N size must be positive")
-            if self.total_files is not None and self.random_n_size > self.total_files:
-                raise ValueError("Random N size cannot be larger than total files")
-
-
 class LicenseViewer:
     def __init__(self, parent):
         self.dialog = tk.Toplevel(parent)
@@ -355,9 +311,11 @@ class DocumentAnalyzerGUI:
     DEFAULT_BATCH_SIZE = 1000
     SUPPORTED_FORMATS = {'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp'}
 
-    def __init__(self, root):
+    def __init__(self, root, shard: str = "", sampling_seed: Optional[int] = None):
         self.root = root
         self.root.title("Document Margin Analyzer")
+        self.shard = shard
+        self.sampling_seed = sampling_seed
 
         # Initialize configuration variables
         self._init_variables()
@@ -377,6 +335,9 @@ class DocumentAnalyzerGUI:
         # Setup UI
         self.setup_ui()
 
+        # Drain the message bus for as long as the window exists
+        self.root.after(POLL_INTERVAL_MS, self.update_ui)
+
     def _init_variables(self):
         """Initialize configuration and state variables"""
         # Analysis settings
@@ -395,9 +356,14 @@ class DocumentAnalyzerGUI:
         self.file_count_var = tk.StringVar(value="No files selected")
 
         # Processing state
-        self.queue = queue.Queue()
-        self.pause_event = Event()
-        self.stop_event = Event()
+        # Other threads report to the Tk thread only through the bus
+        self.message_bus = MessageBus()
+        self.ui_thread = get_ident()
+        self.log_history = LogHistory()
+        self.log_filter = tk.StringVar(value='All')
+        # Process-shared so that worker processes observe pause and stop
+        self.pause_event = MP_CONTEXT.Event()
+        self.stop_event = MP_CONTEXT.Event()
         self.processing_lock = Lock()
         self.results_lock = Lock()
         self.processing = False
@@ -422,7 +388,9 @@ class DocumentAnalyzerGUI:
             excluded_folders={'$RECYCLE.BIN', 'System Volume Information'},
             parallel_processing=True,
             batch_size=self.DEFAULT_BATCH_SIZE,
-            show_progress=True
+            show_progress=True,
+            shard=parse_shard(self.shard) if self.shard else None,
+            scan_workers=DEFAULT_SCAN_WORKERS
         )
 
         # Last sampling change tracker for mutual exclusivity
@@ -435,11 +403,18 @@ class DocumentAnalyzerGUI:
             self.settings = self._create_settings()
 
             # Initialize analyzers and handlers
-            self.page_analyzer = PageAnalyzer(self.settings)
+            self._page_analyzer = None
             self.error_handler = ErrorHandler()
 
             # Initialize result tracking
             self.current_output_handler = None
+            self.result_cache = None
+            self.scan_manifest = None
+            self.processing_engine = None
+            self.worker_pool = None
+            self.checkpoint_journal = None
+            self.pending_checkpoints = []
+            self.resumed_files = 0
             self.processing_stats = {
                 'total_processed': 0,
                 'successful': 0,
@@ -454,6 +429,14 @@ class DocumentAnalyzerGUI:
             )
             raise
 
+    @property
+    def page_analyzer(self) -> 'PageAnalyzer':
+        """Page analyzer for the current settings, created on first use"""
+        if self._page_analyzer is None:
+            from content_analyzer import PageAnalyzer
+            self._page_analyzer = PageAnalyzer(self.settings)
+        return self._page_analyzer
+
     def _create_settings(self) -> AnalysisSettings:
         """
         Create settings object from current GUI values
@@ -484,7 +467,9 @@ class DocumentAnalyzerGUI:
                 confidence_level=confidence,
                 margin_of_error=margin,
                 include_pdfs=self.include_pdfs.get(),
-                include_images=self.include_images.get()
+                include_images=self.include_images.get(),
+                shard=self.shard,
+                sampling_seed=self.sampling_seed
             )
         except ValueError as e:
             raise ValueError(f"Invalid settings values: {str(e)}")
@@ -512,14 +497,17 @@ class DocumentAnalyzerGUI:
                 margin_of_error=float(self.margin_of_error.get()) / 100,
                 include_pdfs=self.include_pdfs.get(),
                 include_images=self.include_images.get(),
-                minimal_output=self.minimal_output.get() if hasattr(self, 'minimal_output') else False
+                minimal_output=self.minimal_output.get() if hasattr(self, 'minimal_output') else False,
+                resume=self.resume_run.get() if hasattr(self, 'resume_run') else False,
+                shard=self.shard,
+                sampling_seed=self.sampling_seed
             )
 
             # Update instance settings
             self.settings = new_settings
 
-            # Recreate page analyzer with new settings
-            self.page_analyzer = PageAnalyzer(self.settings)
+            # Recreate page analyzer with new settings on next use
+            self._page_analyzer = None
 
             # Log the update
             self.log_message("Settings updated:")
@@ -556,8 +544,8 @@ class DocumentAnalyzerGUI:
             if not self.update_settings():
                 return False
 
-            # Recreate page analyzer with new settings
-            self.page_analyzer = PageAnalyzer(self.settings)
+            # Recreate page analyzer with new settings on next use
+            self._page_analyzer = None
 
             # Reset processing state
             self.processing_stats = {
@@ -605,6 +593,13 @@ class DocumentAnalyzerGUI:
                 except Exception as e:
                     print(f"Error during output handler cleanup: {e}")
 
+            # Stop the warm worker processes
+            if getattr(self, 'worker_pool', None):
+                try:
+                    self.worker_pool.shutdown()
+                except Exception as e:
+                    print(f"Error during worker pool shutdown: {e}")
+
             # Clean up error handler
             if hasattr(self, 'error_handler'):
                 try:
@@ -1375,6 +1370,14 @@ class DocumentAnalyzerGUI:
             variable=self.minimal_output
         ).grid(row=0, column=0, sticky=tk.W, padx=5)
 
+        # Resume checkbox, continues the output and journal of an interrupted run
+        self.resume_run = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            minimal_frame,
+            text="Resume previous run (skip files already written to this output)",
+            variable=self.resume_run
+        ).grid(row=1, column=0, sticky=tk.W, padx=5)
+
         # CSV-specific options frame
         self.csv_options = ttk.Frame(output_frame)
         self.csv_options.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
@@ -1479,6 +1482,33 @@ class DocumentAnalyzerGUI:
             font=('Arial', 9, 'bold')
         )
 
+        # Severity filter and paging, the window holds one page of recent lines
+        controls = ttk.Frame(log_frame)
+        controls.grid(row=1, column=0, sticky=(tk.W, tk.E), padx=5)
+
+        ttk.Label(controls, text="Show:").grid(row=0, column=0, sticky=tk.W)
+        filter_combo = ttk.Combobox(
+            controls,
+            textvariable=self.log_filter,
+            values=list(SEVERITY_FILTERS),
+            state='readonly',
+            width=10
+        )
+        filter_combo.grid(row=0, column=1, sticky=tk.W, padx=5)
+        filter_combo.bind('<<ComboboxSelected>>', lambda _: self.filter_log())
+
+        ttk.Button(controls, text="Older", command=lambda: self.page_log(1)).grid(
+            row=0, column=2, padx=2
+        )
+        ttk.Button(controls, text="Newer", command=lambda: self.page_log(-1)).grid(
+            row=0, column=3, padx=2
+        )
+        ttk.Button(controls, text="Latest", command=lambda: self.page_log(-self.log_history.page)).grid(
+            row=0, column=4, padx=2
+        )
+        self.log_page_var = tk.StringVar(value="")
+        ttk.Label(controls, textvariable=self.log_page_var).grid(row=0, column=5, sticky=tk.W, padx=5)
+
         # Configure grid weights
         log_frame.columnconfigure(0, weight=1)
 
@@ -1490,98 +1520,105 @@ class DocumentAnalyzerGUI:
             # Initialize processing state
             self.initialize_processing()
 
-            def progress_update(msg: str):
-                self.queue.put(("log", msg))
-
             # Create processing options
+            sampled = self.settings.use_sampling or self.settings.use_random_n
             options = FileProcessor.ProcessingOptions(
                 excluded_folders={'$RECYCLE.BIN', 'System Volume Information'},
                 parallel_processing=True,
                 batch_size=self.batch_size,
-                show_progress=True
+                show_progress=True,
+                shard=None if sampled else self.settings.get_shard(),
+                scan_workers=self.settings.scan_workers
             )
 
-            # Get file list with options and convert all paths to absolute
-            files_to_process = [os.path.abspath(f) for f in FileProcessor.get_file_list(
-                self.folder_entry.get(),
-                self.include_pdfs.get(),
-                self.include_images.get(),
-                self.SUPPORTED_FORMATS,
+            scan_kwargs = dict(
+                folder_path=self.folder_entry.get(),
+                include_pdfs=self.include_pdfs.get(),
+                include_images=self.include_images.get(),
+                supported_formats=self.SUPPORTED_FORMATS,
                 options=options,
-                progress_callback=progress_update
-            )]
-
-            if not files_to_process:
-                self.handle_no_files()
-                return
-
-            # Apply sampling if enabled
-            if self.settings.use_sampling:
-                self.log_message("\nCalculating sample size...")
-                params = SamplingParameters(
-                    confidence_level=self.settings.confidence_level,
-                    margin_of_error=self.settings.margin_of_error,
-                    population_size=len(files_to_process)
-                )
-
-                sample_size = SamplingCalculator.calculate_sample_size(params)
-                self.settings.sample_size = sample_size
-                self.settings.total_files = len(files_to_process)
-
-                files_to_process = SamplingCalculator.select_random_files(files_to_process, sample_size)
-
-                self.log_message(
-                    f"Using statistical sampling: {sample_size:,} files will be analyzed "
-                    f"({(sample_size / len(files_to_process) * 100):.1f}% of total)"
-                )
+                progress_callback=self.report_scan,
+                manifest=self.get_scan_manifest(self.folder_entry.get())
+            )
 
-            # Apply random N sampling if enabled
-            elif self.settings.use_random_n:
-                self.log_message("\nSelecting random files...")
-                n_files = min(int(self.random_n_size.get()), len(files_to_process))
-                self.settings.random_n_size = n_files
-                self.settings.total_files = len(files_to_process)
+            if sampled:
+                # Sampling needs the whole population before any file is selected
+                files_to_process = [os.path.abspath(f) for f in FileProcessor.get_file_list(**scan_kwargs)]
 
-                files_to_process = SamplingCalculator.select_random_files(files_to_process, n_files)
+                if not files_to_process:
+                    self.handle_no_files()
+                    return
 
-                self.log_message(
-                    f"Using random sampling: {n_files:,} files will be analyzed "
-                    f"({(n_files / self.settings.total_files * 100):.1f}% of total)"
-                )
+                files_to_process = self.apply_sampling(files_to_process)
+                files_to_process = self.select_shard_files(files_to_process)
+                expected_files = len(files_to_process)
+            else:
+                # Stream the directory walk so analysis starts with the first file found
+                files_to_process = FileProcessor.iter_files(**scan_kwargs)
+                expected_files = self.settings.total_files
 
             # Initialize output handler
-            self.initialize_output_handler(files_to_process)
+            self.initialize_output_handler([])
+            self.initialize_result_cache()
+            self.initialize_checkpoint()
 
-            total_files = len(files_to_process)
+            discovered = 0
+            scan_complete = False
             processed_count = 0
 
-            # Process each file
-            results = []
-            for file_path in files_to_process:
-                if self.stop_event.is_set():
-                    break
-
-                while self.pause_event.is_set():
-                    if self.stop_event.is_set():
-                        break
-                    time.sleep(0.1)
-
-                file_results = self.process_single_file(file_path)
-                if file_results:
-                    # Handle both single results and lists of results
-                    if isinstance(file_results, list):
-                        results.extend(file_results)
-                    else:
-                        results.append(file_results)
+            def counted_files():
+                nonlocal discovered, scan_complete
+                for file_path in files_to_process:
+                    discovered += 1
+                    yield os.path.abspath(file_path)
+                scan_complete = True
+
+            def file_completed(outcome: 'FileOutcome'):
+                nonlocal processed_count
+                results = outcome.results if outcome.cached else self.complete_file_outcome(outcome)
+                for result in results or []:
+                    self.add_to_batch(self.minimize_result(result))
+                self.add_checkpoint(outcome)
+                if outcome.partial:
+                    return  # The file completes with its last page range
 
                 processed_count += 1
-                progress = (processed_count / total_files) * 100
-                self.queue.put(("progress", progress))
-                self.queue.put(("status", f"Processed {processed_count:,} of {total_files:,} files"))
+                total_files = discovered if scan_complete or not expected_files \
+                    else max(expected_files, discovered)
+                progress = (processed_count / max(total_files, 1)) * 100
+                self.message_bus.progress(min(progress, 100))
+                self.message_bus.status(f"Processed {processed_count:,} of {total_files:,} files")
+
+            # Scan, analyze and write as a pipeline, results are written as they arrive
+            from processing_engine import ProcessingEngine, WorkerPool
+            if self.worker_pool is None:
+                # Workers stay warm for the next run until they are idle too long
+                self.worker_pool = WorkerPool(self.stop_event, self.pause_event)
+            self.worker_pool.idle_timeout = self.settings.worker_idle_timeout
+            self.processing_engine = ProcessingEngine(
+                self.settings,
+                self.selected_cores.get(),
+                self.stop_event,
+                self.pause_event,
+                self.page_analyzer,
+                self.worker_pool
+            )
+            journal = self.checkpoint_journal
+            for outcome in self.processing_engine.run(
+                    counted_files(),
+                    self.get_cached_results,
+                    completed=journal.is_completed if journal and self.settings.resume else None,
+                    stream_ranges=journal is not None):
+                file_completed(outcome)
+
+            if discovered == 0 and not self.stop_event.is_set():
+                self.handle_no_files()
+                return
 
-            # Write results
-            if results:
-                self.current_output_handler.write_batch(results, True)
+            # Write remaining results
+            self.write_current_batch(is_final=True)
+            if self.resumed_files:
+                self.log_message(f"Skipped {self.resumed_files:,} files completed by an earlier run")
 
             # Finalize processing
             self.finalize_processing()
@@ -1592,6 +1629,77 @@ class DocumentAnalyzerGUI:
             os.chdir(original_working_dir)
             self.cleanup_processing()
 
+    def apply_sampling(self, files_to_process: List[str]) -> List[str]:
+        """
+        Select the files to analyze according to the sampling settings
+
+        Args:
+            files_to_process: Complete list of files found
+
+        Returns:
+            List[str]: Files selected for analysis
+        """
+        # Apply sampling if enabled
+        if self.settings.use_sampling:
+            self.log_message("\nCalculating sample size...")
+            params = SamplingParameters(
+                confidence_level=self.settings.confidence_level,
+                margin_of_error=self.settings.margin_of_error,
+                population_size=len(files_to_process)
+            )
+
+            sample_size = SamplingCalculator.calculate_sample_size(params)
+            self.settings.sample_size = sample_size
+            self.settings.total_files = len(files_to_process)
+
+            files_to_process = SamplingCalculator.select_random_files(
+                files_to_process, sample_size, self.settings.sampling_seed)
+
+            self.log_message(
+                f"Using statistical sampling: {sample_size:,} files will be analyzed "
+                f"({(sample_size / len(files_to_process) * 100):.1f}% of total)"
+            )
+
+        # Apply random N sampling if enabled
+        elif self.settings.use_random_n:
+            self.log_message("\nSelecting random files...")
+            n_files = min(int(self.random_n_size.get()), len(files_to_process))
+            self.settings.random_n_size = n_files
+            self.settings.total_files = len(files_to_process)
+
+            files_to_process = SamplingCalculator.select_random_files(
+                files_to_process, n_files, self.settings.sampling_seed)
+
+            self.log_message(
+                f"Using random sampling: {n_files:,} files will be analyzed "
+                f"({(n_files / self.settings.total_files * 100):.1f}% of total)"
+            )
+
+        return files_to_process
+
+    def select_shard_files(self, files: List[str]) -> List[str]:
+        """
+        Keep the files of this machine's shard
+
+        Args:
+            files: Files selected from the whole population
+
+        Returns:
+            List[str]: Files assigned to the shard of this run
+        """
+        shard = self.settings.get_shard()
+        if not shard:
+            return files
+
+        root = os.path.abspath(self.folder_entry.get())
+        files = [f for f in files if shard_of(os.path.relpath(f, root), shard[1]) == shard[0]]
+        self.log_message(f"Shard {self.settings.shard}: analyzing {len(files):,} of the selected files")
+        return files
+
+    def get_output_path(self) -> str:
+        """Get the output path of this run, with the shard added when sharded"""
+        return shard_output_path(self.save_entry.get(), self.settings.get_shard())
+
     def process_single_file(self, file_path: str) -> Optional[Union[Dict[str, Any], List[Dict[str, Any]]]]:
         """
         Process a single file with appropriate analyzer.
@@ -1605,41 +1713,195 @@ class DocumentAnalyzerGUI:
         """
         self.log_message(f"Debug: Processing file: {file_path}")
 
-        if self.stop_event.is_set():
+        from processing_engine import analyze_file, wait_while_paused
+        if wait_while_paused(self.stop_event, self.pause_event):
             return None
 
-        while self.pause_event.is_set():
-            if self.stop_event.is_set():
+        results = self.get_cached_results(file_path)
+        if results is None:
+            outcome = analyze_file(self.page_analyzer, file_path, self.stop_event, self.pause_event)
+            results = self.complete_file_outcome(outcome)
+
+        if not results:
+            return None
+        if file_path.lower().endswith('.pdf'):
+            return [self.minimize_result(result) for result in results]
+        return self.minimize_result(results[0])
+
+    def minimize_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract only minimal fields if minimal output is selected"""
+        if self.minimal_output.get():
+            return {
+                'File': result['File'],
+                'Page': result.get('Page', 1),
+                'Content Status': result['Content Status']
+            }
+        return result
+
+    def complete_file_outcome(self, outcome: 'FileOutcome') -> Optional[List[Dict[str, Any]]]:
+        """
+        Record errors and cache the results of an analyzed file
+
+        Args:
+            outcome: Outcome of analyzing the file
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: Full results for the file or None
+        """
+        if outcome.resumed:
+            self.resumed_files += 1
+            return None
+        if outcome.interrupted and self.checkpoint_journal:
+            return None  # Analyzed again when the run is resumed
+
+        if outcome.timed_out:
+            from processing_engine import timeout_result
+            self.handle_processing_error(outcome.error, outcome.file_path)
+            return (outcome.results or []) + [timeout_result(outcome)]
+
+        if outcome.error is not None:
+            self.handle_processing_error(outcome.error, outcome.file_path)
+            if not outcome.file_path.lower().endswith('.pdf'):
                 return None
-            time.sleep(0.1)
+            # Page ranges of a split PDF that did complete are kept
+            return (outcome.results or []) + [{
+                "File": os.path.abspath(outcome.file_path),
+                "Page": 1,
+                "Content Status": "Processing Failed",
+                "Type": "PDF",
+                "Error": str(outcome.error),
+                "Error Severity": "ERROR"
+            }]
+
+        if outcome.streamed:
+            # Rows were written with the page ranges, the merged results are only cached
+            if outcome.results:
+                self.store_cached_results(outcome.file_path, outcome.results)
+            return None
+
+        if outcome.results and not outcome.partial and not outcome.slow_lane:
+            self.store_cached_results(outcome.file_path, outcome.results)
+        return outcome.results
+
+    def initialize_checkpoint(self) -> None:
+        """Start the checkpoint journal, or reload it when resuming a run"""
+        self.checkpoint_journal = None
+        self.pending_checkpoints = []
+        self.resumed_files = 0
+        if not self.settings.checkpoint:
+            return
+
+        from checkpoint import CheckpointJournal, checkpoint_path
+        settings_key = ResultCache.make_settings_key({
+            **self.page_analyzer.get_result_settings(),
+            'output_format': self.settings.output_format,
+            'minimal_output': self.settings.minimal_output,
+            # Page ranges are journaled by their bounds, which follow these
+            'page_split_threshold': self.settings.page_split_threshold,
+            'page_chunk_size': self.settings.page_chunk_size
+        })
+        self.checkpoint_journal = CheckpointJournal(
+            checkpoint_path(self.get_output_path()), settings_key, self.settings.resume)
+        if self.settings.resume:
+            self.log_message(f"Resuming with {self.checkpoint_journal.count():,} completed "
+                             f"entries in {self.checkpoint_journal.path}")
+
+    def add_checkpoint(self, outcome: 'FileOutcome') -> None:
+        """
+        Queue a completed file or page range for the journal
+
+        The entry is journaled once the batch holding its rows is written.
+
+        Args:
+            outcome: Outcome whose rows were added to the batch
+        """
+        if not self.checkpoint_journal or outcome.interrupted or outcome.resumed:
+            return
 
         try:
-            def minimize_result(result: Dict[str, Any]) -> Dict[str, Any]:
-                """Extract only minimal fields if minimal output is selected"""
-                if self.minimal_output.get():
-                    return {
-                        'File': result['File'],
-                        'Page': result.get('Page', 1),
-                        'Content Status': result['Content Status']
-                    }
-                return result
+            key = self.checkpoint_journal.make_key(outcome.file_path,
+                                                   outcome.pages if outcome.partial else None)
+        except OSError:
+            return  # Not a file, such as a scan failure
 
-            if file_path.lower().endswith('.pdf'):
-                results = self.process_pdf(file_path)  # Will return list of results
-                if results:
-                    return [minimize_result(result) for result in results]
-                return None
-            else:
-                # For image files, use the page_analyzer directly
-                result = self.page_analyzer.analyze_image_file(os.path.abspath(file_path))
-                if result:
-                    return minimize_result(result)
-                return None
+        with self.results_lock:
+            self.pending_checkpoints.append(key)
+
+    def get_scan_manifest(self, folder_path: str) -> Optional[ScanManifest]:
+        """
+        Get the scan manifest of a folder, shared by file counting, analysis and output
+
+        Args:
+            folder_path: Folder being scanned
+
+        Returns:
+            The manifest, None when disabled or unavailable
+        """
+        settings = getattr(self, 'settings', None)
+        if not folder_path or settings is None or not settings.use_scan_manifest:
+            return None
 
+        root = os.path.abspath(folder_path)
+        if self.scan_manifest is None or self.scan_manifest.root != root \
+                or self.scan_manifest.db_path != settings.scan_manifest_path:
+            try:
+                self.scan_manifest = ScanManifest(root, settings.scan_manifest_path)
+            except Exception as e:
+                self.log_message(f"Scan manifest unavailable: {str(e)}")
+                self.scan_manifest = None
+        return self.scan_manifest
+
+    def initialize_result_cache(self) -> None:
+        """Open the persistent result cache and apply its age and size limits"""
+        self.result_cache = None
+        if not self.settings.use_result_cache:
+            return
+
+        try:
+            self.result_cache = ResultCache(self.settings.result_cache_path,
+                                            self.settings.result_cache_hash)
+            self.result_cache_key = ResultCache.make_settings_key(
+                self.page_analyzer.get_result_settings())
+            removed = self.result_cache.evict(self.settings.result_cache_max_age_days,
+                                              self.settings.result_cache_max_size_mb)
+            if removed:
+                self.log_message(f"Removed {removed:,} expired entries from the result cache")
         except Exception as e:
-            self.handle_processing_error(e, file_path)
+            self.log_message(f"Result cache unavailable: {str(e)}")
+            self.result_cache = None
+
+    def get_cached_results(self, file_path: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get results of an unchanged file from an earlier run
+
+        Args:
+            file_path: Path to file
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: Cached full results or None
+        """
+        if not self.result_cache:
             return None
 
+        cached = self.result_cache.get(file_path, self.result_cache_key)
+        if cached:
+            self.log_message(f"Debug: Using cached results for: {file_path}")
+        return cached
+
+    def store_cached_results(self, file_path: str, results: List[Dict[str, Any]]) -> None:
+        """
+        Store file results in the persistent cache unless any page failed
+
+        Args:
+            file_path: Path to the analyzed file
+            results: Full analysis results for the file
+        """
+        if not self.result_cache:
+            return
+        if any('Error' in result for result in results):
+            return  # Failures may be transient, analyze again next run
+        self.result_cache.put(file_path, self.result_cache_key, results)
+
     def initialize_processing(self) -> None:
         """Initialize processing state and UI elements"""
         # Reset processing state
@@ -1651,10 +1913,10 @@ class DocumentAnalyzerGUI:
         self.stop_event.clear()
         self.pause_event.clear()
 
-        # Reset UI elements
-        self.progress_var.set(0)
-        self.status_label.config(text="Initializing...")
-        self.log_text.delete(1.0, tk.END)
+        # Reset UI elements, start_analysis has already cleared the log
+        self.message_bus.progress(0)
+        self.message_bus.status("Initializing...")
+        self.message_bus.reset_counter("scanned")
 
         # Create processing options with current settings
         self.processing_options = FileProcessor.ProcessingOptions(
@@ -1662,7 +1924,9 @@ class DocumentAnalyzerGUI:
             parallel_processing=True,
             batch_size=self.batch_size,
             show_progress=True,
-            max_depth=None  # No depth limit for subdirectories
+            max_depth=None,  # No depth limit for subdirectories
+            shard=self.settings.get_shard(),
+            scan_workers=self.settings.scan_workers
         )
 
         # Log start of analysis
@@ -1711,7 +1975,8 @@ class DocumentAnalyzerGUI:
             self.include_images.get(),
             self.SUPPORTED_FORMATS,
             options=self.processing_options,
-            progress_callback=lambda msg: self.log_message(msg)
+            progress_callback=self.report_scan,
+            manifest=self.get_scan_manifest(folder_path)
         )
 
         total_files = len(files)
@@ -1732,7 +1997,7 @@ class DocumentAnalyzerGUI:
             self.settings.sample_size = sample_size
             self.settings.total_files = total_files
 
-            files = SamplingCalculator.select_random_files(files, sample_size)
+            files = SamplingCalculator.select_random_files(files, sample_size, self.sampling_seed)
             self.log_message(
                 f"Using statistical sampling: {sample_size:,} files will be analyzed "
                 f"({(sample_size / total_files * 100):.1f}% of total)"
@@ -1743,7 +2008,7 @@ class DocumentAnalyzerGUI:
             self.settings.random_n_size = n_files
             self.settings.total_files = total_files
 
-            files = SamplingCalculator.select_random_files(files, n_files)
+            files = SamplingCalculator.select_random_files(files, n_files, self.sampling_seed)
             self.log_message(
                 f"Using random sampling: {n_files:,} files will be analyzed "
                 f"({(n_files / total_files * 100):.1f}% of total)"
@@ -1762,11 +2027,13 @@ class DocumentAnalyzerGUI:
             RuntimeError: If output handler initialization fails
         """
         try:
-            save_path = self.save_entry.get()
+            save_path = self.get_output_path()
             self.current_output_handler = create_output_handler(
                 self.settings.output_format,
                 save_path,
-                self.settings
+                self.settings,
+                append=self.settings.resume,
+                durable=self.settings.checkpoint
             )
             self.log_message(
                 f"Initialized {self.settings.output_format.upper()} output handler"
@@ -1806,7 +2073,7 @@ class DocumentAnalyzerGUI:
                 break
 
             self.log_message(f"Processing PDF {i}/{len(pdf_files)}: {os.path.basename(file_path)}")
-            self.queue.put(("progress", (i / len(pdf_files)) * 100))
+            self.message_bus.progress((i / len(pdf_files)) * 100)
 
             try:
                 self.process_pdf(file_path)
@@ -1819,7 +2086,7 @@ class DocumentAnalyzerGUI:
 
     def process_pdf(self, pdf_path: str) -> Optional[List[Dict[str, Any]]]:
         """
-        Process a single PDF file with multi-threaded page analysis.
+        Process a single PDF file page by page.
 
         Args:
             pdf_path: Path to PDF file to process
@@ -1829,67 +2096,13 @@ class DocumentAnalyzerGUI:
         """
         self.log_message(f"Debug: Opening PDF: {pdf_path}")
 
-        abs_path = os.path.abspath(pdf_path)
         try:
-            with fitz.open(pdf_path) as pdf:
-                # Check if PDF is encrypted
-                if pdf.is_encrypted:
-                    return [{
-                        "File": abs_path,
-                        "Page": 1,
-                        "Content Status": "Page 1 Processing Failed",
-                        "Type": "PDF",
-                        "Error": "Encryption Error: document closed or encrypted",
-                        "Error Severity": "WARNING"
-                    }]
-
-                total_pages = len(pdf)
-                results = []
-
-                # Process each page using the page_analyzer
-                for page_num in range(total_pages):
-                    if self.stop_event.is_set():
-                        break
-
-                    while self.pause_event.is_set():
-                        if self.stop_event.is_set():
-                            break
-                        time.sleep(0.1)
-
-                    try:
-                        result = self.page_analyzer.analyze_pdf_page(
-                            pdf[page_num],
-                            abs_path,
-                            page_num
-                        )
-                        if result:
-                            results.append(result)
-                    except Exception as e:
-                        error_result = {
-                            "File": abs_path,
-                            "Page": page_num + 1,
-                            "Content Status": f"Page {page_num + 1} Processing Failed",
-                            "Type": "PDF",
-                            "Error": str(e),
-                            "Error Severity": "ERROR"
-                        }
-                        results.append(error_result)
-
-                return results if results else None
-
-        except fitz.FileDataError as e:
-            return [{
-                "File": abs_path,
-                "Page": 1,
-                "Content Status": "Page 1 Processing Failed",
-                "Type": "PDF",
-                "Error": "Encryption Error: document closed or encrypted",
-                "Error Severity": "WARNING"
-            }]
+            from processing_engine import analyze_pdf_file
+            return analyze_pdf_file(self.page_analyzer, pdf_path, self.stop_event, self.pause_event)
         except Exception as e:
             self.handle_processing_error(e, pdf_path)
             return [{
-                "File": abs_path,
+                "File": os.path.abspath(pdf_path),
                 "Page": 1,
                 "Content Status": "Processing Failed",
                 "Type": "PDF",
@@ -1916,7 +2129,7 @@ class DocumentAnalyzerGUI:
             total_batches = (len(image_files) + batch_size - 1) // batch_size
 
             self.log_message(f"Processing image batch {current_batch}/{total_batches}")
-            self.queue.put(("progress", ((i + len(batch)) / len(image_files)) * 100))
+            self.message_bus.progress(((i + len(batch)) / len(image_files)) * 100)
 
             # Process batch using thread pool
             with ThreadPoolExecutor(max_workers=self.selected_cores.get()) as executor:
@@ -1982,13 +2195,16 @@ class DocumentAnalyzerGUI:
 
     def cleanup_processing(self):
         """Clean up resources after processing"""
+        if getattr(self, 'checkpoint_journal', None):
+            self.checkpoint_journal.close()
+
         if hasattr(self, 'output_handler'):
             try:
                 self.output_handler.cleanup()
             except Exception as e:
                 self.log_message(f"Error during cleanup: {str(e)}")
 
-        self.queue.put(("complete", None))
+        self.message_bus.post("complete")
 
     def handle_page_error(self, error: Exception, file_name: str, page_num: int) -> Dict[str, Any]:
         """
@@ -2042,7 +2258,7 @@ class DocumentAnalyzerGUI:
         )
 
         # Show error dialog in main thread
-        self.root.after(0, lambda: messagebox.showerror("Critical Error", error_message))
+        self.show_dialog(messagebox.showerror, "Critical Error", error_message)
 
     def determine_file_type(self, file_path: str) -> str:
         """Determine file type from file extension"""
@@ -2073,13 +2289,15 @@ class DocumentAnalyzerGUI:
                 return 0
 
             # Count files
+            self.message_bus.reset_counter("scanned")
             files = FileProcessor.get_file_list(
                 path_to_check,
                 self.include_pdfs.get(),
                 self.include_images.get(),
                 self.SUPPORTED_FORMATS,
                 options=self.processing_options,
-                progress_callback=lambda msg: self.log_message(msg) if trigger != "checkbox" else None
+                progress_callback=None if trigger == "checkbox" else self.report_scan,
+                manifest=self.get_scan_manifest(path_to_check)
             )
 
             total_files = len(files)
@@ -2136,10 +2354,11 @@ class DocumentAnalyzerGUI:
     def handle_no_files(self):
         """Handle case when no files are found"""
         self.log_message("No compatible files found in the selected folder!")
-        messagebox.showwarning("No Files", "No compatible files found in the selected folder!")
-        self.queue.put(("complete", None))
+        self.show_dialog(messagebox.showwarning, "No Files",
+                         "No compatible files found in the selected folder!")
+        self.message_bus.post("complete")
 
-    def analyze_pdf_page(self, page: fitz.Page, file_path: str,
+    def analyze_pdf_page(self, page: 'fitz.Page', file_path: str,
                          page_num: int) -> Dict[str, Any]:
         """
         Analyze a PDF page for margin content.
@@ -2155,49 +2374,7 @@ class DocumentAnalyzerGUI:
         self.log_message(f"Debug: Analyzing PDF page: {file_path}, page {page_num + 1}")
 
         try:
-            # Analyze text content
-            text_analysis = self.content_analyzer.analyze_text_blocks(page)
-
-            # Convert to image and analyze
-            pix = page.get_pixmap(matrix=fitz.Matrix(
-                self.content_analyzer.dpi / 72, self.content_analyzer.dpi / 72))
-            image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            image_analysis = self.content_analyzer.analyze_image_content(image)
-
-            # Determine overall content status
-            locations = []
-            if text_analysis.has_top_content or image_analysis.has_top_content:
-                locations.append("header")
-            if text_analysis.has_bottom_content or image_analysis.has_bottom_content:
-                locations.append("footer")
-
-            content_status = (
-                "Content found in " + " and ".join(locations) if locations
-                else "All content within margins"
-            )
-
-            # Create detailed result with absolute path
-            abs_path = os.path.abspath(file_path)  # Convert to absolute path
-            result = {
-                "File": abs_path,
-                "Page": page_num + 1,
-                "Content Status": content_status,
-                "Text Status": self._format_text_status(text_analysis),
-                "Image Status": self._format_image_status(image_analysis),
-                "Type": "PDF",
-                "Analysis Details": {
-                    "Text": {
-                        "Top Content": f"{text_analysis.top_content_percentage:.1f}%",
-                        "Bottom Content": f"{text_analysis.bottom_content_percentage:.1f}%",
-                    },
-                    "Image": {
-                        "Top Content": f"{image_analysis.top_content_percentage:.1f}%",
-                        "Bottom Content": f"{image_analysis.bottom_content_percentage:.1f}%",
-                    }
-                }
-            }
-
-            return result
+            return self.page_analyzer.analyze_pdf_page(page, os.path.abspath(file_path), page_num)
 
         except Exception as e:
             # Handle any errors with absolute path
@@ -2237,7 +2414,7 @@ class DocumentAnalyzerGUI:
 
         except Exception as e:
             self.log_message(f"Error completing analysis: {str(e)}")
-            messagebox.showerror("Error", "Failed to complete analysis summary.")
+            self.show_dialog(messagebox.showerror, "Error", "Failed to complete analysis summary.")
 
     def log_final_statistics(self):
         """Log final processing statistics"""
@@ -2255,6 +2432,18 @@ class DocumentAnalyzerGUI:
             self.log_message(f"Confidence Level: {stats['confidence_level']}%")
             self.log_message(f"Margin of Error: {stats['margin_of_error']}%")
 
+        self.log_message(f"\nPage Cache: {stats['cache_hits']} hits, {stats['cache_misses']} misses")
+        if stats['result_cache_hits'] is not None:
+            self.log_message(f"Result Cache: {stats['result_cache_hits']} files reused, "
+                             f"{stats['result_cache_misses']} analyzed")
+        if stats['io_wait_seconds'] is not None:
+            self.log_message(f"I/O Wait: {stats['io_wait_seconds']:.1f}s analyzers idle, "
+                             f"{stats['bytes_prefetched'] / (1024 * 1024):.1f} MB prefetched "
+                             f"in {stats['prefetch_read_seconds']:.1f}s")
+        if stats['slow_lane_retries']:
+            self.log_message(f"Timeouts: {stats['slow_lane_retries']} retried at lower DPI, "
+                             f"{stats['timed_out']} timed out again")
+
     def calculate_processing_stats(self) -> Dict[str, Any]:
         """Calculate processing statistics"""
         stats = {
@@ -2268,6 +2457,22 @@ class DocumentAnalyzerGUI:
             'margin_of_error': float(self.margin_of_error.get())
         }
 
+        cache_stats = (self.processing_engine or self.page_analyzer).get_cache_stats()
+        stats['cache_hits'] = cache_stats['hits']
+        stats['cache_misses'] = cache_stats['misses']
+
+        stats['result_cache_hits'] = self.result_cache.hits if self.result_cache else None
+        stats['result_cache_misses'] = self.result_cache.misses if self.result_cache else None
+
+        io_stats = self.processing_engine.get_io_stats() if self.processing_engine else {}
+        stats['io_wait_seconds'] = io_stats.get('wait_seconds')
+        stats['prefetch_read_seconds'] = io_stats.get('read_seconds')
+        stats['bytes_prefetched'] = io_stats.get('bytes_read')
+
+        timeout_stats = self.processing_engine.get_timeout_stats() if self.processing_engine else {}
+        stats['slow_lane_retries'] = timeout_stats.get('slow_lane', 0)
+        stats['timed_out'] = timeout_stats.get('timed_out', 0)
+
         for error in self.error_handler.errors.values():
             if error.severity == ErrorSeverity.CRITICAL:
                 stats['failed'] += 1
@@ -2284,14 +2489,14 @@ class DocumentAnalyzerGUI:
         if len(critical_errors) > 5:
             message += f"\n(and {len(critical_errors) - 5} more...)"
 
-        messagebox.showwarning("Processing Warnings", message)
+        self.show_dialog(messagebox.showwarning, "Processing Warnings", message)
 
     def update_final_status(self, total_errors: int):
         """Update final status message"""
         if total_errors > 0:
-            self.queue.put(("status", f"Analysis complete with {total_errors} errors"))
+            self.message_bus.status(f"Analysis complete with {total_errors} errors")
         else:
-            self.queue.put(("status", "Analysis complete successfully"))
+            self.message_bus.status("Analysis complete successfully")
 
     def update_progress(self, current: int, total: int) -> None:
         """
@@ -2306,11 +2511,11 @@ class DocumentAnalyzerGUI:
             progress = (current / total * 100) if total > 0 else 0
 
             # Update progress bar
-            self.queue.put(("progress", progress))
+            self.message_bus.progress(progress)
 
             # Update status message
             status_msg = f"Processing page {current + 1:,}/{total:,}"
-            self.queue.put(("status", status_msg))
+            self.message_bus.status(status_msg)
 
         except Exception as e:
             self.log_message(f"Error updating progress: {str(e)}")
@@ -2387,13 +2592,17 @@ class DocumentAnalyzerGUI:
             if not self.update_settings():
                 return
 
-            # Get current file count
+            # Get current file count, samples are drawn from every shard's files
             folder_path = self.folder_entry.get()
+            sampled = self.use_sampling.get() or self.use_random_n.get()
             files = FileProcessor.get_file_list(
                 folder_path,
                 self.include_pdfs.get(),
                 self.include_images.get(),
-                self.SUPPORTED_FORMATS
+                self.SUPPORTED_FORMATS,
+                options=replace(self.processing_options, shard=None if sampled else
+                                self.processing_options.shard),
+                manifest=self.get_scan_manifest(folder_path)
             )
             total_files = len(files)
 
@@ -2417,7 +2626,10 @@ class DocumentAnalyzerGUI:
                 margin_of_error=float(self.margin_of_error.get()) / 100,
                 include_pdfs=self.include_pdfs.get(),
                 include_images=self.include_images.get(),
-                total_files=total_files
+                total_files=total_files,
+                resume=self.resume_run.get(),
+                shard=self.shard,
+                sampling_seed=self.sampling_seed
             )
 
             # Calculate sample size if sampling is enabled
@@ -2443,7 +2655,7 @@ class DocumentAnalyzerGUI:
 
             # Initialize output handler
             try:
-                save_path = self.save_entry.get()
+                save_path = self.get_output_path()
                 self.output_handler = create_output_handler(
                     self.settings.output_format,
                     save_path,
@@ -2478,7 +2690,7 @@ class DocumentAnalyzerGUI:
             self.remaining_var.set("Remaining: Calculating...")
             self.rate_var.set("0 files/sec")
             self.status_label.config(text="Starting analysis...")
-            self.log_text.delete(1.0, tk.END)
+            self.clear_log()
 
             # Log initial status and settings
             self.log_message("Starting analysis...")
@@ -2501,9 +2713,6 @@ class DocumentAnalyzerGUI:
             # Store thread start time for monitoring
             self.processing_start_time = time.time()
 
-            # Start updating UI
-            self.update_ui()
-
         except Exception as e:
             error_msg = str(e)
             self.log_message(f"Error starting analysis: {error_msg}")
@@ -2559,6 +2768,7 @@ class DocumentAnalyzerGUI:
         """
         abs_path = os.path.abspath(image_path)  # Convert to absolute path at the start
         try:
+            from PIL import Image
             with Image.open(image_path) as image:
                 image = image.convert('RGB')
                 analysis = self.content_analyzer.analyze_image_content(image)
@@ -2598,31 +2808,38 @@ class DocumentAnalyzerGUI:
             }
 
     def log_message(self, message: str) -> None:
-        """Add timestamped message to log"""
+        """Add timestamped message to log, safe to call from any thread"""
         try:
-            timestamp = time.strftime('%H:%M:%S')
-            self.log_text.insert(tk.END, f"{timestamp}: {message}\n")
-            self.log_text.see(tk.END)
+            level = classify(message)
+            log_window_logger.log(level, message)
+            self.message_bus.log(message, level)
 
-            if any(keyword in message.lower() for keyword in ['error', 'failed', 'warning']):
-                # Highlight error messages
-                last_line = self.log_text.get("end-2c linestart", "end-1c")
-                self.log_text.tag_add('error', f"end-{len(last_line) + 1}c linestart", "end-1c")
-
-                # Auto-expand log for errors
-                if hasattr(self, 'log_expanded') and hasattr(self, 'log_expand_btn'):
-                    if not self.log_expanded.get():
-                        self.log_expanded.set(True)
-                        self.log_expand_btn.invoke()
+            # On the Tk thread write at once, other threads wait for update_ui
+            if get_ident() == self.ui_thread and hasattr(self, 'log_text'):
+                self.update_log(self.message_bus.take_lines())
 
         except Exception as e:
             print(f"Failed to log message: {e}\nOriginal message: {message}")
 
+    def show_dialog(self, dialog, title: str, message: str) -> None:
+        """Show a message box now on the Tk thread, or from update_ui otherwise"""
+        if get_ident() == self.ui_thread:
+            dialog(title, message)
+        else:
+            self.message_bus.post("dialog", (dialog, title, message))
+
+    def report_scan(self, message: str) -> None:
+        """Count scanned entries, logging only the messages about problems"""
+        if message.startswith("Scanning: "):
+            self.message_bus.count("scanned")
+        else:
+            self.log_message(message)
+
     def reset_progress(self):
         """Reset progress indicators and logs"""
         self.progress_var.set(0)
         self.status_label.config(text="Starting analysis...")
-        self.log_text.delete(1.0, tk.END)
+        self.clear_log()
         self.log_message("Starting analysis...")
 
         # Reset processing state
@@ -2633,58 +2850,60 @@ class DocumentAnalyzerGUI:
         self.pause_event.clear()
 
     def update_ui(self) -> None:
-        """Update UI with progress and status information"""
+        """Apply what the message bus collected since the last poll, on the Tk thread"""
         try:
-            while True:
-                try:
-                    msg_type, msg_data = self.queue.get_nowait()
-                    try:
-                        match msg_type:
-                            case "log":
-                                self.update_log(msg_data)
-                            case "progress":
-                                # Update progress bar
-                                self.update_progress_bar(msg_data)
-
-                                # Update processing stats and timing info
-                                if hasattr(self, 'processing_stats'):
-                                    processed_count = int(msg_data * self.settings.total_files / 100)
-                                    self.processing_stats.update(processed_count)
-
-                                    # Update timing displays
-                                    self.elapsed_var.set(
-                                        f"Elapsed: {self.processing_stats.get_elapsed_time()}"
-                                    )
-                                    self.remaining_var.set(
-                                        f"Remaining: {self.processing_stats.get_estimated_time_remaining(self.settings.total_files)}"
-                                    )
-                                    self.rate_var.set(
-                                        self.processing_stats.get_processing_rate()
-                                    )
-                            case "status":
-                                self.update_status(msg_data)
-                            case "complete":
-                                self.handle_completion()
-                                # Don't return here - let task_done() execute first
-                                should_return = True
-                            case _:
-                                self.log_message(f"Unknown message type: {msg_type}")
-                    finally:
-                        # Ensure task_done() is called for every get()
-                        self.queue.task_done()
-
-                    # Check if we should return after task_done()
-                    if msg_type == "complete":
-                        return
-
-                except queue.Empty:
-                    break
+            update = self.message_bus.drain()
+
+            if update.dropped:
+                update.lines.insert(0, (logging.WARNING, f"{time.strftime('%H:%M:%S')}: "
+                                                         f"{update.dropped:,} log messages not shown, "
+                                                         f"see the log file"))
+            if update.lines:
+                self.update_log(update.lines)
+
+            if "scanned" in update.counters:
+                self.update_status(f"Scanning: {update.counters['scanned']:,} entries checked")
+
+            if update.progress is not None:
+                # Update progress bar
+                self.update_progress_bar(update.progress)
+
+                # Update processing stats and timing info
+                if hasattr(self, 'processing_stats'):
+                    processed_count = int(update.progress * self.settings.total_files / 100)
+                    self.processing_stats.update(processed_count)
+
+                    # Update timing displays
+                    self.elapsed_var.set(
+                        f"Elapsed: {self.processing_stats.get_elapsed_time()}"
+                    )
+                    self.remaining_var.set(
+                        f"Remaining: {self.processing_stats.get_estimated_time_remaining(self.settings.total_files)}"
+                    )
+                    self.rate_var.set(
+                        self.processing_stats.get_processing_rate()
+                    )
+
+            if update.status is not None:
+                self.update_status(update.status)
+
+            for event, data in update.events:
+                match event:
+                    case "complete":
+                        self.handle_completion()
+                    case "dialog":
+                        dialog, title, message = data
+                        dialog(title, message)
+                    case _:
+                        self.log_message(f"Unknown message type: {event}")
         except Exception as e:
             self.handle_ui_error(e)
         finally:
-            if self.processing:
+            try:
                 # Schedule next update
-                self.root.after(100, self.update_ui)
+                self.root.after(POLL_INTERVAL_MS, self.update_ui)
+            except tk.TclError:
+                pass  # The window was closed
 
     def update_ui_state(self, analyzing: bool):
         """Update UI controls based on analysis state"""
@@ -2697,14 +2916,69 @@ class DocumentAnalyzerGUI:
             self.pause_btn.config(state=tk.DISABLED)
             self.stop_btn.config(state=tk.DISABLED)
 
-    def update_log(self, message: str):
-        """Update log text widget"""
+    def update_log(self, entries: List[Tuple[int, str]]):
+        """Add (level, line) pairs to the log history and show them on the newest page"""
+        if not entries:
+            return
         try:
-            self.log_text.insert(tk.END, message + "\n")
-            self.log_text.see(tk.END)
+            shown = self.log_history.append(entries)
+            if self.log_history.live:
+                self.insert_log_lines(shown)
+
+                # Keep only the newest page in the widget
+                excess = int(self.log_text.index("end-1c").split('.')[0]) - 1 - self.log_history.page_lines
+                if excess > 0:
+                    self.log_text.delete("1.0", f"{excess + 1}.0")
+                self.log_text.see(tk.END)
+            self.update_log_page_label()
+
+            if any(level >= logging.WARNING for level, _ in entries):
+                # Auto-expand log for errors
+                if hasattr(self, 'log_expanded') and hasattr(self, 'log_expand_btn'):
+                    if not self.log_expanded.get():
+                        self.log_expanded.set(True)
+                        self.log_expand_btn.invoke()
         except Exception as e:
             print(f"Error updating log: {str(e)}")
 
+    def insert_log_lines(self, entries: List[Tuple[int, str]]):
+        """Append lines to the log widget in one insert, highlighting errors"""
+        if not entries:
+            return
+        first_line = int(self.log_text.index("end-1c").split('.')[0])
+        self.log_text.insert(tk.END, "\n".join(line for _, line in entries) + "\n")
+        for i, (level, _) in enumerate(entries):
+            if level >= logging.WARNING:
+                # Highlight error messages
+                self.log_text.tag_add('error', f"{first_line + i}.0", f"{first_line + i}.end")
+
+    def show_log_page(self):
+        """Redraw the log widget with the current page of the history"""
+        self.log_text.delete(1.0, tk.END)
+        self.insert_log_lines(self.log_history.view())
+        self.log_text.see(tk.END if self.log_history.live else "1.0")
+        self.update_log_page_label()
+
+    def update_log_page_label(self):
+        """Show which page of the log history is displayed"""
+        pages = self.log_history.page_count()
+        self.log_page_var.set(f"Page {pages - self.log_history.page:,} of {pages:,}")
+
+    def filter_log(self):
+        """Apply the selected severity filter to the log window"""
+        self.log_history.set_filter(SEVERITY_FILTERS[self.log_filter.get()])
+        self.show_log_page()
+
+    def page_log(self, pages: int):
+        """Page back (positive) or forward (negative) through the log history"""
+        self.log_history.move(pages)
+        self.show_log_page()
+
+    def clear_log(self):
+        """Empty the log window and its history, the log file keeps everything"""
+        self.log_history.clear()
+        self.show_log_page()
+
     def update_progress_bar(self, progress: float):
         """Update progress bar value"""
         try:
@@ -2897,6 +3171,10 @@ class DocumentAnalyzerGUI:
                 is_final=is_final
             )
 
+            if self.checkpoint_journal:
+                self.checkpoint_journal.record(self.pending_checkpoints)
+                self.pending_checkpoints = []
+
             if output_file:
                 batch_size = len(self.results_batch)
                 self.log_message(f"Wrote batch of {batch_size:,} results to {output_file}")
@@ -2917,10 +3195,10 @@ class DocumentAnalyzerGUI:
         """Export detailed error report"""
         try:
             timestamp = time.strftime('%Y%m%d_%H%M%S')
-            report_path = os.path.join(
+            report_path = shard_output_path(os.path.join(
                 os.path.dirname(self.save_entry.get()),
                 f'error_report_{timestamp}.csv'
-            )
+            ), self.settings.get_shard())
 
             error_data = []
             for error in self.error_handler.errors.values():
@@ -2935,6 +3213,7 @@ class DocumentAnalyzerGUI:
                 })
 
             if error_data:
+                import pandas as pd
                 pd.DataFrame(error_data).to_csv(report_path, index=False)
                 self.log_message(f"Error report exported to: {report_path}")
 
@@ -2945,10 +3224,10 @@ class DocumentAnalyzerGUI:
         """Create processing success report"""
         try:
             stats = self.calculate_processing_stats()
-            report_path = os.path.join(
+            report_path = shard_output_path(os.path.join(
                 os.path.dirname(self.save_entry.get()),
                 'processing_report.txt'
-            )
+            ), self.settings.get_shard())
 
             with open(report_path, 'w', encoding='utf-8') as f:
                 f.write("Document Margin Analysis Report\n")
@@ -2966,6 +3245,26 @@ class DocumentAnalyzerGUI:
                     f.write(f"Confidence Level: {stats['confidence_level']}%\n")
                     f.write(f"Margin of Error: {stats['margin_of_error']}%\n\n")
 
+                f.write("Page Cache:\n")
+                f.write(f"Hits: {stats['cache_hits']}\n")
+                f.write(f"Misses: {stats['cache_misses']}\n\n")
+
+                if stats['result_cache_hits'] is not None:
+                    f.write("Result Cache:\n")
+                    f.write(f"Files Reused: {stats['result_cache_hits']}\n")
+                    f.write(f"Files Analyzed: {stats['result_cache_misses']}\n\n")
+
+                if stats['io_wait_seconds'] is not None:
+                    f.write("Input/Output:\n")
+                    f.write(f"Analyzer Idle Time: {stats['io_wait_seconds']:.1f}s\n")
+                    f.write(f"Prefetched: {stats['bytes_prefetched'] / (1024 * 1024):.1f} MB "
+                            f"in {stats['prefetch_read_seconds']:.1f}s\n\n")
+
+                if stats['slow_lane_retries']:
+                    f.write("Timeouts:\n")
+                    f.write(f"Retried at Lower DPI: {stats['slow_lane_retries']}\n")
+                    f.write(f"Timed Out Again: {stats['timed_out']}\n\n")
+
                 f.write("Processing Configuration:\n")
                 f.write(f"Threshold: {self.threshold.get()}%\n")
                 f.write(f"Output Format: {self.output_format.get()}\n")
@@ -2977,8 +3276,28 @@ class DocumentAnalyzerGUI:
             self.log_message(f"Failed to create processing report: {str(e)}")
 
 
+def parse_arguments(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options of the GUI"""
+    parser = argparse.ArgumentParser(description="Document Margin Analyzer")
+    parser.add_argument("--shard", default="", metavar="i/N",
+                        help="Analyze only the i-th of N partitions of the selected folder, "
+                             "for splitting a corpus across machines")
+    parser.add_argument("--sampling-seed", type=int,
+                        help="Seed for reproducible sampling, required when sampling with --shard")
+    parser.add_argument("--exit-after-startup", action="store_true",
+                        help="Close again once the main window is shown, for timing startup")
+    args, _ = parser.parse_known_args(argv)
+    if args.shard:
+        try:
+            parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    return args
+
+
 def main() -> None:
     """Main entry point for the application"""
+    args = parse_arguments()
     root = tk.Tk()
     app = None
 
@@ -3007,10 +3326,16 @@ def main() -> None:
             pass
 
         # Create and configure application
-        app = DocumentAnalyzerGUI(root)
-        root.title("Document Margin Analyzer v2.0")
+        app = DocumentAnalyzerGUI(root, args.shard, args.sampling_seed)
+        root.title("Document Margin Analyzer v2.0" + (f" - Shard {args.shard}" if args.shard else ""))
         root.protocol("WM_DELETE_WINDOW", app.cleanup)
 
+        if args.exit_after_startup:
+            # Draw the window once and close, see benchmarks/bench_startup.py
+            root.update()
+            app.cleanup()
+            return
+
         # Start application
         root.mainloop()
 
@@ -3028,4 +3353,5 @@ def main() -> None:
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
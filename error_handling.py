@@ -19,9 +19,20 @@ from enum import Enum
 import traceback
 import logging
 import os
+import queue
+import atexit
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
 
 
+# Size at which the log file rolls over and the number of old files kept
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Writes queued log records to the log file, started once per process
+_log_listener: Optional[QueueListener] = None
+
+
 class ErrorSeverity(Enum):
     """Enumeration of error severity levels"""
     INFO = "INFO"
@@ -102,7 +113,16 @@ class ErrorHandler:
         self.errors: Dict[str, ProcessingError] = {}
 
     def setup_logging(self):
-        """Setup logging configuration"""
+        """
+        Setup logging configuration
+
+        Records are put on a queue and written to a rotating log file by a
+        background thread, so logging never waits on the disk.
+        """
+        global _log_listener
+        if _log_listener is not None:
+            return
+
         if not os.path.exists(self.log_dir):
             os.makedirs(self.log_dir)
 
@@ -111,11 +131,18 @@ class ErrorHandler:
             f"document_analyzer_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
         )
 
-        logging.basicConfig(
-            filename=log_file,
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
+        file_handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES,
+                                           backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+        log_queue = queue.SimpleQueue()
+        _log_listener = QueueListener(log_queue, file_handler)
+        _log_listener.start()
+        atexit.register(_log_listener.stop)  # Write what is still queued at exit
+
+        root_logger = logging.getLogger()
+        root_logger.addHandler(QueueHandler(log_queue))
+        root_logger.setLevel(logging.INFO)
 
     def handle_error(self, error: Exception, file_name: str,
                      page_number: Optional[int] = None) -> ProcessingError:
@@ -0,0 +1,121 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Bounded log history behind the log window, with severity filter and paging"""
+import logging
+import collections
+from typing import List, Tuple
+
+# Lines kept for paging back, older lines are only in the log file
+HISTORY_LINES = 20000
+
+# Lines shown in the log window at once
+PAGE_LINES = 500
+
+# Filter choices of the log window and the lowest level each one shows
+SEVERITY_FILTERS = {
+    'All': logging.DEBUG,
+    'Info': logging.INFO,
+    'Warnings': logging.WARNING,
+    'Errors': logging.ERROR
+}
+
+
+def classify(message: str) -> int:
+    """
+    Guess the logging level of a log window message from its wording
+
+    Args:
+        message: Message without timestamp
+
+    Returns:
+        int: Logging level
+    """
+    lower = message.lower()
+    if 'critical' in lower:
+        return logging.CRITICAL
+    if 'error' in lower or 'failed' in lower:
+        return logging.ERROR
+    if 'warning' in lower:
+        return logging.WARNING
+    if message.startswith('Debug:'):
+        return logging.DEBUG
+    return logging.INFO
+
+
+class LogHistory:
+    """
+    The most recent log lines, filtered by level and split into pages
+
+    Page 0 is the newest page and follows new lines as they arrive;
+    higher pages go back in time. Lines that fall out of the history are
+    still in the log file.
+    """
+
+    def __init__(self, capacity: int = HISTORY_LINES, page_lines: int = PAGE_LINES):
+        """
+        Initialize history
+
+        Args:
+            capacity: Lines kept before the oldest are discarded
+            page_lines: Lines per page
+        """
+        self.page_lines = max(1, page_lines)
+        self.min_level = logging.DEBUG
+        self.page = 0
+        self._entries = collections.deque(maxlen=max(1, capacity))
+
+    @property
+    def live(self) -> bool:
+        """True while the newest page is shown"""
+        return self.page == 0
+
+    def append(self, entries: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        """
+        Add lines to the history
+
+        Args:
+            entries: (level, line) pairs in arrival order
+
+        Returns:
+            List[Tuple[int, str]]: Added lines that pass the filter
+        """
+        self._entries.extend(entries)
+        return [entry for entry in entries if entry[0] >= self.min_level]
+
+    def clear(self):
+        """Forget all lines and return to the newest page"""
+        self._entries.clear()
+        self.page = 0
+
+    def set_filter(self, min_level: int):
+        """Show only lines at or above a level, starting from the newest page"""
+        self.min_level = min_level
+        self.page = 0
+
+    def page_count(self) -> int:
+        """Number of pages of lines passing the filter"""
+        matching = sum(1 for level, _ in self._entries if level >= self.min_level)
+        return max(1, -(-matching // self.page_lines))
+
+    def move(self, pages: int):
+        """Go back (positive) or forward (negative) by pages, staying in range"""
+        self.page = min(max(self.page + pages, 0), self.page_count() - 1)
+
+    def view(self) -> List[Tuple[int, str]]:
+        """Lines of the current page, oldest first"""
+        matching = [entry for entry in self._entries if entry[0] >= self.min_level]
+        end = len(matching) - self.page * self.page_lines
+        return matching[max(end - self.page_lines, 0):max(end, 0)]
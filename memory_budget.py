@@ -0,0 +1,125 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Admission control for the memory used by rendered pixmaps"""
+import multiprocessing
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+BYTES_PER_MB = 1024 * 1024
+
+# Seconds reclaim waits for the budget's lock, which a killed process may hold
+RECLAIM_LOCK_TIMEOUT = 5.0
+
+# Workers are always spawned so that they behave the same on every platform
+# and do not inherit the GUI's threads and Tk state
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class MemoryBudget:
+    """
+    Byte budget for pixmaps held at the same time, shared between processes
+
+    A render is admitted once its predicted size fits in what the other
+    renders leave free. Requests larger than the whole budget wait until
+    nothing else is rendering and then run alone.
+    """
+
+    def __init__(self, capacity_bytes: int):
+        """
+        Initialize budget
+
+        Args:
+            capacity_bytes: Total bytes of pixmap memory allowed at once
+        """
+        if capacity_bytes < 1:
+            raise ValueError("Memory budget must be positive")
+
+        self.capacity = capacity_bytes
+        self._condition = MP_CONTEXT.Condition()
+        self._used = MP_CONTEXT.Value('q', 0, lock=False)
+        self._throttled = MP_CONTEXT.Value('q', 0, lock=False)
+        self._held = None
+        self._on_wait = None
+
+    def fits(self, nbytes: int) -> bool:
+        """Check whether a request can ever be admitted alongside other renders"""
+        return nbytes <= self.capacity
+
+    @contextmanager
+    def reserve(self, nbytes: int):
+        """
+        Hold part of the budget, waiting until it is available
+
+        Args:
+            nbytes: Predicted size of the pixmap
+        """
+        nbytes = min(nbytes, self.capacity)
+        with self._condition:
+            if self._used.value + nbytes > self.capacity:
+                self._throttled.value += 1
+                while self._used.value + nbytes > self.capacity:
+                    if self._on_wait is not None:
+                        self._on_wait()
+                    self._condition.wait(0.5)
+            self._used.value += nbytes
+            if self._held is not None:
+                self._held.value += nbytes
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._used.value -= nbytes
+                if self._held is not None:
+                    self._held.value -= nbytes
+                self._condition.notify_all()
+
+    def track(self, held, on_wait: Optional[Callable[[], None]] = None):
+        """
+        Count the reservations of this process in a shared value
+
+        Args:
+            held: Value('q') of the process, passed to reclaim if the
+                process is killed while rendering
+            on_wait: Called about twice a second while a reservation of this
+                process waits for memory
+        """
+        self._held = held
+        self._on_wait = on_wait
+
+    def reclaim(self, held) -> bool:
+        """
+        Give back what a killed process still held
+
+        Returns:
+            bool: False if the lock could not be taken, because the process
+            was killed while holding it
+        """
+        if not self._condition.acquire(timeout=RECLAIM_LOCK_TIMEOUT):
+            return False
+        try:
+            self._used.value -= held.value
+            held.value = 0
+            self._condition.notify_all()
+        finally:
+            self._condition.release()
+        return True
+
+    @property
+    def throttled(self) -> int:
+        """Number of renders that had to wait for memory"""
+        with self._condition:
+            return self._throttled.value
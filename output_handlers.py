@@ -20,9 +20,6 @@ import sqlite3
 import csv
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
-import pandas as pd
-import pyarrow as pa
-import pyarrow.parquet as pq
 from datetime import datetime
 from threading import Lock
 from enum import Enum
@@ -41,6 +38,8 @@ class AnalysisMetadata:
     sample_size: Optional[int] = None
     random_n_size: Optional[int] = None  # Single field for random N sampling
     total_files: Optional[int] = None
+    sampling_seed: Optional[int] = None
+    shard: Optional[str] = None  # "i/N" for the output of one shard
 
     def __post_init__(self):
         """Validate metadata after initialization"""
@@ -59,9 +58,22 @@ class AnalysisMetadata:
 class OutputHandler:
     """Base class for handling different output formats"""
 
-    def __init__(self, output_path: str, settings: 'AnalysisSettings'):
+    def __init__(self, output_path: str, settings: 'AnalysisSettings',
+                 append: bool = False, durable: bool = False):
+        """
+        Initialize handler
+
+        Args:
+            output_path: Path of the output file
+            settings: Analysis settings
+            append: Continue the CSV output of an earlier run instead of replacing
+                it, Parquet and SQLite outputs are always extended
+            durable: Sync every batch to disk before write_batch returns
+        """
         self.output_path = output_path
         self.settings = settings
+        self.append = append
+        self.durable = durable
         self.metadata = AnalysisMetadata(
             created_at=datetime.now().isoformat(),
             threshold=settings.threshold,
@@ -71,7 +83,9 @@ class OutputHandler:
             margin_of_error=settings.margin_of_error if settings.use_sampling else None,
             sample_size=settings.sample_size if settings.use_sampling else None,
             random_n_size=settings.random_n_size if settings.use_random_n else None,
-            total_files=settings.total_files
+            total_files=settings.total_files,
+            sampling_seed=settings.sampling_seed,
+            shard=settings.shard or None
         )
 
     def write_batch(self, batch: List[Dict[str, Any]], is_final: bool = False) -> Optional[str]:
@@ -90,14 +104,39 @@ class OutputHandler:
 class CSVOutputHandler(OutputHandler):
     """Handles output in CSV format with file splitting"""
 
-    def __init__(self, output_path: str, settings: 'AnalysisSettings'):
-        super().__init__(output_path, settings)
+    def __init__(self, output_path: str, settings: 'AnalysisSettings',
+                 append: bool = False, durable: bool = False):
+        super().__init__(output_path, settings, append, durable)
         self.current_file_number = 1
         self.total_rows_written = 0
+        if append:
+            self.find_append_position()
 
         # Write metadata to separate JSON file
         self.write_metadata()
 
+    def find_append_position(self):
+        """Continue after the last split file of an earlier run"""
+        while os.path.exists(self.get_next_filename()):
+            self.current_file_number += 1
+        self.current_file_number = max(1, self.current_file_number - 1)
+
+        last_file = self.get_next_filename()
+        if not os.path.exists(last_file):
+            return
+
+        # Drop a row torn by a crash so appended rows start on a new line
+        with open(last_file, 'rb+') as f:
+            data_end = f.seek(0, os.SEEK_END)
+            if data_end:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.seek(0)
+                    f.truncate(f.read().rfind(b'\n') + 1)
+
+        with open(last_file, 'r', newline='', encoding='utf-8') as f:
+            self.total_rows_written = max(0, sum(1 for _ in csv.reader(f)) - 1)
+
     def write_metadata(self):
         """Write metadata to a separate JSON file"""
         metadata_path = f"{os.path.splitext(self.output_path)[0]}_metadata.json"
@@ -145,7 +184,8 @@ class CSVOutputHandler(OutputHandler):
         output_file = self.get_next_filename()
         write_header = not os.path.exists(output_file) or self.total_rows_written == 0
 
-        # Convert to DataFrame
+        # Convert to DataFrame, importing pandas only once CSV output is written
+        import pandas as pd
         df_batch = pd.DataFrame(processed_results)
 
         # For Page column, ensure it's properly typed
@@ -153,14 +193,17 @@ class CSVOutputHandler(OutputHandler):
             df_batch['Page'] = df_batch['Page'].astype('Int64')
 
         # Write to CSV
-        df_batch.to_csv(
-            output_file,
-            mode='a' if not write_header else 'w',
-            header=write_header,
-            index=False,
-            encoding='utf-8',
-            quoting=csv.QUOTE_MINIMAL
-        )
+        with open(output_file, 'a' if not write_header else 'w',
+                  newline='', encoding='utf-8') as f:
+            df_batch.to_csv(
+                f,
+                header=write_header,
+                index=False,
+                quoting=csv.QUOTE_MINIMAL
+            )
+            if self.durable:
+                f.flush()
+                os.fsync(f.fileno())
 
         self.total_rows_written += current_batch_size
         return output_file
@@ -169,8 +212,9 @@ class CSVOutputHandler(OutputHandler):
 class ParquetOutputHandler(OutputHandler):
     """Handles output in Parquet format with support for nested data structures"""
 
-    def __init__(self, output_path: str, settings: 'AnalysisSettings'):
-        super().__init__(output_path, settings)
+    def __init__(self, output_path: str, settings: 'AnalysisSettings',
+                 append: bool = False, durable: bool = False):
+        super().__init__(output_path, settings, append, durable)
         self.output_path = f"{os.path.splitext(output_path)[0]}.parquet"
         self.schema = None
         self.writer = None
@@ -215,7 +259,8 @@ class ParquetOutputHandler(OutputHandler):
             # Flatten the batch data
             flattened_batch = self._flatten_batch(batch)
 
-            # Convert to DataFrame
+            # Convert to DataFrame; pandas and pyarrow load on the first Parquet batch
+            import pandas as pd
             df = pd.DataFrame(flattened_batch)
 
             # Convert any remaining object columns to string
@@ -227,24 +272,23 @@ class ParquetOutputHandler(OutputHandler):
                 df['Page'] = pd.to_numeric(df['Page'], errors='coerce').astype('Int32')
 
             # Write to parquet
-            if not os.path.exists(self.output_path):
-                # First write - create new file
-                df.to_parquet(
-                    self.output_path,
-                    engine='pyarrow',
-                    compression='snappy',
-                    index=False
-                )
-            else:
+            if os.path.exists(self.output_path):
                 # Append to existing file
                 existing_df = pd.read_parquet(self.output_path)
-                combined_df = pd.concat([existing_df, df], ignore_index=True)
-                combined_df.to_parquet(
-                    self.output_path,
-                    engine='pyarrow',
-                    compression='snappy',
-                    index=False
-                )
+                df = pd.concat([existing_df, df], ignore_index=True)
+
+            # Replace the file in one step so a crash never leaves it half written
+            temp_path = f"{self.output_path}.tmp"
+            df.to_parquet(
+                temp_path,
+                engine='pyarrow',
+                compression='snappy',
+                index=False
+            )
+            if self.durable:
+                with open(temp_path, 'rb+') as f:
+                    os.fsync(f.fileno())
+            os.replace(temp_path, self.output_path)
 
             if is_final:
                 self._write_metadata()
@@ -281,8 +325,9 @@ class ParquetOutputHandler(OutputHandler):
 class SQLiteOutputHandler(OutputHandler):
     """Handles output in SQLite format with thread-safe operations"""
 
-    def __init__(self, output_path: str, settings: 'AnalysisSettings'):
-        super().__init__(output_path, settings)
+    def __init__(self, output_path: str, settings: 'AnalysisSettings',
+                 append: bool = False, durable: bool = False):
+        super().__init__(output_path, settings, append, durable)
         self.output_path = f"{os.path.splitext(output_path)[0]}.db"
         self.batch_size = 1000
         self.row_count = 0
@@ -294,7 +339,7 @@ class SQLiteOutputHandler(OutputHandler):
         conn = sqlite3.connect(self.output_path, timeout=60)
         conn.execute("PRAGMA foreign_keys = ON")
         conn.execute("PRAGMA journal_mode = WAL")
-        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA synchronous = {'FULL' if self.durable else 'NORMAL'}")
         conn.execute("PRAGMA temp_store = MEMORY")
         conn.execute("PRAGMA cache_size = -2000")
         conn.execute("PRAGMA busy_timeout = 30000")
@@ -313,6 +358,7 @@ class SQLiteOutputHandler(OutputHandler):
                         content_status TEXT NOT NULL,
                         text_status TEXT,
                         image_status TEXT,
+                        decided_by TEXT,
                         file_type TEXT NOT NULL,
                         error_message TEXT,
                         error_severity TEXT,
@@ -360,6 +406,13 @@ class SQLiteOutputHandler(OutputHandler):
                     )
                 ''')
 
+                # Add columns introduced after the database was created
+                existing_columns = {
+                    row[1] for row in conn.execute('PRAGMA table_info(analysis_results)')
+                }
+                if 'decided_by' not in existing_columns:
+                    conn.execute('ALTER TABLE analysis_results ADD COLUMN decided_by TEXT')
+
                 # Create initial indexes
                 conn.execute('CREATE INDEX IF NOT EXISTS idx_file_path ON analysis_results(file_path)')
                 conn.execute('CREATE INDEX IF NOT EXISTS idx_content_status ON analysis_results(content_status)')
@@ -403,7 +456,8 @@ class SQLiteOutputHandler(OutputHandler):
                     ''', (batch_start_time, len(batch)))
                     batch_id = cursor.lastrowid
 
-                    # Process each result
+                    # Process each result, the rows of a file share one stat
+                    file_sizes = {}
                     for result in batch:
                         try:
                             # Get file info
@@ -411,21 +465,28 @@ class SQLiteOutputHandler(OutputHandler):
                                 os.path.abspath(result['File']),
                                 os.path.dirname(self.output_path)
                             )
-                            file_size = os.path.getsize(result['File']) if os.path.exists(result['File']) else 0
+                            file_size = file_sizes.get(result['File'])
+                            if file_size is None:
+                                try:
+                                    file_size = os.path.getsize(result['File'])
+                                except OSError:
+                                    file_size = 0
+                                file_sizes[result['File']] = file_size
 
                             # Insert main result
                             cursor = conn.execute('''
                                 INSERT INTO analysis_results 
                                 (file_path, page_number, content_status, text_status,
-                                 image_status, file_type, error_message, error_severity,
-                                 relative_path, file_size, batch_id)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                 image_status, decided_by, file_type, error_message,
+                                 error_severity, relative_path, file_size, batch_id)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                             ''', (
                                 result['File'],
                                 result.get('Page', 1),
                                 result['Content Status'],
                                 result.get('Text Status', ''),
                                 result.get('Image Status', ''),
+                                result.get('Decided By'),
                                 result.get('Type', 'Unknown'),
                                 result.get('Error'),
                                 result.get('Error Severity'),
@@ -511,7 +572,8 @@ class SQLiteOutputHandler(OutputHandler):
         pass
 
 
-def create_output_handler(output_format: str, output_path: str, settings: 'AnalysisSettings') -> OutputHandler:
+def create_output_handler(output_format: str, output_path: str, settings: 'AnalysisSettings',
+                          append: bool = False, durable: bool = False) -> OutputHandler:
     """Factory function to create appropriate output handler"""
     handlers = {
         'csv': CSVOutputHandler,
@@ -523,4 +585,4 @@ def create_output_handler(output_format: str, output_path: str, settings: 'Analy
     if not handler_class:
         raise ValueError(f"Unsupported output format: {output_format}")
 
-    return handler_class(output_path, settings)
+    return handler_class(output_path, settings, append, durable)
@@ -0,0 +1,184 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Within-run memoization of page analysis results"""
+import hashlib
+import re
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional, Set
+
+import fitz
+
+# Matches indirect object references such as "12 0 R"
+REFERENCE_PATTERN = re.compile(rb'(\d+) (\d+) R\b')
+
+# Keys that point back up the page tree or to sibling annotations, following
+# them would pull unrelated parts of the document into the fingerprint
+BACK_REFERENCE_PATTERN = re.compile(rb'/(?:P|Parent|Popup|IRT)\s+\d+ \d+ R\b')
+
+# Streams holding drawing operators, always hashed in full
+DRAWING_STREAM_PATTERN = re.compile(rb'/Subtype\s*/Form\b|/PatternType\s+1\b')
+
+# Other compressed streams, such as images and embedded fonts, are told apart
+# by their dictionary, since their /Length depends on the data
+FILTER_PATTERN = re.compile(rb'/Filter\b')
+
+
+class PageFingerprinter:
+    """
+    Computes content-based fingerprints of PDF pages
+
+    A fingerprint covers the page geometry, the raw content streams and every
+    object reachable from the page resources and annotations. Referenced
+    objects are hashed by content rather than by object number, so identical
+    pages in different documents share a fingerprint. Compressed images and
+    fonts are hashed by their dictionary alone, whose /Length and filters
+    tell them apart, so a scan's image data is not read for every page.
+    """
+
+    def __init__(self):
+        self._document: Optional[fitz.Document] = None
+        self._object_digests: Dict[int, bytes] = {}
+
+    def fingerprint(self, page: fitz.Page) -> bytes:
+        """
+        Calculate the fingerprint of a page
+
+        Args:
+            page: fitz.Page object
+
+        Returns:
+            Fingerprint digest
+        """
+        doc = page.parent
+        if doc is not self._document:
+            # Object digests are only valid within one document
+            self._document = doc
+            self._object_digests = {}
+
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(repr((tuple(page.rect), tuple(page.mediabox), page.rotation)).encode())
+
+        for xref in page.get_contents():
+            digest.update(self._object_digest(doc, xref, set(), drawing=True))
+
+        for key in ("Resources", "Annots"):
+            digest.update(key.encode())
+            digest.update(self._page_key_digest(doc, page.xref, key))
+
+        return digest.digest()
+
+    def _page_key_digest(self, doc: fitz.Document, xref: int, key: str) -> bytes:
+        """Digest a page dictionary entry, following inheritance through the page tree"""
+        visited = set()
+        while xref and xref not in visited:
+            visited.add(xref)
+            value_type, value = doc.xref_get_key(xref, key)
+            if value_type != 'null':
+                return self._value_digest(doc, value.encode(), set())
+
+            # Resources may be inherited from a parent Pages node
+            parent_type, parent = doc.xref_get_key(xref, "Parent")
+            xref = int(parent.split()[0]) if parent_type == 'xref' else 0
+
+        return b''
+
+    def _object_digest(self, doc: fitz.Document, xref: int, in_progress: Set[int],
+                       drawing: bool = False) -> bytes:
+        """Digest an indirect object, its drawing stream and everything it references"""
+        if xref in self._object_digests:
+            return self._object_digests[xref]
+        if xref in in_progress:
+            return b'cycle'
+
+        in_progress.add(xref)
+        source = doc.xref_object(xref, compressed=True).encode()
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(self._value_digest(doc, source, in_progress))
+        # Every stream dictionary carries a Length entry
+        if b'/Length' in source and doc.xref_is_stream(xref) and (
+                drawing or DRAWING_STREAM_PATTERN.search(source) or not FILTER_PATTERN.search(source)):
+            digest.update(doc.xref_stream_raw(xref))
+        in_progress.discard(xref)
+
+        self._object_digests[xref] = digest.digest()
+        return self._object_digests[xref]
+
+    def _value_digest(self, doc: fitz.Document, source: bytes, in_progress: Set[int]) -> bytes:
+        """Digest PDF object source with references replaced by their content digests"""
+        source = BACK_REFERENCE_PATTERN.sub(b'', source)
+        return hashlib.blake2b(
+            REFERENCE_PATTERN.sub(
+                lambda match: self._object_digest(doc, int(match.group(1)), in_progress).hex().encode(),
+                source
+            ),
+            digest_size=20
+        ).digest()
+
+
+class PageResultCache:
+    """Bounded LRU cache of page analysis results keyed by page fingerprint"""
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Initialize cache
+
+        Args:
+            max_entries: Maximum number of cached pages, 0 disables caching
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[bytes, Any]' = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: bytes) -> Optional[Any]:
+        """Get a cached result and mark it as recently used"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: bytes, value: Any):
+        """Store a result, evicting the least recently used entry when full"""
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all cached results and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get cache hit and miss counts"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries)
+            }
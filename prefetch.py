@@ -0,0 +1,123 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Read-ahead of input files into a local spool directory"""
+import os
+import time
+import shutil
+import tempfile
+import itertools
+from threading import Condition, Lock
+from typing import Callable, Dict, Optional
+
+# Large sequential reads keep network shares streaming
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class FileSpool:
+    """
+    Size-capped local copies of files read ahead of the analysis
+
+    Files are copied with large sequential reads, so a slow share is read at
+    its streaming rate instead of with the small random reads of a PDF
+    parser. A copy is kept until it is released, and reading ahead waits
+    while the spool holds prefetch_depth files or spool_size bytes.
+    """
+
+    def __init__(self, spool_dir: Optional[str] = None, spool_size: int = 2048 * 1024 * 1024,
+                 prefetch_depth: int = 8):
+        """
+        Initialize spool
+
+        Args:
+            spool_dir: Directory the run's spool folder is created in, the
+                system temporary directory if omitted
+            spool_size: Maximum bytes of spooled copies at once
+            prefetch_depth: Maximum number of spooled copies at once
+        """
+        if spool_dir:
+            os.makedirs(spool_dir, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="document_analyzer_spool_", dir=spool_dir or None)
+        self.spool_size = spool_size
+        self.prefetch_depth = max(1, prefetch_depth)
+        self.read_seconds = 0.0
+        self.bytes_read = 0
+        self._used = 0
+        self._copies: Dict[str, int] = {}
+        self._names = itertools.count()
+        self._condition = Condition()
+        self._stats_lock = Lock()
+
+    def fetch(self, file_path: str, should_stop: Callable[[], bool]) -> str:
+        """
+        Copy a file into the spool
+
+        Args:
+            file_path: Path of the file on its original storage
+            should_stop: Returns True when waiting for room should be abandoned
+
+        Returns:
+            Path of the local copy, or file_path itself if the file is larger
+            than the whole spool or waiting was abandoned
+        """
+        size = os.path.getsize(file_path)
+        if size > self.spool_size:
+            return file_path
+
+        with self._condition:
+            while (self._used + size > self.spool_size or
+                   len(self._copies) >= self.prefetch_depth):
+                if should_stop():
+                    return file_path
+                self._condition.wait(0.1)
+            self._used += size
+            local_path = os.path.join(
+                self.directory, f"{next(self._names)}{os.path.splitext(file_path)[1]}")
+            self._copies[local_path] = size
+
+        start = time.perf_counter()
+        try:
+            with open(file_path, 'rb') as source, open(local_path, 'wb') as target:
+                shutil.copyfileobj(source, target, READ_CHUNK_SIZE)
+        except Exception:
+            self.release(local_path)
+            raise
+
+        with self._stats_lock:
+            self.read_seconds += time.perf_counter() - start
+            self.bytes_read += size
+        return local_path
+
+    def release(self, local_path: str):
+        """Delete a spooled copy and make its room available"""
+        with self._condition:
+            size = self._copies.pop(local_path, None)
+            if size is None:
+                return  # Not a spooled copy
+            self._used -= size
+            self._condition.notify_all()
+
+        try:
+            os.remove(local_path)
+        except OSError:
+            pass
+
+    def cleanup(self):
+        """Remove the spool directory with any copies still in it"""
+        with self._condition:
+            self._copies.clear()
+            self._used = 0
+            self._condition.notify_all()
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,865 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Parallel execution of file analysis across worker processes"""
+import os
+import time
+import heapq
+import queue
+import signal
+import itertools
+import collections
+from concurrent.futures import FIRST_COMPLETED, wait
+from dataclasses import dataclass, replace
+from threading import Thread, Event, Lock, Condition, Timer
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple, Callable
+
+import fitz
+from PIL import Image
+
+from analysis_settings import AnalysisSettings
+from content_analyzer import PageAnalyzer
+from memory_budget import MemoryBudget, BYTES_PER_MB, MP_CONTEXT
+from prefetch import FileSpool
+from worker_supervisor import SupervisedExecutor, TaskTimeout, report_progress
+
+# Work unit costs are measured in Letter-sized pages, plus one page for every
+# BYTES_PER_PAGE_COST bytes of file data to account for embedded image decoding
+LETTER_AREA = 612 * 792
+LETTER_PIXELS = 8.5 * 11 * 200 * 200
+BYTES_PER_PAGE_COST = 256 * 1024
+
+# The slow lane renders at a lower resolution and allows this much more time
+SLOW_LANE_TIMEOUT_FACTOR = 2
+
+
+@dataclass
+class WorkUnit:
+    """A file, or a range of pages of a large PDF, analyzed by one worker"""
+    file_path: str
+    pages: Optional[Tuple[int, int]] = None  # Start and stop page, None for the whole file
+    unit_count: int = 1  # Number of units the file was split into
+    cost: float = 0.0  # Estimated work in Letter-page equivalents
+    source_path: Optional[str] = None  # Local copy to read instead of file_path
+    resumed: bool = False  # Other page ranges of the file were completed by an earlier run
+    slow: bool = False  # Retried in the slow lane after timing out
+    index: int = 0  # Position among the units of the file, in page order
+
+
+@dataclass
+class FileOutcome:
+    """Result of analyzing one file in a worker"""
+    file_path: str
+    results: Optional[List[Dict[str, Any]]]
+    error: Optional[Exception] = None
+    page_cache_hits: int = 0
+    page_cache_misses: int = 0
+    pages: Optional[Tuple[int, int]] = None
+    cached: bool = False  # Results were reused from an earlier run
+    resumed: bool = False  # Completed by an earlier run, results are already in the output
+    partial: bool = False  # A page range of a split file, delivered before the file completes
+    streamed: bool = False  # Completes a split file whose page ranges were delivered as partials
+    interrupted: bool = False  # Stopped while being analyzed, results may be incomplete
+    timed_out: bool = False  # Exceeded its time budget, in the slow lane as well
+    slow_lane: bool = False  # Analyzed at the lower resolution of the slow lane
+
+
+def plan_work_units(file_path: str, split_threshold: int, chunk_size: int,
+                    source_path: Optional[str] = None) -> List[WorkUnit]:
+    """
+    Estimate the cost of a file and split a large PDF into page-range work units
+
+    Args:
+        file_path: Path to file
+        split_threshold: Minimum page count for splitting, 0 disables splitting
+        chunk_size: Pages per work unit
+        source_path: Local copy of the file to read instead of file_path
+
+    Returns:
+        List of work units covering the file
+    """
+    read_path = source_path or file_path
+    try:
+        size_cost = os.path.getsize(read_path) / BYTES_PER_PAGE_COST
+    except OSError:
+        return [WorkUnit(file_path, source_path=source_path)]
+
+    if not file_path.lower().endswith('.pdf'):
+        try:
+            with Image.open(read_path) as image:
+                pixel_cost = image.width * image.height / LETTER_PIXELS
+        except Exception:
+            pixel_cost = 0.0
+        return [WorkUnit(file_path, cost=pixel_cost + size_cost, source_path=source_path)]
+
+    try:
+        with fitz.open(read_path) as pdf:
+            # Encrypted and damaged files are reported once by a single unit
+            if pdf.is_encrypted or len(pdf) == 0:
+                return [WorkUnit(file_path, cost=size_cost, source_path=source_path)]
+            page_count = len(pdf)
+            page_cost = abs(pdf.page_cropbox(0)) / LETTER_AREA
+    except Exception:
+        return [WorkUnit(file_path, cost=size_cost, source_path=source_path)]
+
+    cost_per_page = page_cost + size_cost / page_count
+    if split_threshold <= 0 or page_count < split_threshold:
+        return [WorkUnit(file_path, cost=cost_per_page * page_count, source_path=source_path)]
+
+    starts = range(0, page_count, max(1, chunk_size))
+    units = []
+    for index, start in enumerate(starts):
+        stop = min(start + chunk_size, page_count)
+        units.append(WorkUnit(file_path, (start, stop), len(starts),
+                              cost_per_page * (stop - start), source_path, index=index))
+    return units
+
+
+def merge_outcomes(outcomes: List[FileOutcome]) -> FileOutcome:
+    """
+    Reassemble the outcomes of a split file in page order
+
+    Args:
+        outcomes: Outcomes of the work units of one file
+
+    Returns:
+        FileOutcome covering all analyzed pages
+    """
+    outcomes = sorted(outcomes, key=lambda outcome: outcome.pages or (0, 0))
+    results = [result for outcome in outcomes for result in outcome.results or []]
+    errors = [outcome.error for outcome in outcomes if outcome.error is not None]
+    return FileOutcome(
+        file_path=outcomes[0].file_path,
+        results=results or None,
+        error=errors[0] if errors else None,
+        page_cache_hits=sum(outcome.page_cache_hits for outcome in outcomes),
+        page_cache_misses=sum(outcome.page_cache_misses for outcome in outcomes),
+        interrupted=any(outcome.interrupted for outcome in outcomes),
+        timed_out=any(outcome.timed_out for outcome in outcomes),
+        slow_lane=any(outcome.slow_lane for outcome in outcomes)
+    )
+
+
+def timeout_result(outcome: FileOutcome) -> Dict[str, Any]:
+    """
+    Build the result recording a file, or page range, that ran out of time
+
+    Args:
+        outcome: Outcome with timed_out set
+
+    Returns:
+        Result row with a "Timed Out" content status
+    """
+    is_pdf = outcome.file_path.lower().endswith('.pdf')
+    return {
+        "File": os.path.abspath(outcome.file_path),
+        "Page": outcome.pages[0] + 1 if outcome.pages else 1,
+        "Content Status": "Timed Out",
+        "Type": "PDF" if is_pdf else "Image",
+        "Error": str(outcome.error),
+        "Error Severity": "WARNING"
+    }
+
+
+def wait_while_paused(stop_event, pause_event) -> bool:
+    """
+    Block while processing is paused
+
+    Returns:
+        bool: True if processing was stopped
+    """
+    while pause_event.is_set():
+        if stop_event.is_set():
+            return True
+        time.sleep(0.1)
+    return stop_event.is_set()
+
+
+def analyze_pdf_file(page_analyzer: PageAnalyzer, pdf_path: str,
+                     stop_event, pause_event,
+                     pages: Optional[Tuple[int, int]] = None,
+                     source_path: Optional[str] = None,
+                     on_page: Optional[Callable[[], None]] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Analyze the pages of a PDF file
+
+    Args:
+        page_analyzer: Analyzer used for the pages
+        pdf_path: Path to PDF file
+        stop_event: Event that ends processing early
+        pause_event: Event that suspends processing between pages
+        pages: Start and stop page to analyze, None analyzes every page
+        source_path: Local copy of the file to read instead of pdf_path
+        on_page: Called before each page is analyzed
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: Results for all analyzed pages or None
+
+    Raises:
+        Exception: If the document cannot be processed for reasons other
+            than encryption or damaged file data
+    """
+    abs_path = os.path.abspath(pdf_path)
+    encryption_result = [{
+        "File": abs_path,
+        "Page": 1,
+        "Content Status": "Page 1 Processing Failed",
+        "Type": "PDF",
+        "Error": "Encryption Error: document closed or encrypted",
+        "Error Severity": "WARNING"
+    }]
+
+    try:
+        with fitz.open(source_path or pdf_path) as pdf:
+            if pdf.is_encrypted:
+                return encryption_result
+
+            results = []
+            for page_num in range(*(pages or (0, len(pdf)))):
+                if wait_while_paused(stop_event, pause_event):
+                    break
+                if on_page:
+                    on_page()
+
+                try:
+                    result = page_analyzer.analyze_pdf_page(pdf[page_num], abs_path, page_num)
+                    if result:
+                        results.append(result)
+                except Exception as e:
+                    results.append({
+                        "File": abs_path,
+                        "Page": page_num + 1,
+                        "Content Status": f"Page {page_num + 1} Processing Failed",
+                        "Type": "PDF",
+                        "Error": str(e),
+                        "Error Severity": "ERROR"
+                    })
+
+            return results if results else None
+
+    except fitz.FileDataError:
+        return encryption_result
+
+
+def analyze_file(page_analyzer: PageAnalyzer, file_path: str,
+                 stop_event, pause_event,
+                 pages: Optional[Tuple[int, int]] = None,
+                 source_path: Optional[str] = None,
+                 on_page: Optional[Callable[[], None]] = None) -> FileOutcome:
+    """
+    Analyze a PDF or image file and record page cache usage
+
+    Args:
+        page_analyzer: Analyzer used for the file
+        file_path: Path to file
+        stop_event: Event that ends processing early
+        pause_event: Event that suspends processing
+        pages: Start and stop page of a PDF to analyze, None analyzes the whole file
+        source_path: Local copy of the file to read instead of file_path
+        on_page: Called before each page of a PDF is analyzed
+
+    Returns:
+        FileOutcome with the results or the error that occurred
+    """
+    before = page_analyzer.get_cache_stats()
+    try:
+        if file_path.lower().endswith('.pdf'):
+            results = analyze_pdf_file(page_analyzer, file_path, stop_event, pause_event,
+                                       pages, source_path, on_page)
+        else:
+            result = page_analyzer.analyze_image_file(os.path.abspath(file_path), source_path)
+            results = [result] if result else None
+        outcome = FileOutcome(file_path, results, pages=pages)
+    except Exception as e:
+        outcome = FileOutcome(file_path, None, e, pages=pages)
+
+    outcome.interrupted = stop_event.is_set()
+    after = page_analyzer.get_cache_stats()
+    outcome.page_cache_hits = after['hits'] - before['hits']
+    outcome.page_cache_misses = after['misses'] - before['misses']
+    return outcome
+
+
+# State of a worker process, set by the pool initializer. Page analyzers are
+# created for the settings tasks arrive with, the regular and slow lane ones
+_worker_analyzers: List[Tuple[AnalysisSettings, PageAnalyzer]] = []
+_worker_memory_budget: Optional[MemoryBudget] = None
+_worker_stop_event = None
+_worker_pause_event = None
+
+
+def _initialize_worker(stop_event, pause_event, memory_budget: MemoryBudget):
+    """Set up the shared state of a worker process"""
+    global _worker_memory_budget, _worker_stop_event, _worker_pause_event
+    # Ctrl+C in a console reaches every process, the parent decides how to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_memory_budget = memory_budget
+    _worker_stop_event = stop_event
+    _worker_pause_event = pause_event
+
+
+def _get_worker_analyzer(settings: AnalysisSettings) -> PageAnalyzer:
+    """Get the page analyzer of a worker for the settings of a task"""
+    for analyzer_settings, analyzer in _worker_analyzers:
+        if analyzer_settings == settings:
+            return analyzer
+    analyzer = PageAnalyzer(settings, _worker_memory_budget)
+    _worker_analyzers.insert(0, (settings, analyzer))
+    del _worker_analyzers[2:]
+    return analyzer
+
+
+def _run_worker_task(settings: AnalysisSettings, unit: WorkUnit) -> FileOutcome:
+    """Analyze one work unit in a worker process"""
+    if _worker_stop_event.is_set():
+        return FileOutcome(unit.file_path, None, pages=unit.pages, interrupted=True)
+    return analyze_file(_get_worker_analyzer(settings), unit.file_path, _worker_stop_event,
+                        _worker_pause_event, unit.pages, unit.source_path, report_progress)
+
+
+class WorkerPool:
+    """
+    Worker processes kept warm from one run to the next
+
+    Starting a worker spawns an interpreter that imports PyMuPDF, NumPy and
+    Pillow, which dominates short runs. The pool hands the same workers to
+    each run as long as the worker count and memory budget are unchanged.
+    Settings travel with every task, so a new threshold takes effect without
+    a respawn. Workers shut down once the pool has been idle for idle_timeout
+    seconds.
+    """
+
+    def __init__(self, stop_event, pause_event, idle_timeout: float = 300.0):
+        """
+        Initialize pool
+
+        Args:
+            stop_event: Event shared with workers that ends processing early,
+                must be created from MP_CONTEXT and used by every run
+            pause_event: Event shared with workers that suspends processing,
+                must be created from MP_CONTEXT and used by every run
+            idle_timeout: Seconds to keep idle workers, 0 shuts them down
+                as soon as a run releases them
+        """
+        self.stop_event = stop_event
+        self.pause_event = pause_event
+        self.idle_timeout = idle_timeout
+        self._executor: Optional[SupervisedExecutor] = None
+        self._key: Optional[Tuple[int, int]] = None
+        self._idle_timer: Optional[Timer] = None
+        self._generation = 0
+        self._lock = Lock()
+
+    @property
+    def warm(self) -> bool:
+        """Whether workers are running"""
+        with self._lock:
+            return self._executor is not None
+
+    def acquire(self, max_workers: int, memory_budget_mb: int) -> SupervisedExecutor:
+        """
+        Get the executor for a run, starting workers if none fit
+
+        Args:
+            max_workers: Number of worker processes
+            memory_budget_mb: Pixmap memory all renders may hold at once
+
+        Returns:
+            Executor to submit _run_worker_task to
+        """
+        with self._lock:
+            self._cancel_idle_timer()
+            key = (max_workers, memory_budget_mb)
+            if self._executor is not None and self._key != key:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+            if self._executor is None:
+                memory_budget = MemoryBudget(memory_budget_mb * BYTES_PER_MB)
+                self._executor = SupervisedExecutor(
+                    max_workers,
+                    _initialize_worker,
+                    (self.stop_event, self.pause_event, memory_budget),
+                    memory_budget,
+                    self.stop_event,
+                    self.pause_event
+                )
+                self._key = key
+            return self._executor
+
+    def release(self):
+        """Hand the workers back after a run"""
+        with self._lock:
+            if self._executor is None:
+                return
+            if self.idle_timeout <= 0:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+                return
+
+            self._generation += 1
+            self._idle_timer = Timer(self.idle_timeout, self._expire, args=(self._generation,))
+            self._idle_timer.daemon = True
+            self._idle_timer.start()
+
+    def _cancel_idle_timer(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        self._generation += 1
+
+    def _expire(self, generation: int):
+        """Shut down workers that stayed idle, unless a run took them meanwhile"""
+        with self._lock:
+            if generation != self._generation or self._executor is None:
+                return
+            self._idle_timer = None
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def shutdown(self):
+        """Stop the workers, such as when the application closes"""
+        with self._lock:
+            self._cancel_idle_timer()
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+class WorkBuffer:
+    """
+    Bounded buffer of planned work units between the open and analyze stages
+
+    Units are handed out most expensive first, except in path order. With
+    largest-first scheduling the buffer is unbounded and hands out nothing
+    until every file has been planned, which makes the order global.
+    """
+
+    def __init__(self, capacity: int, scheduling: str):
+        """
+        Initialize buffer
+
+        Args:
+            capacity: Maximum number of buffered units, 0 for no limit
+            scheduling: "largest_first", "streaming" or "path_order"
+        """
+        self.capacity = 0 if scheduling == "largest_first" else capacity
+        self.scheduling = scheduling
+        self._heap = []
+        self._sequence = itertools.count()
+        self._closed = False
+        self._condition = Condition()
+
+    def put(self, unit: WorkUnit, should_stop: Callable[[], bool]):
+        """Add a unit, waiting while the buffer is full"""
+        with self._condition:
+            while self.capacity and len(self._heap) >= self.capacity and not should_stop():
+                self._condition.wait(0.1)
+            priority = 0 if self.scheduling == "path_order" else -unit.cost
+            heapq.heappush(self._heap, (priority, next(self._sequence), unit))
+            self._condition.notify_all()
+
+    def close(self):
+        """Mark that no more units will be added"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _ready(self) -> bool:
+        return bool(self._heap) and (self._closed or self.scheduling != "largest_first")
+
+    def get(self, timeout: float) -> Optional[WorkUnit]:
+        """
+        Take the next unit
+
+        Args:
+            timeout: Seconds to wait for a unit to become available
+
+        Returns:
+            The next unit, or None if none became available
+        """
+        with self._condition:
+            if not self._ready():
+                self._condition.wait(timeout)
+            if not self._ready():
+                return None
+            unit = heapq.heappop(self._heap)[2]
+            self._condition.notify_all()
+            return unit
+
+    @property
+    def exhausted(self) -> bool:
+        """True once the buffer is closed and empty"""
+        with self._condition:
+            return self._closed and not self._heap
+
+
+class ProcessingEngine:
+    """
+    Runs file analysis as a pipeline of stages connected by bounded queues
+
+    A scan thread feeds file paths to open threads, which look files up in the
+    result cache, optionally copy them into a local spool, and estimate their
+    cost. The analyze stage dispatches the planned work units to a pool of
+    worker processes, each of which opens, renders and analyzes its pages.
+    Outcomes are handed to the caller, which writes them out. Bounded queues
+    make a slow stage hold back the stages before it, so memory stays flat
+    however large the tree is.
+
+    A unit that runs out of its file or page time budget has its worker
+    replaced and is retried once in a slow lane at slow_lane_dpi. If it runs
+    out of time again, its outcome is marked timed_out.
+    """
+
+    def __init__(self, settings: AnalysisSettings, max_workers: int,
+                 stop_event, pause_event, page_analyzer: Optional[PageAnalyzer] = None,
+                 worker_pool: Optional[WorkerPool] = None):
+        """
+        Initialize engine
+
+        Args:
+            settings: Analysis settings passed to every worker
+            max_workers: Number of worker processes, 1 analyzes in this process
+                unless a time budget is set
+            stop_event: Event shared with workers that ends processing early,
+                must be created from MP_CONTEXT
+            pause_event: Event shared with workers that suspends processing,
+                must be created from MP_CONTEXT
+            page_analyzer: Analyzer used when running in this process
+            worker_pool: Warm workers to run on, sharing stop_event and
+                pause_event; workers are started for this run if omitted
+        """
+        self.settings = settings
+        self.max_workers = max(1, max_workers)
+        self.stop_event = stop_event
+        self.pause_event = pause_event
+        self.page_analyzer = page_analyzer
+        self.worker_pool = worker_pool
+        self.page_cache_hits = 0
+        self.page_cache_misses = 0
+        self.io_wait_seconds = 0.0
+        self.slow_lane_retries = 0
+        self.timed_out = 0
+        self.spool: Optional[FileSpool] = None
+        self.stream_ranges = False
+        self._cancelled = Event()
+
+    def _should_stop(self) -> bool:
+        return self.stop_event.is_set() or self._cancelled.is_set()
+
+    def _put(self, target: queue.Queue, item: Any) -> bool:
+        """Put an item on a bounded queue, giving up only if the run was abandoned"""
+        while True:
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if self._cancelled.is_set():
+                    return False
+
+    def run(self, files: Iterable[str],
+            lookup: Optional[Callable[[str], Optional[List[Dict[str, Any]]]]] = None,
+            completed: Optional[Callable[[str, Optional[Tuple[int, int]]], bool]] = None,
+            stream_ranges: bool = False) -> Iterator[FileOutcome]:
+        """
+        Analyze files and yield outcomes as they complete
+
+        Args:
+            files: Paths of files to analyze, consumed on the scan thread so
+                a lazy directory walk overlaps the analysis
+            lookup: Returns earlier results of a file, or None if the file
+                has to be analyzed
+            completed: Returns True for a file, or a page range of a split
+                file, whose results an earlier run already wrote
+            stream_ranges: Deliver each page range of a split file as a
+                partial outcome once it and all earlier ranges of the file
+                are complete, instead of holding the file back until all of
+                its ranges are done, so rows are still written in page order
+
+        Yields:
+            FileOutcome for each file, in completion order
+        """
+        self.stream_ranges = stream_ranges
+        queue_size = self.settings.pipeline_queue_size
+        open_workers = self.settings.open_workers
+        file_queue = queue.Queue(maxsize=queue_size)
+        outcome_queue = queue.Queue(maxsize=queue_size)
+        buffer = WorkBuffer(queue_size, self.settings.scheduling)
+        open_remaining = [open_workers]
+        open_lock = Lock()
+        self._cancelled.clear()
+        if self.settings.prefetch:
+            self.spool = FileSpool(self.settings.spool_dir or None,
+                                   self.settings.spool_size_mb * BYTES_PER_MB,
+                                   self.settings.prefetch_depth)
+
+        stages = [Thread(target=self._scan_stage, args=(files, file_queue, outcome_queue, open_workers),
+                         name="scan", daemon=True)]
+        stages += [
+            Thread(target=self._open_stage,
+                   args=(file_queue, buffer, outcome_queue, lookup, completed,
+                         open_remaining, open_lock),
+                   name=f"open-{index}", daemon=True)
+            for index in range(open_workers)
+        ]
+        stages.append(Thread(target=self._analyze_stage, args=(buffer, outcome_queue),
+                             name="analyze", daemon=True))
+        for stage in stages:
+            stage.start()
+
+        try:
+            while True:
+                outcome = outcome_queue.get()
+                if outcome is None:
+                    break
+                self.page_cache_hits += outcome.page_cache_hits
+                self.page_cache_misses += outcome.page_cache_misses
+                yield outcome
+        finally:
+            self._cancelled.set()
+            for stage in stages:
+                stage.join()
+            if self.spool:
+                self.spool.cleanup()
+
+    def _scan_stage(self, files: Iterable[str], file_queue: queue.Queue,
+                    outcome_queue: queue.Queue, open_workers: int):
+        """Feed file paths to the open stage"""
+        try:
+            for file_path in files:
+                if self._should_stop() or not self._put(file_queue, file_path):
+                    break
+        except Exception as e:
+            self._put(outcome_queue, FileOutcome("file scan", None, e))
+        finally:
+            for _ in range(open_workers):
+                self._put(file_queue, None)
+
+    def _open_stage(self, file_queue: queue.Queue, buffer: WorkBuffer,
+                    outcome_queue: queue.Queue,
+                    lookup: Optional[Callable[[str], Optional[List[Dict[str, Any]]]]],
+                    completed: Optional[Callable[[str, Optional[Tuple[int, int]]], bool]],
+                    open_remaining: List[int], open_lock: Lock):
+        """Skip finished files, complete unchanged files from the cache and plan the rest"""
+        try:
+            while True:
+                try:
+                    file_path = file_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if self._cancelled.is_set():
+                        break
+                    continue
+                if file_path is None:
+                    break
+                if self._should_stop():
+                    continue  # Drain the queue so the scan stage can finish
+
+                source_path = None
+                try:
+                    if completed and completed(file_path, None):
+                        self._put(outcome_queue, FileOutcome(file_path, None, resumed=True))
+                        continue
+
+                    cached = lookup(file_path) if lookup else None
+                    if cached is not None:
+                        self._put(outcome_queue, FileOutcome(file_path, cached, cached=True))
+                        continue
+
+                    if self.spool:
+                        source_path = self.spool.fetch(file_path, self._should_stop)
+
+                    units = plan_work_units(file_path, self.settings.page_split_threshold,
+                                            self.settings.page_chunk_size, source_path)
+                    if completed and len(units) > 1:
+                        remaining = [unit for unit in units if not completed(file_path, unit.pages)]
+                        if not remaining:
+                            if self.spool and source_path:
+                                self.spool.release(source_path)
+                            self._put(outcome_queue, FileOutcome(file_path, None, resumed=True))
+                            continue
+                        for index, unit in enumerate(remaining):
+                            unit.unit_count = len(remaining)
+                            unit.index = index
+                            unit.resumed = len(remaining) < len(units)
+                        units = remaining
+
+                    for unit in units:
+                        buffer.put(unit, self._should_stop)
+                except Exception as e:
+                    if self.spool and source_path:
+                        self.spool.release(source_path)
+                    self._put(outcome_queue, FileOutcome(file_path, None, e))
+        finally:
+            with open_lock:
+                open_remaining[0] -= 1
+                if open_remaining[0] == 0:
+                    buffer.close()
+
+    def _analyze_stage(self, buffer: WorkBuffer, outcome_queue: queue.Queue):
+        """Dispatch work units to the analyzers, keeping a bounded number in flight"""
+        split_outcomes: Dict[str, List[FileOutcome]] = {}
+        held_ranges: Dict[str, Dict[int, FileOutcome]] = {}
+        next_range: Dict[str, int] = {}
+
+        def deliver(unit: WorkUnit, outcome: FileOutcome):
+            if unit.unit_count > 1:
+                # Hold page ranges back until the whole file is complete
+                received = split_outcomes.setdefault(unit.file_path, [])
+                received.append(outcome)
+                if self.stream_ranges:
+                    # Ranges go out in page order, each once all earlier ranges have
+                    outcome.partial = True
+                    waiting = held_ranges.setdefault(unit.file_path, {})
+                    waiting[unit.index] = outcome
+                    cursor = next_range.get(unit.file_path, 0)
+                    while cursor in waiting:
+                        self._put(outcome_queue, waiting.pop(cursor))
+                        cursor += 1
+                    next_range[unit.file_path] = cursor
+                if len(received) < unit.unit_count:
+                    return
+                held_ranges.pop(unit.file_path, None)
+                next_range.pop(unit.file_path, None)
+                outcome = merge_outcomes(split_outcomes.pop(unit.file_path))
+                if self.stream_ranges:
+                    # Rows, errors and cache counts went out with the ranges, the
+                    # results are kept only for caching a fully analyzed file
+                    complete = (outcome.error is None and not outcome.interrupted
+                                and not outcome.slow_lane and not unit.resumed)
+                    outcome = FileOutcome(unit.file_path, outcome.results if complete else None,
+                                          streamed=True, interrupted=outcome.interrupted)
+
+            if self.spool and unit.source_path:
+                self.spool.release(unit.source_path)
+            self._put(outcome_queue, outcome)
+
+        executor = None
+        page_analyzer = None
+        pool = None
+        timeouts = (self.settings.file_timeout, self.settings.page_timeout)
+        if self.max_workers == 1 and not any(timeouts):
+            page_analyzer = self.page_analyzer or PageAnalyzer(self.settings)
+        else:
+            # Time budgets are enforced by killing workers, so they need worker processes
+            pool = self.worker_pool or WorkerPool(self.stop_event, self.pause_event, idle_timeout=0)
+            executor = pool.acquire(self.max_workers, self.settings.memory_budget_mb)
+
+        # Units that timed out are retried one at a time at a lower resolution
+        slow_lane = collections.deque()
+        slow_settings = replace(self.settings,
+                                dpi=min(self.settings.slow_lane_dpi, self.settings.dpi),
+                                probe_dpi=min(self.settings.slow_lane_dpi, self.settings.probe_dpi))
+
+        def submit(unit: WorkUnit):
+            if unit.slow:
+                return executor.submit(_run_worker_task, slow_settings, unit,
+                                       file_timeout=timeouts[0] * SLOW_LANE_TIMEOUT_FACTOR,
+                                       page_timeout=timeouts[1] * SLOW_LANE_TIMEOUT_FACTOR)
+            return executor.submit(_run_worker_task, self.settings, unit,
+                                   file_timeout=timeouts[0], page_timeout=timeouts[1])
+
+        max_in_flight = self.max_workers * 2
+        pending = {}
+        try:
+            while True:
+                if slow_lane and not self.pause_event.is_set() and not self._should_stop() \
+                        and not any(unit.slow for unit in pending.values()):
+                    unit = slow_lane.popleft()
+                    pending[submit(unit)] = unit
+
+                # Top up the analyzers unless paused or stopped
+                while len(pending) < max_in_flight and not self.pause_event.is_set() \
+                        and not self._should_stop():
+                    waited = time.perf_counter()
+                    unit = buffer.get(timeout=0 if pending else 0.1)
+                    if not pending and not buffer.exhausted:
+                        # Every analyzer is idle while the earlier stages catch up
+                        self.io_wait_seconds += time.perf_counter() - waited
+                    if unit is None:
+                        break
+                    if executor is None:
+                        deliver(unit, analyze_file(page_analyzer, unit.file_path, self.stop_event,
+                                                   self.pause_event, unit.pages, unit.source_path))
+                    else:
+                        pending[submit(unit)] = unit
+
+                if not pending:
+                    if self._should_stop() or (buffer.exhausted and not slow_lane):
+                        break
+                    if self.pause_event.is_set():
+                        time.sleep(0.1)
+                    continue
+
+                done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    unit = pending.pop(future)
+                    try:
+                        outcome = future.result()
+                    except TaskTimeout as e:
+                        if e.stopped or self.stop_event.is_set():
+                            outcome = FileOutcome(unit.file_path, None, pages=unit.pages,
+                                                  interrupted=True)
+                        elif not unit.slow:
+                            self.slow_lane_retries += 1
+                            slow_lane.append(replace(unit, slow=True))
+                            continue
+                        else:
+                            self.timed_out += 1
+                            outcome = FileOutcome(unit.file_path, None, e, pages=unit.pages,
+                                                  timed_out=True)
+                    except Exception as e:
+                        # The worker died or the outcome could not be transferred
+                        outcome = FileOutcome(unit.file_path, None, e, pages=unit.pages,
+                                              interrupted=self.stop_event.is_set())
+                    else:
+                        outcome.slow_lane = unit.slow
+                    deliver(unit, outcome)
+        except Exception as e:
+            self._put(outcome_queue, FileOutcome("analysis", None, e))
+        finally:
+            if executor is not None:
+                # Units still queued are dropped, running ones end at the stop event
+                for future in pending:
+                    future.cancel()
+                wait(pending)
+                pool.release()
+
+            # Files cut short by a stop keep the pages that were analyzed
+            if not self.stream_ranges:
+                for received in split_outcomes.values():
+                    self._put(outcome_queue, merge_outcomes(received))
+            self._put(outcome_queue, None)
+
+    def get_io_stats(self) -> Dict[str, float]:
+        """Get the time analyzers waited for input and the prefetch read totals"""
+        return {
+            'wait_seconds': self.io_wait_seconds,
+            'read_seconds': self.spool.read_seconds if self.spool else 0.0,
+            'bytes_read': self.spool.bytes_read if self.spool else 0
+        }
+
+    def get_timeout_stats(self) -> Dict[str, int]:
+        """Get the number of units retried in the slow lane and of those that timed out there"""
+        return {
+            'slow_lane': self.slow_lane_retries,
+            'timed_out': self.timed_out
+        }
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Get page cache hit and miss counts summed over all workers"""
+        return {
+            'hits': self.page_cache_hits,
+            'misses': self.page_cache_misses
+        }
@@ -0,0 +1,313 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Persistent cache of file analysis results shared between runs"""
+import os
+import sys
+import time
+import json
+import hashlib
+import logging
+import sqlite3
+import argparse
+from dataclasses import dataclass
+from threading import Lock
+from typing import List, Dict, Any, Optional
+
+DEFAULT_CACHE_PATH = os.path.join("logs", "result_cache.db")
+
+
+@dataclass
+class FileIdentity:
+    """Identifies one version of a file on disk"""
+    path: str
+    size: int
+    mtime_ns: int
+    content_hash: Optional[str] = None
+
+    @classmethod
+    def from_path(cls, file_path: str, hash_content: bool = False) -> 'FileIdentity':
+        """
+        Build identity from the current state of a file
+
+        Args:
+            file_path: Path to the file
+            hash_content: Include a digest of the file contents
+
+        Returns:
+            FileIdentity for the file
+        """
+        stat = os.stat(file_path)
+        content_hash = None
+        if hash_content:
+            digest = hashlib.blake2b(digest_size=20)
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            content_hash = digest.hexdigest()
+
+        return cls(os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, content_hash)
+
+
+class ResultCache:
+    """SQLite cache of per-file analysis results keyed by file identity and settings"""
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, hash_content: bool = False):
+        """
+        Initialize cache
+
+        Args:
+            db_path: Path to the cache database
+            hash_content: Verify cached entries against a digest of the file contents
+        """
+        self.db_path = db_path
+        self.hash_content = hash_content
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.setup_database()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Create a new database connection"""
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    def setup_database(self):
+        """Initialize database schema"""
+        with self._get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cached_results (
+                    file_path TEXT NOT NULL,
+                    settings_key TEXT NOT NULL,
+                    file_size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    content_hash TEXT,
+                    results TEXT NOT NULL,
+                    payload_size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (file_path, settings_key)
+                )
+            ''')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_cached_last_used ON cached_results(last_used)'
+            )
+
+    @staticmethod
+    def make_settings_key(values: Dict[str, Any]) -> str:
+        """
+        Derive a cache key from the settings that affect analysis results
+
+        Args:
+            values: Result-affecting setting names and values
+
+        Returns:
+            Hex digest identifying the settings
+        """
+        return hashlib.blake2b(
+            json.dumps(values, sort_keys=True).encode(), digest_size=16
+        ).hexdigest()
+
+    def get(self, file_path: str, settings_key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get cached results for a file if it is unchanged
+
+        Args:
+            file_path: Path to the analyzed file
+            settings_key: Key from make_settings_key
+
+        Returns:
+            Cached results, or None if there is no valid entry
+        """
+        try:
+            identity = FileIdentity.from_path(file_path)
+            with self.lock, self._get_connection() as conn:
+                row = conn.execute(
+                    'SELECT file_size, mtime_ns, content_hash, results FROM cached_results '
+                    'WHERE file_path = ? AND settings_key = ?',
+                    (identity.path, settings_key)
+                ).fetchone()
+
+                valid = row is not None and row[0] == identity.size and row[1] == identity.mtime_ns
+                if valid and self.hash_content:
+                    valid = row[2] == FileIdentity.from_path(file_path, True).content_hash
+
+                if not valid:
+                    self.misses += 1
+                    if row is not None:
+                        conn.execute(
+                            'DELETE FROM cached_results WHERE file_path = ? AND settings_key = ?',
+                            (identity.path, settings_key)
+                        )
+                    return None
+
+                conn.execute(
+                    'UPDATE cached_results SET last_used = ? WHERE file_path = ? AND settings_key = ?',
+                    (time.time(), identity.path, settings_key)
+                )
+                self.hits += 1
+                return json.loads(row[3])
+
+        except (OSError, sqlite3.Error, ValueError) as e:
+            logging.warning(f"Result cache lookup failed for {file_path}: {str(e)}")
+            self.misses += 1
+            return None
+
+    def put(self, file_path: str, settings_key: str, results: List[Dict[str, Any]]):
+        """
+        Store results for a file
+
+        Args:
+            file_path: Path to the analyzed file
+            settings_key: Key from make_settings_key
+            results: Analysis results for all pages of the file
+        """
+        try:
+            identity = FileIdentity.from_path(file_path, self.hash_content)
+            payload = json.dumps(results)
+            now = time.time()
+            with self.lock, self._get_connection() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO cached_results '
+                    '(file_path, settings_key, file_size, mtime_ns, content_hash, results, '
+                    'payload_size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (identity.path, settings_key, identity.size, identity.mtime_ns,
+                     identity.content_hash, payload, len(payload), now, now)
+                )
+        except (OSError, sqlite3.Error, TypeError, ValueError) as e:
+            logging.warning(f"Result cache store failed for {file_path}: {str(e)}")
+
+    def evict(self, max_age_days: Optional[float] = None,
+              max_size_mb: Optional[float] = None) -> int:
+        """
+        Remove old entries and shrink the cache below a size limit
+
+        Args:
+            max_age_days: Remove entries not used for this many days
+            max_size_mb: Remove least recently used entries until the
+                stored results fit in this many megabytes
+
+        Returns:
+            Number of removed entries
+        """
+        removed = 0
+        with self.lock, self._get_connection() as conn:
+            if max_age_days is not None:
+                cutoff = time.time() - max_age_days * 86400
+                removed += conn.execute(
+                    'DELETE FROM cached_results WHERE last_used < ?', (cutoff,)
+                ).rowcount
+
+            if max_size_mb is not None:
+                excess = conn.execute(
+                    'SELECT COALESCE(SUM(payload_size), 0) FROM cached_results'
+                ).fetchone()[0] - int(max_size_mb * 1024 * 1024)
+
+                if excess > 0:
+                    doomed = []
+                    for file_path, settings_key, payload_size in conn.execute(
+                            'SELECT file_path, settings_key, payload_size FROM cached_results '
+                            'ORDER BY last_used'):
+                        if excess <= 0:
+                            break
+                        doomed.append((file_path, settings_key))
+                        excess -= payload_size
+
+                    conn.executemany(
+                        'DELETE FROM cached_results WHERE file_path = ? AND settings_key = ?',
+                        doomed
+                    )
+                    removed += len(doomed)
+
+        return removed
+
+    def invalidate(self, path_prefix: Optional[str] = None) -> int:
+        """
+        Remove cached entries
+
+        Args:
+            path_prefix: Only remove entries for files under this path,
+                None removes everything
+
+        Returns:
+            Number of removed entries
+        """
+        with self.lock, self._get_connection() as conn:
+            if path_prefix is None:
+                return conn.execute('DELETE FROM cached_results').rowcount
+
+            prefix = os.path.abspath(path_prefix)
+            return conn.execute(
+                'DELETE FROM cached_results WHERE file_path = ? OR substr(file_path, 1, ?) = ?',
+                (prefix, len(prefix) + 1, prefix.rstrip(os.sep) + os.sep)
+            ).rowcount
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit and miss counts along with the stored entry count and size"""
+        with self.lock, self._get_connection() as conn:
+            entries, size = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(payload_size), 0) FROM cached_results'
+            ).fetchone()
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'size_mb': size / (1024 * 1024)
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for cache maintenance"""
+    parser = argparse.ArgumentParser(description="Manage the analysis result cache")
+    parser.add_argument("--db", default=DEFAULT_CACHE_PATH, help="Path to the cache database")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--clear", action="store_true", help="Remove all cached results")
+    group.add_argument("--invalidate", metavar="PATH",
+                       help="Remove cached results for a file or everything under a folder")
+    group.add_argument("--evict", action="store_true",
+                       help="Apply the age and size limits")
+    group.add_argument("--stats", action="store_true", help="Show cache size")
+    parser.add_argument("--max-age-days", type=float, help="Age limit for --evict")
+    parser.add_argument("--max-size-mb", type=float, help="Size limit for --evict")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No result cache at {args.db}")
+        return 1
+
+    cache = ResultCache(args.db)
+    if args.clear:
+        print(f"Removed {cache.invalidate():,} cached files")
+    elif args.invalidate:
+        print(f"Removed {cache.invalidate(args.invalidate):,} cached files")
+    elif args.evict:
+        print(f"Removed {cache.evict(args.max_age_days, args.max_size_mb):,} cached files")
+    else:
+        stats = cache.get_stats()
+        print(f"{stats['entries']:,} cached files, {stats['size_mb']:.1f} MB")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,13 +16,81 @@ along with this program.  If not, see https://www.gnu.org/licenses/.
 import math
 import random
 import os
-from typing import List, TypeVar, Sequence, Set, Dict, Any, Optional, Callable
+import hashlib
+import collections
+from typing import List, TypeVar, Sequence, Set, Dict, Any, Optional, Callable, Iterator, Tuple
 from dataclasses import dataclass, field
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Lock
 
+from scan_manifest import ScanManifest, Entry
+
 T = TypeVar('T')
 
+# Threads listing directories at once when scanning for files
+DEFAULT_SCAN_WORKERS = 8
+
+# Directory listings read ahead of the walk per scan worker
+READ_AHEAD_PER_WORKER = 2
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """
+    Parse a shard specification of the form "i/N"
+
+    Args:
+        spec: Shard number from 1 to N and shard count, such as "2/4"
+
+    Returns:
+        Tuple of shard number and shard count
+
+    Raises:
+        ValueError: If the specification is malformed or out of range
+    """
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}', expected i/N such as 2/4")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{spec}', i must be between 1 and N")
+    return index, count
+
+
+def shard_of(relative_path: str, shard_count: int) -> int:
+    """
+    Assign a file to a shard by a stable hash of its path below the scanned folder
+
+    Every machine assigns a file to the same shard, whatever the folder is
+    mounted as and whichever path separator the platform uses.
+
+    Args:
+        relative_path: Path of the file relative to the scanned folder
+        shard_count: Number of shards
+
+    Returns:
+        Shard number from 1 to shard_count
+    """
+    key = relative_path.replace('\\', '/').encode('utf-8', 'surrogatepass')
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % shard_count + 1
+
+
+def shard_output_path(output_path: str, shard: Optional[Tuple[int, int]]) -> str:
+    """
+    Get the output path of one shard, so shards can write next to each other
+
+    Args:
+        output_path: Output path of the whole run
+        shard: Shard number and count, None if the run is not sharded
+
+    Returns:
+        Output path with the shard added before the extension
+    """
+    if not shard:
+        return output_path
+    base, ext = os.path.splitext(output_path)
+    return f"{base}_shard{shard[0]}of{shard[1]}{ext}"
+
 
 @dataclass
 class SamplingParameters:
@@ -107,13 +175,16 @@ class SamplingCalculator:
         return max(sample_size, min(30, params.population_size))
 
     @staticmethod
-    def select_random_files(files: Sequence[T], sample_size: int) -> List[T]:
+    def select_random_files(files: Sequence[T], sample_size: int,
+                            seed: Optional[int] = None) -> List[T]:
         """
         Select random files from the population
 
         Args:
             files: Sequence of files to sample from
             sample_size: Number of files to select
+            seed: Seed for a reproducible sample, the same population and
+                seed select the same files on every machine
 
         Returns:
             List of randomly selected files
@@ -121,7 +192,12 @@ class SamplingCalculator:
         if sample_size >= len(files):
             return list(files)
 
-        return random.sample(files, sample_size)
+        if seed is None:
+            return random.sample(files, sample_size)
+
+        # Sample from a canonical order so the scan order does not matter
+        population = sorted(files, key=lambda f: str(f).replace('\\', '/'))
+        return random.Random(seed).sample(population, sample_size)
 
     @classmethod
     def estimate_error_margin(cls, sample_size: int, population_size: int,
@@ -166,19 +242,50 @@ class FileProcessor:
         parallel_processing: bool = True
         batch_size: int = 1000
         show_progress: bool = True
+        shard: Optional[Tuple[int, int]] = None  # Shard number and count, None scans everything
+        scan_workers: int = 1  # Threads listing directories, more hide network share latency
 
     @staticmethod
     def get_file_list(folder_path: str, include_pdfs: bool, include_images: bool,
                       supported_formats: Set[str],
                       options: Optional['FileProcessor.ProcessingOptions'] = None,
-                      progress_callback: Optional[Callable[[str], None]] = None) -> List[str]:
+                      progress_callback: Optional[Callable[[str], None]] = None,
+                      manifest: Optional[ScanManifest] = None) -> List[str]:
         """Get list of files to process based on inclusion criteria"""
-        files = set()  # Use set for uniqueness
+        files = set(FileProcessor.iter_files(folder_path, include_pdfs, include_images,
+                                             supported_formats, options, progress_callback,
+                                             manifest))
+        return sorted(files)  # Return sorted list of file paths
+
+    @staticmethod
+    def iter_files(folder_path: str, include_pdfs: bool, include_images: bool,
+                   supported_formats: Set[str],
+                   options: Optional['FileProcessor.ProcessingOptions'] = None,
+                   progress_callback: Optional[Callable[[str], None]] = None,
+                   manifest: Optional[ScanManifest] = None) -> Iterator[str]:
+        """
+        Yield files to process as the directory walk finds them
+
+        Args:
+            folder_path: Root folder to scan
+            include_pdfs: Include PDF files
+            include_images: Include image files
+            supported_formats: Supported image file extensions
+            options: Processing options with depth limit and excluded folders
+            progress_callback: Called with a message for every scanned entry
+            manifest: Saved listings of folder_path, unchanged directories
+                are taken from it instead of listed, fresh listings are saved
+
+        Yields:
+            Paths of matching files in directory walk order
+        """
         options = options or FileProcessor.ProcessingOptions()
         current_depth = 0
 
         # Convert input folder path to absolute path
         abs_folder_path = os.path.abspath(folder_path)
+        if manifest is not None and manifest.root != abs_folder_path:
+            manifest = None  # Listings of another folder
 
         def should_process_directory(dir_path: str, depth: int) -> bool:
             """Check if directory should be processed based on options"""
@@ -191,35 +298,105 @@ class FileProcessor:
 
             return True
 
-        def scan_directory(path: str, depth: int):
-            """Scan directory for matching files"""
-            if not should_process_directory(path, depth):
-                return
+        def list_directory(path: str) -> Tuple[List[Entry], Optional[str]]:
+            """Read a directory into (path, name, is_file, is_dir, size, mtime_ns) entries and an error message"""
+            mtime_ns = None
+            if manifest is not None:
+                saved, mtime_ns = manifest.lookup(path)
+                if saved is not None:
+                    return saved, None
 
+            entries = []
             try:
-                with os.scandir(path) as entries:
-                    for entry in entries:
-                        if progress_callback:
-                            progress_callback(f"Scanning: {entry.path}")
-
-                        if entry.is_file():
-                            ext = os.path.splitext(entry.name.lower())[1]
-                            if (include_pdfs and ext == '.pdf') or (
-                                    include_images and ext in supported_formats):
-                                # Use the full path from scandir
-                                files.add(entry.path)
-                        elif entry.is_dir():
-                            scan_directory(entry.path, depth + 1)
+                with os.scandir(path) as scanned:
+                    for entry in scanned:
+                        is_file = entry.is_file()
+                        size = file_mtime_ns = None
+                        if is_file and manifest is not None:
+                            stat = entry.stat()
+                            size, file_mtime_ns = stat.st_size, stat.st_mtime_ns
+                        entries.append((entry.path, entry.name, is_file, not is_file and entry.is_dir(),
+                                        size, file_mtime_ns))
             except PermissionError:
-                if progress_callback:
-                    progress_callback(f"Permission denied: {path}")
+                return entries, f"Permission denied: {path}"
             except Exception as e:
+                return entries, f"Error scanning {path}: {str(e)}"
+
+            if manifest is not None:
+                manifest.store(path, mtime_ns, entries)
+            return entries, None
+
+        # With several scan workers the directories the walk will enter next
+        # are listed ahead of it, so round trips to a network share overlap
+        # while the walk below still visits entries in sequential order. At
+        # most READ_AHEAD_PER_WORKER listings per worker wait to be walked.
+        pool = None
+        listings = {}
+        upcoming = collections.deque([abs_folder_path])  # Directories not listed yet, in walk order
+        read_ahead = options.scan_workers * READ_AHEAD_PER_WORKER
+        if options.scan_workers > 1:
+            pool = ThreadPoolExecutor(max_workers=options.scan_workers, thread_name_prefix="scan")
+
+        def queue_subdirectories(entries: List[Entry], depth: int):
+            """Put the subdirectories of the directory being walked next in line"""
+            subdirectories = [entry_path for entry_path, _, _, is_dir, _, _ in entries
+                              if is_dir and should_process_directory(entry_path, depth + 1)]
+            upcoming.extendleft(reversed(subdirectories))
+            while upcoming and len(listings) < read_ahead:
+                path = upcoming.popleft()
+                listings[path] = pool.submit(list_directory, path)
+
+        def read_directory(path: str, depth: int):
+            """Get the listing of a directory, None if it is skipped"""
+            if not should_process_directory(path, depth):
+                return None
+            if pool is None:
+                return list_directory(path)
+
+            future = listings.pop(path, None)
+            if future is not None:
+                listing = future.result()
+            else:
+                upcoming.remove(path)  # Beyond the read-ahead window
+                listing = list_directory(path)
+            queue_subdirectories(listing[0], depth)
+            return listing
+
+        def scan_directory(path: str, depth: int) -> Iterator[str]:
+            """Scan directory for matching files"""
+            listing = read_directory(path, depth)
+            if listing is None:
+                return
+
+            entries, error = listing
+            for entry_path, name, is_file, is_dir, _, _ in entries:
                 if progress_callback:
-                    progress_callback(f"Error scanning {path}: {str(e)}")
+                    progress_callback(f"Scanning: {entry_path}")
+
+                if is_file:
+                    ext = os.path.splitext(name.lower())[1]
+                    if (include_pdfs and ext == '.pdf') or (
+                            include_images and ext in supported_formats):
+                        if options.shard and shard_of(
+                                os.path.relpath(entry_path, abs_folder_path),
+                                options.shard[1]) != options.shard[0]:
+                            continue  # Another machine analyzes this file
+                        # Use the full path from scandir
+                        yield entry_path
+                elif is_dir:
+                    yield from scan_directory(entry_path, depth + 1)
+
+            if error and progress_callback:
+                progress_callback(error)
 
         # Start scan from absolute folder path
-        scan_directory(abs_folder_path, current_depth)
-        return sorted(files)  # Return sorted list of file paths
+        try:
+            yield from scan_directory(abs_folder_path, current_depth)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+            if manifest is not None:
+                manifest.save()
 
     @staticmethod
     def process_files_parallel(file_list: List[str],
@@ -262,9 +439,10 @@ class FileProcessor:
         return SamplingCalculator.calculate_sample_size(params)
 
     @classmethod
-    def select_random_files(cls, files: Sequence[T], sample_size: int) -> List[T]:
+    def select_random_files(cls, files: Sequence[T], sample_size: int,
+                            seed: Optional[int] = None) -> List[T]:
         """Select random files from the population"""
-        return SamplingCalculator.select_random_files(files, sample_size)
+        return SamplingCalculator.select_random_files(files, sample_size, seed)
 
     @classmethod
     def prepare_file_list(cls, folder_path: str, settings: 'AnalysisSettings',
@@ -304,6 +482,6 @@ class FileProcessor:
             settings.sample_size = sample_size
             settings.total_files = total_files
 
-            return cls.select_random_files(files, sample_size)
+            return cls.select_random_files(files, sample_size, settings.sampling_seed)
 
         return files
@@ -0,0 +1,195 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Persistent directory listings that spare repeated walks of unchanged folders"""
+import os
+import time
+import json
+import sqlite3
+from threading import Lock
+from typing import Dict, List, Optional, Set, Tuple
+
+DEFAULT_MANIFEST_PATH = os.path.join("logs", "scan_manifest.db")
+
+# Listings of directories changed this recently are not trusted, another
+# change within the same modification time tick would go unnoticed
+RACY_SECONDS = 2.0
+
+# Fresh listings held in memory before they are written to the database
+SAVE_EVERY = 1000
+
+# (path, name, is_file, is_dir, size, mtime_ns) of one directory entry,
+# size and mtime_ns are None for directories
+Entry = Tuple[str, str, bool, bool, Optional[int], Optional[int]]
+
+
+class ScanManifest:
+    """
+    Directory listings under one root folder, reused while the directory is unchanged
+
+    Adding, removing or renaming an entry changes the modification time of
+    its directory, so a directory whose time still matches its listing
+    costs one stat instead of a listing. Sizes and times of files come from
+    the listing; a file rewritten in place keeps its old size here until
+    its directory changes, which is why the result cache, checkpoint
+    journal and outputs still stat files themselves. Saved listings are
+    read one directory at a time and fresh ones are written every
+    SAVE_EVERY listings, so memory stays flat however large the tree.
+    """
+
+    def __init__(self, root: str, db_path: str = DEFAULT_MANIFEST_PATH):
+        """
+        Initialize manifest
+
+        Args:
+            root: Folder the listings belong to
+            db_path: Path to the manifest database
+        """
+        self.root = os.path.abspath(root)
+        self.db_path = db_path
+        self.reused = 0
+        self.listed = 0
+        self.lock = Lock()
+        self._pending: Dict[str, Tuple[int, List[Entry]]] = {}  # Listed but not saved yet
+        self._removed: Set[str] = set()  # Directories gone with everything below them
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Scan threads take turns on one connection under the lock
+        self._conn = sqlite3.connect(self.db_path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("PRAGMA busy_timeout = 30000")
+        self.setup_database()
+
+    def setup_database(self):
+        """Initialize database schema"""
+        with self.lock, self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS directory_listings (
+                    root TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    entries TEXT NOT NULL,
+                    PRIMARY KEY (root, path)
+                )
+            ''')
+
+    def _saved(self, path: str, mtime_ns: Optional[int] = None) -> Optional[List[Entry]]:
+        """Read the saved listing of a directory, only if saved under mtime_ns when given, lock held"""
+        if path in self._pending:
+            saved_mtime_ns, entries = self._pending[path]
+            return entries if mtime_ns is None or saved_mtime_ns == mtime_ns else None
+        if any(path == removed or path.startswith(os.path.join(removed, ''))
+               for removed in self._removed):
+            return None
+
+        row = self._conn.execute(
+            'SELECT mtime_ns, entries FROM directory_listings WHERE root = ? AND path = ?',
+            (self.root, path)
+        ).fetchone()
+        if row is None or (mtime_ns is not None and row[0] != mtime_ns):
+            return None
+        return [(os.path.join(path, name), name, is_file, is_dir, size, file_mtime_ns)
+                for name, is_file, is_dir, size, file_mtime_ns in json.loads(row[1])]
+
+    def lookup(self, path: str) -> Tuple[Optional[List[Entry]], Optional[int]]:
+        """
+        Get the saved listing of a directory if the directory is unchanged
+
+        Args:
+            path: Directory path as produced by the walk
+
+        Returns:
+            Tuple of the listing, None when it must be listed again, and
+            the current modification time to store a new listing under
+        """
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None, None  # Listing the directory reports the error
+
+        with self.lock:
+            saved = self._saved(path, mtime_ns)
+            if saved is not None:
+                self.reused += 1
+        return saved, mtime_ns
+
+    def store(self, path: str, mtime_ns: Optional[int], entries: List[Entry]):
+        """
+        Remember a fresh listing of a directory
+
+        Args:
+            path: Directory path as produced by the walk
+            mtime_ns: Modification time read before listing, None if unknown
+            entries: Complete listing of the directory
+        """
+        if mtime_ns is None or time.time_ns() - mtime_ns < RACY_SECONDS * 1e9:
+            mtime_ns = -1  # List it again next time
+
+        with self.lock:
+            self.listed += 1
+            saved = self._saved(path)
+            if saved is not None:
+                # Forget subdirectories that are gone, with everything below them
+                kept = {entry[0] for entry in entries if entry[3]}
+                for entry_path, _, _, is_dir, _, _ in saved:
+                    if is_dir and entry_path not in kept:
+                        self._forget_tree(entry_path)
+
+            self._pending[path] = (mtime_ns, entries)
+            flush = len(self._pending) >= SAVE_EVERY
+
+        if flush:
+            self.save()
+
+    def _forget_tree(self, path: str):
+        """Drop the listings of a directory and its subdirectories, lock held"""
+        prefix = os.path.join(path, '')
+        for listed_path in [p for p in self._pending if p == path or p.startswith(prefix)]:
+            del self._pending[listed_path]
+        self._removed.add(path)
+
+    def save(self):
+        """Write listings changed since the last save to the database"""
+        with self.lock:
+            if not self._pending and not self._removed:
+                return
+            changed = [
+                (self.root, path, mtime_ns, json.dumps([
+                    (name, is_file, is_dir, size, file_mtime_ns)
+                    for _, name, is_file, is_dir, size, file_mtime_ns in entries
+                ]))
+                for path, (mtime_ns, entries) in self._pending.items()
+            ]
+            with self._conn:
+                for path in self._removed:
+                    prefix = os.path.join(path, '')
+                    self._conn.execute(
+                        'DELETE FROM directory_listings WHERE root = ? AND '
+                        '(path = ? OR substr(path, 1, ?) = ?)',
+                        (self.root, path, len(prefix), prefix)
+                    )
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO directory_listings (root, path, mtime_ns, entries) '
+                    'VALUES (?, ?, ?, ?)', changed
+                )
+            self._pending = {}
+            self._removed = set()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get counts of directories reused and listed since the manifest was opened"""
+        return {'reused': self.reused, 'listed': self.listed}
@@ -0,0 +1,369 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Merge the outputs of sharded runs into one dataset"""
+import os
+import re
+import sys
+import csv
+import glob
+import json
+import sqlite3
+import argparse
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+# Metadata that every shard of one run must agree on
+SHARED_METADATA_KEYS = [
+    'threshold', 'format_version', 'sampling_method', 'sampling_enabled',
+    'confidence_level', 'margin_of_error', 'sampling_seed'
+]
+
+# Sampling metadata describes the whole population, so it is the same on every shard
+SAMPLED_METADATA_KEYS = ['sample_size', 'random_n_size', 'total_files']
+
+DEFAULT_MAX_ROWS = 80000
+
+
+def find_shard_outputs(output_path: str) -> Tuple[int, Dict[int, List[str]]]:
+    """
+    Find the outputs written by the shards of a run
+
+    Args:
+        output_path: Output path the run was given, without a shard
+
+    Returns:
+        Tuple of the shard count and the output files of each shard number,
+        CSV outputs may have several split files per shard
+
+    Raises:
+        ValueError: If no shard outputs exist or they disagree on the shard count
+    """
+    base, ext = os.path.splitext(output_path)
+    pattern = re.compile(re.escape(os.path.basename(base)) +
+                         r'_shard(\d+)of(\d+)(?:__(\d+))?' + re.escape(ext) + '$')
+
+    found: Dict[int, List[Tuple[int, str]]] = {}
+    counts = set()
+    for path in glob.glob(f"{glob.escape(base)}_shard*{ext}"):
+        match = pattern.match(os.path.basename(path))
+        if not match:
+            continue
+        counts.add(int(match.group(2)))
+        found.setdefault(int(match.group(1)), []).append((int(match.group(3) or 1), path))
+
+    if not found:
+        raise ValueError(f"No shard outputs found for {output_path}")
+    if len(counts) > 1:
+        raise ValueError(f"Shard outputs disagree on the shard count: {sorted(counts)}")
+
+    return counts.pop(), {shard: [path for _, path in sorted(parts)]
+                          for shard, parts in sorted(found.items())}
+
+
+def read_metadata(output_format: str, shard_path: str) -> Dict[str, Any]:
+    """
+    Read the analysis metadata of one shard
+
+    Args:
+        output_format: 'csv', 'parquet' or 'sqlite'
+        shard_path: First output file of the shard
+
+    Returns:
+        Metadata dictionary
+    """
+    if output_format == 'sqlite':
+        with sqlite3.connect(shard_path) as conn:
+            rows = conn.execute(
+                'SELECT key, value FROM analysis_metadata AS m WHERE version = '
+                '(SELECT MAX(version) FROM analysis_metadata WHERE key = m.key)'
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    metadata_path = f"{os.path.splitext(shard_path)[0]}_metadata.json"
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def merge_metadata(shard_metadata: List[Dict[str, Any]], shard_count: int) -> Dict[str, Any]:
+    """
+    Combine the metadata of all shards of a run
+
+    Sampled runs draw one seeded sample from the whole population and each
+    shard analyzes its part of it, so the sample size and population are
+    taken as they are. Unsampled shards each count only their own files,
+    which are added up.
+
+    Args:
+        shard_metadata: Metadata of every shard
+        shard_count: Number of shards of the run
+
+    Returns:
+        Metadata of the merged dataset
+
+    Raises:
+        ValueError: If the shards were run with different settings
+    """
+    first = shard_metadata[0]
+    for key in SHARED_METADATA_KEYS:
+        values = {json.dumps(metadata.get(key)) for metadata in shard_metadata}
+        if len(values) > 1:
+            raise ValueError(f"Shards were run with different '{key}' values: {sorted(values)}")
+
+    merged = dict(first)
+    if first.get('sampling_enabled'):
+        for key in SAMPLED_METADATA_KEYS:
+            values = {json.dumps(metadata.get(key)) for metadata in shard_metadata}
+            if len(values) > 1:
+                raise ValueError(f"Shards drew different samples, '{key}' values: {sorted(values)}")
+    else:
+        totals = [metadata.get('total_files') for metadata in shard_metadata]
+        merged['total_files'] = None if None in totals else sum(totals)
+
+    merged.update({
+        'created_at': datetime.now().isoformat(),
+        'shard': None,
+        'merged_shards': shard_count,
+        'shard_created_at': [metadata.get('created_at') for metadata in shard_metadata]
+    })
+    return merged
+
+
+def merge_csv(shard_files: List[str], output_path: str, max_rows: int) -> int:
+    """
+    Concatenate the CSV files of all shards, splitting like the CSV output
+
+    Args:
+        shard_files: CSV files of every shard in order
+        output_path: Path of the first merged CSV file
+        max_rows: Maximum rows per merged file
+
+    Returns:
+        Number of merged rows
+    """
+    # Batches may have different columns, so the merged files use all of them
+    columns: List[str] = []
+    for path in shard_files:
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for column in next(csv.reader(f), []):
+                if column not in columns:
+                    columns.append(column)
+
+    base, ext = os.path.splitext(os.path.abspath(output_path))
+    file_number = 0
+    rows_in_file = max_rows
+    total_rows = 0
+    output = None
+    writer = None
+    try:
+        for path in shard_files:
+            with open(path, 'r', newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    if rows_in_file >= max_rows:
+                        if output:
+                            output.close()
+                        file_number += 1
+                        output = open(base + ext if file_number == 1 else f"{base}__{file_number}{ext}",
+                                      'w', newline='', encoding='utf-8')
+                        writer = csv.DictWriter(output, columns, quoting=csv.QUOTE_MINIMAL)
+                        writer.writeheader()
+                        rows_in_file = 0
+                    writer.writerow(row)
+                    rows_in_file += 1
+                    total_rows += 1
+    finally:
+        if output:
+            output.close()
+
+    return total_rows
+
+
+def merge_parquet(shard_files: List[str], output_path: str) -> int:
+    """
+    Concatenate the Parquet files of all shards
+
+    Args:
+        shard_files: Parquet file of every shard in order
+        output_path: Path of the merged Parquet file
+
+    Returns:
+        Number of merged rows
+    """
+    # Imported here so that CSV and SQLite merges do not load pandas
+    import pandas as pd
+    frames = [pd.read_parquet(path) for path in shard_files]
+    merged = pd.concat(frames, ignore_index=True)
+
+    temp_path = f"{output_path}.tmp"
+    merged.to_parquet(temp_path, engine='pyarrow', compression='snappy', index=False)
+    os.replace(temp_path, output_path)
+    return len(merged)
+
+
+def merge_sqlite(shard_files: List[str], output_path: str) -> int:
+    """
+    Copy the results of all shard databases into one database
+
+    Result, detail and batch ids are offset per shard so that every detail
+    keeps pointing at its result.
+
+    Args:
+        shard_files: Database of every shard in order
+        output_path: Path of the merged database
+
+    Returns:
+        Number of merged results
+    """
+    with sqlite3.connect(shard_files[0]) as source:
+        schema = source.execute(
+            "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+            "ORDER BY CASE type WHEN 'table' THEN 0 ELSE 1 END"
+        ).fetchall()
+
+    conn = sqlite3.connect(output_path)
+    try:
+        for (statement,) in schema:
+            conn.execute(statement)
+
+        def columns(table: str) -> List[str]:
+            return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+        def next_id(table: str, column: str) -> int:
+            return conn.execute(f'SELECT COALESCE(MAX({column}), 0) FROM {table}').fetchone()[0]
+
+        result_columns = [c for c in columns('analysis_results') if c not in ('id', 'batch_id')]
+        detail_columns = [c for c in columns('analysis_details') if c not in ('id', 'result_id')]
+        stats_columns = [c for c in columns('processing_stats') if c != 'batch_id']
+
+        for path in shard_files:
+            conn.execute('ATTACH DATABASE ? AS shard', (path,))
+            result_offset = next_id('analysis_results', 'id')
+            batch_offset = next_id('processing_stats', 'batch_id')
+
+            conn.execute(
+                f"INSERT INTO processing_stats (batch_id, {', '.join(stats_columns)}) "
+                f"SELECT batch_id + ?, {', '.join(stats_columns)} FROM shard.processing_stats",
+                (batch_offset,)
+            )
+            conn.execute(
+                f"INSERT INTO analysis_results (id, batch_id, {', '.join(result_columns)}) "
+                f"SELECT id + ?, batch_id + ?, {', '.join(result_columns)} FROM shard.analysis_results",
+                (result_offset, batch_offset)
+            )
+            conn.execute(
+                f"INSERT INTO analysis_details (result_id, {', '.join(detail_columns)}) "
+                f"SELECT result_id + ?, {', '.join(detail_columns)} FROM shard.analysis_details "
+                f"ORDER BY id",
+                (result_offset,)
+            )
+            conn.commit()
+            conn.execute('DETACH DATABASE shard')
+
+        return conn.execute('SELECT COUNT(*) FROM analysis_results').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def write_metadata(output_format: str, output_path: str, metadata: Dict[str, Any]):
+    """Write the merged metadata next to, or into, the merged output"""
+    if output_format == 'sqlite':
+        with sqlite3.connect(output_path) as conn:
+            conn.executemany(
+                'INSERT INTO analysis_metadata (key, value, version) VALUES (?, ?, 1)',
+                [(key, json.dumps(value)) for key, value in metadata.items()]
+            )
+        return
+
+    metadata_path = f"{os.path.splitext(output_path)[0]}_metadata.json"
+    with open(metadata_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+
+
+def merge_shards(output_path: str, output_format: Optional[str] = None,
+                 max_rows: int = DEFAULT_MAX_ROWS, allow_missing: bool = False) -> int:
+    """
+    Merge the shard outputs of a run into one dataset
+
+    Args:
+        output_path: Output path the run was given, without a shard
+        output_format: 'csv', 'parquet' or 'sqlite', taken from the extension if omitted
+        max_rows: Maximum rows per merged CSV file
+        allow_missing: Merge even if some shards have no output
+
+    Returns:
+        Number of merged rows
+
+    Raises:
+        ValueError: If shards are missing or were run with different settings
+    """
+    extension_formats = {'.csv': 'csv', '.parquet': 'parquet', '.db': 'sqlite'}
+    output_format = output_format or extension_formats.get(os.path.splitext(output_path)[1].lower())
+    if output_format not in ('csv', 'parquet', 'sqlite'):
+        raise ValueError(f"Cannot tell the output format of {output_path}")
+
+    shard_count, outputs = find_shard_outputs(output_path)
+    missing = [shard for shard in range(1, shard_count + 1) if shard not in outputs]
+    if missing and not allow_missing:
+        raise ValueError(f"Missing outputs of shards {missing} of {shard_count}")
+
+    first_files = [files[0] for files in outputs.values()]
+    metadata = merge_metadata([read_metadata(output_format, path) for path in first_files],
+                              shard_count)
+    if missing:
+        metadata['missing_shards'] = missing
+
+    if os.path.exists(output_path):
+        raise ValueError(f"{output_path} already exists")
+
+    if output_format == 'csv':
+        rows = merge_csv([path for files in outputs.values() for path in files],
+                         output_path, max_rows)
+    elif output_format == 'parquet':
+        rows = merge_parquet(first_files, output_path)
+    else:
+        rows = merge_sqlite(first_files, output_path)
+
+    metadata['total_records'] = rows
+    write_metadata(output_format, output_path, metadata)
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for merging shard outputs"""
+    parser = argparse.ArgumentParser(
+        description="Merge the outputs of a run split with --shard i/N into one dataset"
+    )
+    parser.add_argument("output", help="Output path the shards were given, such as results.csv; "
+                                       "shard outputs such as results_shard1of4.csv are read")
+    parser.add_argument("--format", choices=['csv', 'parquet', 'sqlite'],
+                        help="Output format, taken from the extension if omitted")
+    parser.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS,
+                        help="Maximum rows per merged CSV file")
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="Merge the shards that exist even if some have no output")
+    args = parser.parse_args(argv)
+
+    try:
+        rows = merge_shards(args.output, args.format, args.max_rows, args.allow_missing)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        print(f"Merge failed: {str(e)}")
+        return 1
+
+    print(f"Merged {rows:,} rows into {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Shared fixtures for the test suite"""
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+
+@pytest.fixture
+def make_pdf():
+    """Create a PDF with header, body and footer text on every page"""
+    import fitz
+
+    def create(path: str, page_count: int) -> str:
+        doc = fitz.open()
+        for page_num in range(page_count):
+            page = doc.new_page(width=612, height=792)
+            page.insert_text((72, 30), f"Header {page_num + 1}", fontsize=11)
+            page.insert_text((72, 400), "Body text", fontsize=11)
+            page.insert_text((72, 780), f"Footer {page_num + 1}", fontsize=9)
+        doc.save(path)
+        doc.close()
+        return path
+    return create
@@ -0,0 +1,50 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Page analysis settings and their side effects"""
+import fitz
+import pytest
+
+from analysis_settings import AnalysisSettings
+from content_analyzer import ContentAnalyzer, PageAnalyzer
+from result_cache import ResultCache
+
+
+def settings_key(**overrides):
+    settings = AnalysisSettings(threshold=1.0, output_format='csv', max_rows_per_file=1000,
+                                excluded_folders=set(), **overrides)
+    return ResultCache.make_settings_key(PageAnalyzer(settings).get_result_settings())
+
+
+@pytest.mark.parametrize('override', [{'memory_budget_mb': 64}, {'min_dpi': 50},
+                                      {'tile_size_mb': 4.0}])
+def test_memory_budget_settings_change_the_key(override):
+    assert settings_key(**override) != settings_key()
+
+
+@pytest.mark.skipif(not hasattr(fitz, 'mupdf'), reason="needs separate anti-aliasing levels")
+def test_fast_raster_restores_antialiasing(tmp_path, make_pdf):
+    pdf_path = str(tmp_path / 'a.pdf')
+    make_pdf(pdf_path, 1)
+    fitz.mupdf.fz_set_graphics_aa_level(6)
+    fitz.mupdf.fz_set_text_aa_level(4)
+    try:
+        with fitz.open(pdf_path) as pdf:
+            ContentAnalyzer(fast_raster=True).analyze_page_margins(pdf[0])
+        levels = fitz.TOOLS.show_aa_level()
+    finally:
+        fitz.TOOLS.set_aa_level(8)
+
+    assert (levels['graphics'], levels['text']) == (6, 4)
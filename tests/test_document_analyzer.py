@@ -0,0 +1,143 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""End-to-end runs of the command line entry point"""
+import csv
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+from conftest import REPO_DIR
+
+
+def run_cli(tmp_path, *args, job=None, timeout=300):
+    """Run document_analyzer.py and return the completed process"""
+    command = [sys.executable, os.path.join(REPO_DIR, 'document_analyzer.py'), *args]
+    if job is not None:
+        job_path = tmp_path / 'job.json'
+        job_path.write_text(json.dumps(job))
+        command += ['--job', str(job_path)]
+    return subprocess.run(command, cwd=tmp_path, capture_output=True, text=True, timeout=timeout)
+
+
+def read_pages(csv_path):
+    """Page numbers of the rows of a CSV output, in file order"""
+    with open(csv_path, newline='') as f:
+        return [int(row['Page']) for row in csv.DictReader(f)]
+
+
+def test_split_pdf_rows_in_page_order_with_checkpoint(tmp_path, make_pdf):
+    folder = tmp_path / 'in'
+    folder.mkdir()
+    make_pdf(str(folder / 'long.pdf'), 21)
+
+    completed = run_cli(tmp_path, str(folder), '-o', str(tmp_path / 'out.csv'), '--workers', '3',
+                        job={'page_split_threshold': 20, 'page_chunk_size': 7,
+                             'checkpoint': True, 'use_result_cache': False})
+
+    assert completed.returncode == 0, completed.stderr
+    assert read_pages(tmp_path / 'out.csv') == list(range(1, 22))
+
+
+def test_prefetch_with_largest_first_is_rejected(tmp_path, make_pdf):
+    folder = tmp_path / 'in'
+    folder.mkdir()
+    for index in range(20):
+        make_pdf(str(folder / f'{index:02d}.pdf'), 1)
+
+    completed = run_cli(tmp_path, str(folder), '-o', str(tmp_path / 'out.csv'), timeout=60,
+                        job={'prefetch': True, 'prefetch_depth': 4, 'scheduling': 'largest_first'})
+
+    assert completed.returncode == 2
+    assert 'largest-first' in completed.stderr
+
+
+def test_prefetch_deeper_than_spool_completes(tmp_path, make_pdf):
+    folder = tmp_path / 'in'
+    folder.mkdir()
+    for index in range(20):
+        make_pdf(str(folder / f'{index:02d}.pdf'), 1)
+
+    completed = run_cli(tmp_path, str(folder), '-o', str(tmp_path / 'out.csv'), '--workers', '2',
+                        timeout=300, job={'prefetch': True, 'prefetch_depth': 4,
+                                          'use_result_cache': False})
+
+    assert completed.returncode == 0, completed.stderr
+    assert len(read_pages(tmp_path / 'out.csv')) == 20
+
+
+def test_quiet_prints_only_the_summary(tmp_path, make_pdf):
+    folder = tmp_path / 'in'
+    folder.mkdir()
+    make_pdf(str(folder / 'a.pdf'), 10)
+
+    completed = run_cli(tmp_path, str(folder), '-o', str(tmp_path / 'out.csv'), '-q',
+                        '--workers', '2', job={'use_result_cache': False, 'page_cache_size': 0})
+
+    assert completed.returncode == 0, completed.stderr
+    assert 'threshold' not in completed.stdout
+    assert 'Files: 1 processed' in completed.stdout
+
+
+def test_missing_output_folder_is_created(tmp_path, make_pdf):
+    folder = tmp_path / 'in'
+    folder.mkdir()
+    make_pdf(str(folder / 'a.pdf'), 2)
+    output_path = tmp_path / 'reports' / 'nested' / 'out.csv'
+
+    completed = run_cli(tmp_path, str(folder), '-o', str(output_path), '-q')
+
+    assert completed.returncode == 0, completed.stderr
+    assert read_pages(output_path) == [1, 2]
+
+
+def test_sqlite_size_of_file_rewritten_in_place(tmp_path, make_pdf):
+    folder = tmp_path / 'in'
+    folder.mkdir()
+    pdf_path = folder / 'a.pdf'
+    make_pdf(str(pdf_path), 1)
+    os.utime(folder, (1_000_000_000, 1_000_000_000))
+    job = {'use_result_cache': False, 'checkpoint': False,
+           'scan_manifest_path': str(tmp_path / 'manifest.db')}
+    assert run_cli(tmp_path, str(folder), '-o', str(tmp_path / 'first.db'), '-q', job=job).returncode == 0
+
+    # Rewriting the file in place leaves the folder's modification time alone
+    make_pdf(str(pdf_path), 3)
+    os.utime(folder, (1_000_000_000, 1_000_000_000))
+    completed = run_cli(tmp_path, str(folder), '-o', str(tmp_path / 'second.db'), '-q', job=job)
+
+    assert completed.returncode == 0, completed.stderr
+    with sqlite3.connect(tmp_path / 'second.db') as conn:
+        sizes = {size for (size,) in conn.execute('SELECT file_size FROM analysis_results')}
+    assert sizes == {os.path.getsize(pdf_path)}
+
+
+def test_resume_with_different_chunk_size_is_refused(tmp_path, make_pdf):
+    folder = tmp_path / 'in'
+    folder.mkdir()
+    make_pdf(str(folder / 'long.pdf'), 21)
+    output_path = tmp_path / 'out.csv'
+    job = {'page_split_threshold': 20, 'page_chunk_size': 7, 'checkpoint': True,
+           'use_result_cache': False}
+    assert run_cli(tmp_path, str(folder), '-o', str(output_path), '-q', job=job).returncode == 0
+
+    completed = run_cli(tmp_path, str(folder), '-o', str(output_path), '-q', '--resume',
+                        job={**job, 'page_chunk_size': 5})
+
+    assert completed.returncode != 0
+    assert 'different settings' in completed.stderr
+    assert read_pages(output_path) == list(range(1, 22))
@@ -0,0 +1,72 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Admission control shared between render processes"""
+import threading
+import time
+
+import memory_budget
+from memory_budget import MemoryBudget, MP_CONTEXT
+
+
+def hold_lock_forever(budget, locked):
+    """Take the budget's lock and keep it until killed"""
+    budget._condition.acquire()
+    locked.set()
+    time.sleep(60)
+
+
+def test_waiting_reservation_reports_progress():
+    budget = MemoryBudget(10)
+    calls = []
+    budget.track(MP_CONTEXT.Value('q', 0, lock=False), on_wait=lambda: calls.append(1))
+
+    def wait_for_memory():
+        with budget.reserve(10):
+            pass
+
+    with budget.reserve(10):
+        waiter = threading.Thread(target=wait_for_memory)
+        waiter.start()
+        time.sleep(1.2)
+    waiter.join(timeout=5)
+
+    assert not waiter.is_alive()
+    assert len(calls) >= 2
+
+
+def test_reclaim_gives_up_on_a_lock_held_by_a_killed_process(monkeypatch):
+    monkeypatch.setattr(memory_budget, 'RECLAIM_LOCK_TIMEOUT', 0.5)
+    budget = MemoryBudget(10)
+    locked = MP_CONTEXT.Event()
+    process = MP_CONTEXT.Process(target=hold_lock_forever, args=(budget, locked))
+    process.start()
+    assert locked.wait(30)
+    process.kill()
+    process.join()
+
+    start = time.monotonic()
+    assert not budget.reclaim(MP_CONTEXT.Value('q', 0, lock=False))
+    assert time.monotonic() - start < 5
+
+
+def test_reclaim_returns_held_memory():
+    budget = MemoryBudget(10)
+    held = MP_CONTEXT.Value('q', 4, lock=False)
+    budget._used.value = 4
+
+    assert budget.reclaim(held)
+    assert held.value == 0
+    assert budget._used.value == 0
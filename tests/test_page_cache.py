@@ -0,0 +1,74 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Content fingerprints of PDF pages"""
+import io
+
+import fitz
+import numpy as np
+from PIL import Image
+
+from page_cache import PageFingerprinter
+
+
+def scanned_pdf(seeds, compressed=True):
+    """A document with one full-page image per seed, JPEG or uncompressed"""
+    doc = fitz.open()
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        pixels = np.full((200, 150), 255, dtype=np.uint8)
+        for _ in range(20):
+            top, left = rng.integers(0, 180), rng.integers(0, 130)
+            pixels[top:top + 20, left:left + 20] = rng.integers(0, 128)
+        page = doc.new_page()
+        if compressed:
+            jpeg = io.BytesIO()
+            Image.fromarray(pixels).save(jpeg, format='JPEG')
+            page.insert_image(page.rect, stream=jpeg.getvalue())
+        else:
+            page.insert_image(page.rect, pixmap=fitz.Pixmap(fitz.csGRAY, 150, 200, pixels.tobytes(), False))
+    return fitz.open("pdf", doc.tobytes())
+
+
+def fingerprint_pages(doc):
+    """Fingerprint every page and return the fingerprints and the xrefs of streams read"""
+    read = []
+    stream_raw = doc.xref_stream_raw
+    doc.xref_stream_raw = lambda xref: read.append(xref) or stream_raw(xref)
+    fingerprinter = PageFingerprinter()
+    return [fingerprinter.fingerprint(page) for page in doc], read
+
+
+def test_compressed_image_data_is_not_read():
+    doc = scanned_pdf([1, 2])
+    fingerprints, read = fingerprint_pages(doc)
+
+    images = [image[0] for page in doc for image in page.get_images()]
+    assert fingerprints[0] != fingerprints[1]
+    assert images and not set(images) & set(read)
+
+
+def test_uncompressed_images_are_hashed():
+    fingerprints, _ = fingerprint_pages(scanned_pdf([1, 2], compressed=False))
+
+    assert fingerprints[0] != fingerprints[1]
+
+
+def test_identical_pages_share_a_fingerprint_across_documents():
+    fingerprinter = PageFingerprinter()
+    first = fingerprinter.fingerprint(scanned_pdf([1])[0])
+
+    assert fingerprinter.fingerprint(scanned_pdf([1])[0]) == first
+    assert fingerprinter.fingerprint(scanned_pdf([3])[0]) != first
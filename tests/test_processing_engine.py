@@ -0,0 +1,44 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Pipeline runs on worker processes kept warm between runs"""
+from PIL import Image
+
+from analysis_settings import AnalysisSettings
+from memory_budget import MP_CONTEXT
+from processing_engine import ProcessingEngine, WorkerPool
+
+
+def test_image_runs_reuse_warm_workers(tmp_path):
+    image_path = str(tmp_path / 'scan.png')
+    Image.new('L', (850, 1100), 255).save(image_path)
+    stop_event, pause_event = MP_CONTEXT.Event(), MP_CONTEXT.Event()
+    pool = WorkerPool(stop_event, pause_event)
+    executors = []
+
+    try:
+        for threshold in (1.0, 2.0):
+            settings = AnalysisSettings(threshold=threshold, output_format='csv',
+                                        max_rows_per_file=1000, excluded_folders=set())
+            engine = ProcessingEngine(settings, 2, stop_event, pause_event, worker_pool=pool)
+            outcomes = list(engine.run([image_path]))
+            executors.append(pool._executor)
+
+            assert [outcome.error for outcome in outcomes] == [None]
+            assert len(outcomes[0].results) == 1
+    finally:
+        pool.shutdown()
+
+    assert executors[0] is not None and executors[0] is executors[1]
@@ -0,0 +1,32 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Results reused between runs"""
+import logging
+
+from result_cache import ResultCache
+
+
+def test_failures_are_logged_not_printed(tmp_path, capsys, caplog):
+    cache = ResultCache(str(tmp_path / 'cache.db'))
+    missing = str(tmp_path / 'missing.pdf')
+
+    with caplog.at_level(logging.WARNING):
+        assert cache.get(missing, 'key') is None
+        cache.put(missing, 'key', [])
+
+    assert capsys.readouterr().out == ''
+    assert 'lookup failed' in caplog.text
+    assert 'store failed' in caplog.text
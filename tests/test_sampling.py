@@ -0,0 +1,67 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Directory walks with listings read ahead on a thread pool"""
+import os
+import time
+from threading import Lock
+
+import sampling
+from sampling import FileProcessor, READ_AHEAD_PER_WORKER
+
+
+def make_tree(root, width, depth):
+    """Create nested directories holding one PDF each, return the PDF paths in walk order"""
+    files = [str(root / 'page.pdf')]
+    (root / 'page.pdf').write_bytes(b'%PDF-1.4')
+    if depth:
+        for index in range(width):
+            child = root / f'd{index:02d}'
+            child.mkdir()
+            files += make_tree(child, width, depth - 1)
+    return files
+
+
+def scan(root, scan_workers):
+    options = FileProcessor.ProcessingOptions(scan_workers=scan_workers)
+    return FileProcessor.iter_files(str(root), True, False, set(), options)
+
+
+def test_parallel_walk_matches_sequential_order(tmp_path):
+    make_tree(tmp_path, 3, 3)
+
+    assert list(scan(tmp_path, 4)) == list(scan(tmp_path, 1))
+
+
+def test_read_ahead_is_bounded(tmp_path, monkeypatch):
+    make_tree(tmp_path, 40, 1)
+    listed = []
+    lock = Lock()
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        with lock:
+            listed.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(sampling.os, 'scandir', counting_scandir)
+    walk = scan(tmp_path, 2)
+    next(walk)
+    time.sleep(0.5)  # Give the scan workers time to run ahead
+
+    # The root and the directory the walk is in, plus the read-ahead window
+    assert len(listed) <= 2 + 2 * READ_AHEAD_PER_WORKER
+    assert len(list(walk)) == 40
+    assert len(listed) == 41
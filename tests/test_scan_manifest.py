@@ -0,0 +1,87 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Directory listings reused between scans"""
+import os
+import shutil
+import sqlite3
+
+import scan_manifest
+from sampling import FileProcessor
+from scan_manifest import ScanManifest
+
+# Modification time of every directory, old enough for listings to be trusted
+PAST = 1_000_000_000
+
+
+def make_tree(root, names):
+    """Create a subdirectory holding one PDF per name, with old modification times"""
+    for name in names:
+        (root / name).mkdir()
+        (root / name / 'page.pdf').write_bytes(b'%PDF-1.4')
+        os.utime(root / name, (PAST, PAST))
+    os.utime(root, (PAST, PAST))
+
+
+def scan(root, db_path):
+    manifest = ScanManifest(str(root), str(db_path))
+    files = list(FileProcessor.iter_files(str(root), True, False, set(), manifest=manifest))
+    return files, manifest
+
+
+def saved_paths(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return {path for (path,) in conn.execute('SELECT path FROM directory_listings')}
+
+
+def test_unchanged_directories_are_read_from_the_database(tmp_path):
+    root = tmp_path / 'in'
+    root.mkdir()
+    make_tree(root, ['a', 'b', 'c'])
+    first, manifest = scan(root, tmp_path / 'manifest.db')
+    assert manifest.get_stats() == {'reused': 0, 'listed': 4}
+
+    second, manifest = scan(root, tmp_path / 'manifest.db')
+
+    assert second == first
+    assert manifest.get_stats() == {'reused': 4, 'listed': 0}
+    assert not manifest._pending
+
+
+def test_removed_directories_are_forgotten(tmp_path):
+    root = tmp_path / 'in'
+    root.mkdir()
+    make_tree(root, ['a', 'b'])
+    (root / 'b' / 'deep').mkdir()
+    os.utime(root / 'b', (PAST, PAST))
+    scan(root, tmp_path / 'manifest.db')
+
+    shutil.rmtree(root / 'b')
+    os.utime(root, (PAST + 1, PAST + 1))
+    files, _ = scan(root, tmp_path / 'manifest.db')
+
+    assert files == [str(root / 'a' / 'page.pdf')]
+    assert saved_paths(tmp_path / 'manifest.db') == {str(root), str(root / 'a')}
+
+
+def test_fresh_listings_are_written_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(scan_manifest, 'SAVE_EVERY', 3)
+    manifest = ScanManifest(str(tmp_path), str(tmp_path / 'manifest.db'))
+
+    for index in range(5):
+        manifest.store(str(tmp_path / f'd{index}'), PAST, [])
+
+    assert len(manifest._pending) == 2
+    assert len(saved_paths(tmp_path / 'manifest.db')) == 3
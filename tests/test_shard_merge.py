@@ -0,0 +1,27 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Merging the outputs of a sharded run"""
+import subprocess
+import sys
+
+from conftest import REPO_DIR
+
+
+def test_import_does_not_load_pandas():
+    probe = "import sys, shard_merge; print('pandas' in sys.modules)"
+    completed = subprocess.run([sys.executable, '-c', probe], cwd=REPO_DIR,
+                               capture_output=True, text=True, check=True)
+    assert completed.stdout.strip() == 'False'
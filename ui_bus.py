@@ -0,0 +1,156 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Coalescing hand-off of log lines, progress and status to the Tk thread"""
+import time
+import logging
+import collections
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Interval at which the Tk thread drains the bus
+POLL_INTERVAL_MS = 100
+
+# Log lines written to the widget per drain, the rest wait for the next one
+LINES_PER_UPDATE = 200
+
+# Log lines held between drains before the oldest are dropped
+MAX_PENDING_LINES = 5000
+
+
+@dataclass
+class UIUpdate:
+    """Everything posted to the bus since the previous drain"""
+    lines: List[Tuple[int, str]] = field(default_factory=list)  # (level, line) pairs
+    dropped: int = 0  # Lines discarded because the bus was full
+    progress: Optional[float] = None  # Latest progress percentage
+    status: Optional[str] = None  # Latest status text
+    counters: Dict[str, int] = field(default_factory=dict)  # Running totals that changed
+    events: List[Tuple[str, Any]] = field(default_factory=list)  # Events in posting order
+
+    def __bool__(self) -> bool:
+        return bool(self.lines or self.dropped or self.progress is not None or
+                    self.status is not None or self.counters or self.events)
+
+
+class MessageBus:
+    """
+    Thread-safe channel from processing threads to the Tk thread
+
+    Any thread may post; only the Tk thread drains. Progress and status
+    keep their latest value and counters add up between drains, so a
+    tight loop reporting every directory entry costs one UI update per
+    poll instead of one per call. Log lines are timestamped when posted,
+    written at most LINES_PER_UPDATE at a time, and when more than
+    MAX_PENDING_LINES pile up the oldest are dropped and counted.
+    """
+
+    def __init__(self, lines_per_update: int = LINES_PER_UPDATE,
+                 max_pending_lines: int = MAX_PENDING_LINES):
+        """
+        Initialize bus
+
+        Args:
+            lines_per_update: Log lines handed out per drain
+            max_pending_lines: Log lines held before the oldest are dropped
+        """
+        self.lines_per_update = max(1, lines_per_update)
+        self._lock = Lock()
+        self._lines = collections.deque(maxlen=max(1, max_pending_lines))
+        self._dropped = 0
+        self._progress: Optional[float] = None
+        self._status: Optional[str] = None
+        self._counters: Dict[str, int] = {}
+        self._changed: Set[str] = set()
+        self._events: List[Tuple[str, Any]] = []
+
+    def log(self, message: str, level: int = logging.INFO):
+        """Queue a timestamped log line with its logging level"""
+        line = f"{time.strftime('%H:%M:%S')}: {message}"
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self._dropped += 1
+            self._lines.append((level, line))
+
+    def progress(self, value: float):
+        """Set the progress percentage, replacing any value not yet drained"""
+        with self._lock:
+            self._progress = value
+
+    def status(self, text: str):
+        """Set the status text, replacing any text not yet drained"""
+        with self._lock:
+            self._status = text
+
+    def count(self, name: str, amount: int = 1) -> int:
+        """
+        Add to a running total
+
+        Args:
+            name: Counter name
+            amount: Amount to add
+
+        Returns:
+            int: New total
+        """
+        with self._lock:
+            total = self._counters.get(name, 0) + amount
+            self._counters[name] = total
+            self._changed.add(name)
+            return total
+
+    def reset_counter(self, name: str):
+        """Start a running total again from zero"""
+        with self._lock:
+            self._counters.pop(name, None)
+            self._changed.discard(name)
+
+    def post(self, event: str, data: Any = None):
+        """Queue an event that must be handled once, in order"""
+        with self._lock:
+            self._events.append((event, data))
+
+    def take_lines(self) -> List[Tuple[int, str]]:
+        """Remove and return all pending (level, line) pairs"""
+        with self._lock:
+            lines = list(self._lines)
+            self._lines.clear()
+            return lines
+
+    def drain(self) -> UIUpdate:
+        """
+        Collect what was posted since the previous drain
+
+        Returns:
+            UIUpdate: Pending lines up to the per-update limit, latest
+            progress and status, changed counters and queued events
+        """
+        with self._lock:
+            count = min(len(self._lines), self.lines_per_update)
+            update = UIUpdate(
+                lines=[self._lines.popleft() for _ in range(count)],
+                dropped=self._dropped,
+                progress=self._progress,
+                status=self._status,
+                counters={name: self._counters[name] for name in self._changed},
+                events=self._events
+            )
+            self._dropped = 0
+            self._progress = None
+            self._status = None
+            self._changed = set()
+            self._events = []
+            return update
@@ -0,0 +1,321 @@
+"""
+Document Margin Analyzer
+Copyright (C) 2024 Noa J Oliver
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+"""Worker processes supervised against per-file and per-page time budgets"""
+import time
+import logging
+import collections
+from concurrent.futures import Future
+from dataclasses import dataclass
+from multiprocessing.connection import wait as wait_connections
+from threading import Thread, Lock
+from typing import Callable, List, Optional, Tuple
+
+from memory_budget import MemoryBudget, MP_CONTEXT
+
+# Seconds a stopped task may take to notice the stop before its worker is killed
+STOP_GRACE_SECONDS = 5.0
+
+# Time of the last progress report of the task running in this worker process
+_heartbeat = None
+
+
+class TaskTimeout(Exception):
+    """A task exceeded its time budget and its worker was killed"""
+
+    def __init__(self, message: str, stopped: bool = False):
+        super().__init__(message)
+        self.stopped = stopped  # Killed because it did not end after a stop
+
+
+class WorkerLost(Exception):
+    """The worker process running a task exited without a result"""
+
+
+def report_progress():
+    """Restart the page budget of the task running in this worker process"""
+    if _heartbeat is not None:
+        _heartbeat.value = time.monotonic()
+
+
+def _worker_main(conn, started, heartbeat, held, memory_budget: MemoryBudget,
+                 initializer: Callable, initargs: Tuple):
+    """Run tasks received over conn until told to exit"""
+    global _heartbeat
+    _heartbeat = heartbeat
+    memory_budget.track(held, on_wait=report_progress)  # Throttled time is not a slow page
+    initializer(*initargs)
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        function, args = task
+        started.value = heartbeat.value = time.monotonic()
+        try:
+            reply = (True, function(*args))
+        except BaseException as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send((False, e))  # The result could not be pickled
+
+
+@dataclass
+class _Task:
+    future: Future
+    function: Callable
+    args: Tuple
+    file_timeout: float
+    page_timeout: float
+    stop_deadline: Optional[float] = None
+
+
+class _Worker:
+    """Parent side of one worker process"""
+
+    def __init__(self, memory_budget: MemoryBudget, initializer: Callable, initargs: Tuple):
+        self.conn, child_conn = MP_CONTEXT.Pipe()
+        # Set by the worker when it begins a task, so its start-up is not timed
+        self.started = MP_CONTEXT.Value('d', 0.0, lock=False)
+        self.heartbeat = MP_CONTEXT.Value('d', 0.0, lock=False)
+        self.held = MP_CONTEXT.Value('q', 0, lock=False)
+        self.process = MP_CONTEXT.Process(
+            target=_worker_main,
+            args=(child_conn, self.started, self.heartbeat, self.held, memory_budget, initializer, initargs),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()  # Reading from conn then fails once the worker exits
+        self.task: Optional[_Task] = None
+
+
+class SupervisedExecutor:
+    """
+    Process pool that kills and replaces workers exceeding their time budget
+
+    A malformed document can keep MuPDF busy repairing the file or rendering
+    a single page for minutes, where the stop event is never checked. Every
+    task runs under a budget for the whole task and one for each page; tasks
+    call report_progress before each page. When a budget runs out the
+    worker is killed, its reserved render memory is handed back, and the
+    task fails with TaskTimeout. A new worker takes its place for the next
+    task. Time spent paused does not count, and tasks that do not end within
+    STOP_GRACE_SECONDS of a stop are killed as well.
+    """
+
+    def __init__(self, max_workers: int, initializer: Callable, initargs: Tuple,
+                 memory_budget: MemoryBudget, stop_event=None, pause_event=None):
+        """
+        Initialize executor, workers are started as tasks arrive
+
+        Args:
+            max_workers: Maximum number of worker processes
+            initializer: Called in each worker with initargs before its first task
+            initargs: Arguments for initializer
+            memory_budget: Render budget shared with the workers, which is
+                also passed in initargs
+            stop_event: Event that ends processing early
+            pause_event: Event that suspends processing
+        """
+        self.max_workers = max(1, max_workers)
+        self.initializer = initializer
+        self.initargs = initargs
+        self.memory_budget = memory_budget
+        self.stop_event = stop_event
+        self.pause_event = pause_event
+        self.killed = 0
+        self._pending = collections.deque()
+        self._shutdown = False
+        self._lock = Lock()
+        self._wake_reader, self._wake_writer = MP_CONTEXT.Pipe(duplex=False)
+        self._wake_lock = Lock()
+        self._thread = Thread(target=self._supervise, name="worker-supervisor", daemon=True)
+        self._thread.start()
+
+    def submit(self, function: Callable, *args, file_timeout: float = 0.0,
+               page_timeout: float = 0.0) -> Future:
+        """
+        Schedule a task
+
+        Args:
+            function: Module level function to run in a worker
+            args: Arguments for function
+            file_timeout: Seconds the whole task may take, 0 for no limit
+            page_timeout: Seconds between progress reports, 0 for no limit
+
+        Returns:
+            Future of the task result
+        """
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Cannot schedule tasks after shutdown")
+            self._pending.append(_Task(future, function, args, file_timeout, page_timeout))
+        self._wake()
+        return future
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        """
+        Stop the workers once the scheduled tasks are done
+
+        Args:
+            wait: Block until the workers have exited
+            cancel_futures: Drop tasks that have not started
+        """
+        with self._lock:
+            self._shutdown = True
+            if cancel_futures:
+                while self._pending:
+                    self._pending.popleft().future.cancel()
+        self._wake()
+        if wait:
+            self._thread.join()
+
+    def _wake(self):
+        with self._wake_lock:
+            self._wake_writer.send_bytes(b'\0')
+
+    def _dispatch(self, workers: List[_Worker]):
+        """Hand pending tasks to idle workers, starting workers up to the maximum"""
+        for worker in [worker for worker in workers if worker.task is None]:
+            if not worker.process.is_alive():
+                self._remove(worker, workers)
+
+        with self._lock:
+            while self._pending:
+                worker = next((worker for worker in workers if worker.task is None), None)
+                if worker is None:
+                    if len(workers) >= self.max_workers:
+                        return
+                    worker = _Worker(self.memory_budget, self.initializer, self.initargs)
+                    workers.append(worker)
+
+                task = self._pending.popleft()
+                if not task.future.set_running_or_notify_cancel():
+                    continue
+                worker.started.value = 0.0
+                try:
+                    worker.conn.send((task.function, task.args))
+                except Exception as e:
+                    task.future.set_exception(e)
+                    continue
+                worker.task = task
+
+    def _receive(self, worker: _Worker, workers: List[_Worker]):
+        """Complete the task of a worker that replied or exited"""
+        task, worker.task = worker.task, None
+        try:
+            succeeded, value = worker.conn.recv()
+        except (EOFError, OSError):
+            self._remove(worker, workers)
+            task.future.set_exception(WorkerLost(
+                f"Worker process exited with code {worker.process.exitcode}"))
+            return
+        except Exception as e:
+            task.future.set_exception(e)  # The result could not be unpickled
+            return
+
+        if succeeded:
+            task.future.set_result(value)
+        else:
+            task.future.set_exception(value)
+
+    def _remove(self, worker: _Worker, workers: List[_Worker]):
+        """Kill a worker and give back the render memory it held"""
+        if worker.process.is_alive():
+            worker.process.kill()
+            self.killed += 1
+        worker.process.join()
+        if not self.memory_budget.reclaim(worker.held):
+            logging.warning(f"Could not reclaim {worker.held.value:,} bytes of render memory "
+                            f"from a killed worker")
+        worker.conn.close()
+        workers.remove(worker)
+
+    def _enforce_budgets(self, workers: List[_Worker], elapsed_tick: float):
+        """Kill workers whose task ran out of time"""
+        now = time.monotonic()
+        paused = self.pause_event is not None and self.pause_event.is_set()
+        stopped = self.stop_event is not None and self.stop_event.is_set()
+
+        for worker in [worker for worker in workers if worker.task is not None]:
+            task = worker.task
+            started = worker.started.value
+            if paused and not stopped and started:
+                # Paused time counts against neither budget
+                worker.started.value = started + elapsed_tick
+                worker.heartbeat.value = max(worker.heartbeat.value, now)
+                continue
+
+            error = None
+            if stopped:
+                if task.stop_deadline is None:
+                    task.stop_deadline = now + STOP_GRACE_SECONDS
+                elif now > task.stop_deadline:
+                    error = TaskTimeout("Did not stop in time", stopped=True)
+            elif not started:
+                continue  # The worker is still starting up
+            elif task.file_timeout and now - started > task.file_timeout:
+                error = TaskTimeout(f"Timed out after {task.file_timeout:g} seconds")
+            elif task.page_timeout and now - worker.heartbeat.value > task.page_timeout:
+                error = TaskTimeout(f"A page took longer than {task.page_timeout:g} seconds")
+
+            if error is not None:
+                worker.task = None
+                self._remove(worker, workers)
+                task.future.set_exception(error)
+
+    def _supervise(self):
+        """Dispatch tasks, collect results and enforce time budgets"""
+        workers: List[_Worker] = []
+        last_tick = time.monotonic()
+        try:
+            while True:
+                self._dispatch(workers)
+                busy = [worker for worker in workers if worker.task is not None]
+                with self._lock:
+                    if self._shutdown and not self._pending and not busy:
+                        break
+
+                ready = wait_connections([worker.conn for worker in busy] + [self._wake_reader],
+                                         timeout=0.1)
+                if self._wake_reader in ready:
+                    while self._wake_reader.poll():
+                        self._wake_reader.recv_bytes()
+                for worker in busy:
+                    if worker.conn in ready:
+                        self._receive(worker, workers)
+
+                now = time.monotonic()
+                self._enforce_budgets(workers, now - last_tick)
+                last_tick = now
+        finally:
+            for worker in workers:
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+            for worker in workers:
+                worker.process.join(timeout=STOP_GRACE_SECONDS)
+                if worker.process.is_alive():
+                    worker.process.kill()
+                    worker.process.join()
+                worker.conn.close()